@@ -0,0 +1,96 @@
+"""
+IVFIndex recall@k and queries per second against exact brute-force search, per n_probe,
+plus build, save, memory-mapped load and append times.
+
+    python -m benchmarks.bench_ann --vectors 200000 --dim 1024 --queries 2000
+    python -m benchmarks.bench_ann --npy embeddings.npy     # real message embeddings
+
+Synthetic vectors are drawn around `--topics` random centres, since uniformly random
+high-dimensional vectors have no neighbourhood structure for any index to exploit.
+"""
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import numpy as np
+from core.ann import IVFIndex
+
+def synthetic(n: int, dim: int, topics: int, spread: float, rng) -> np.ndarray:
+    centres = rng.normal(size=(topics, dim)).astype(np.float32)
+    noise = rng.normal(scale=spread, size=(n, dim)).astype(np.float32)
+    return centres[rng.integers(0, topics, n)] + noise
+
+def brute_force(vectors: np.ndarray, queries: np.ndarray, k: int, batch: int = 256) -> np.ndarray:
+    ids = np.empty((len(queries), k), dtype=np.int64)
+    for b0 in range(0, len(queries), batch):
+        sims = queries[b0:b0 + batch] @ vectors.T
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(sims, top, axis=1), axis=1)
+        ids[b0:b0 + batch] = np.take_along_axis(top, order, axis=1)
+    return ids
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--npy", help="(n, dim) embeddings to index instead of synthetic vectors")
+    ap.add_argument("--vectors", type=int, default=200000)
+    ap.add_argument("--dim", type=int, default=256)
+    ap.add_argument("--topics", type=int, default=2000)
+    ap.add_argument("--spread", type=float, default=1.5)
+    ap.add_argument("--queries", type=int, default=2000)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--lists", type=int, default=None, help="default about 4 * sqrt(vectors)")
+    ap.add_argument("--probes", default="1,2,4,8,16,32,64")
+    ap.add_argument("--append", type=float, default=0.1, help="fraction of vectors appended after the build")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    data = np.load(args.npy, mmap_mode="r") if args.npy else synthetic(args.vectors, args.dim, args.topics, args.spread, rng)
+    data = IVFIndex._unit(data)
+    n, dim = data.shape
+    # Held-out queries: perturbed copies of indexed vectors
+    queries = IVFIndex._unit(data[rng.choice(n, args.queries)] + rng.normal(scale=0.05, size=(args.queries, dim)))
+    n_build = n - int(n * args.append)
+
+    start = time.perf_counter()
+    index = IVFIndex.build(data[:n_build], n_lists=args.lists, seed=args.seed)
+    t_build = time.perf_counter() - start
+
+    directory = tempfile.mkdtemp(prefix="bench_ann_")
+    try:
+        path = os.path.join(directory, "ann")
+        start = time.perf_counter()
+        index.save(path)
+        t_save = time.perf_counter() - start
+        start = time.perf_counter()
+        index = IVFIndex.load(path)
+        t_load = time.perf_counter() - start
+        start = time.perf_counter()
+        index.add(data[n_build:])
+        t_append = time.perf_counter() - start
+        index.search(queries[:1], args.k)  # builds the inverted lists outside the timings
+
+        print(f"{n:,} x {dim} vectors | {index.n_lists} lists | build {t_build:.2f}s | save {t_save:.2f}s | "
+              f"mmap load {t_load * 1e3:.1f}ms | append {n - n_build:,} {t_append:.2f}s | "
+              f"on disk {sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path)) / 2 ** 20:,.0f} MiB")
+
+        start = time.perf_counter()
+        exact = brute_force(np.asarray(data), queries, args.k)
+        t_brute = time.perf_counter() - start
+        print(f"brute force          {args.queries / t_brute:10,.0f} QPS")
+
+        for probe in (int(p) for p in args.probes.split(",")):
+            if probe > index.n_lists:
+                break
+            start = time.perf_counter()
+            _, ids = index.search(queries, args.k, n_probe=probe)
+            elapsed = time.perf_counter() - start
+            recall = np.mean([len(np.intersect1d(a, b)) / args.k for a, b in zip(ids, exact)])
+            print(f"n_probe {probe:<4d} recall@{args.k} {recall:6.3f} | {args.queries / elapsed:10,.0f} QPS | "
+                  f"speedup {t_brute / elapsed:6.1f}x")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
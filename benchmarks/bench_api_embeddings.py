@@ -0,0 +1,58 @@
+"""
+API-mode embedding throughput against the local stub server: the serial client
+(concurrency 1) vs. concurrent in-flight requests under injected latency and errors, plus
+a resume check where a run dies partway and the rerun only embeds what was not cached.
+
+    python -m benchmarks.bench_api_embeddings --texts 20000 --latency 0.2 --error-rate 0.05
+"""
+import os
+import time
+import argparse
+import tempfile
+import threading
+from core.api_client import AsyncEmbeddingClient
+from core.embeddings import EmbeddingEngine
+from benchmarks.stub_embedding_server import StubEmbeddingServer
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--texts", type=int, default=20000)
+    ap.add_argument("--latency", type=float, default=0.2)
+    ap.add_argument("--error-rate", type=float, default=0.05)
+    ap.add_argument("--concurrency", default="1,4,16,32")
+    args = ap.parse_args()
+
+    texts = [f"message {i} about the deploy" for i in range(args.texts)]
+    server = StubEmbeddingServer(latency=args.latency, error_rate=args.error_rate).start()
+
+    for c in (int(x) for x in args.concurrency.split(",")):
+        server.counts.update(requests=0, errors=0, throttled=0, max_in_flight=0)
+        client = AsyncEmbeddingClient("stub", server.url, "pplx-embed-v1", max_concurrency=c, backoff=0.05)
+        start = time.perf_counter()
+        client.embed(texts)
+        elapsed = time.perf_counter() - start
+        print(f"concurrency {c:3d} | {len(texts) / elapsed:9,.0f} texts/s | {client.stats['requests']} requests, "
+              f"{client.stats['retries']} retries | peak in flight {server.counts['max_in_flight']}")
+
+    # Resume: every request fails after the first few batches, then the rerun completes the rest
+    os.environ.setdefault("PPLX_API_KEY", "stub")
+    os.environ["PPLX_BASE_URL"] = server.url
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = EmbeddingEngine(mode="api", cache_dir=tmp, api_options={"max_retries": 0, "max_concurrency": 4})
+        server.error_rate = 0.0
+        server.latency = 0.01
+        timer = threading.Timer(0.3, lambda: setattr(server, "error_rate", 1.0))
+        timer.start()
+        try:
+            engine.encode(texts)
+        except Exception as e:
+            print(f"first run failed as injected ({type(e).__name__}); cached so far: {engine.cache.stats()['entries']}")
+        timer.cancel()
+        server.error_rate = 0.0
+        server.counts.update(requests=0)
+        engine.encode(texts)
+        print(f"rerun sent {server.counts['requests']} requests for the remaining texts; "
+              f"cached now: {engine.cache.stats()['entries']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Prototype / cascade message classification vs. full zero-shot NLI on a sample:
+agreement with NLI, fallback rate and estimated speedup per margin, plus accuracy when
+the sample carries gold labels.
+
+    python -m benchmarks.bench_classification --chat export.txt --limit 2000
+    python -m benchmarks.bench_classification --sample labeled.jsonl   # {"text": ..., "label": ...} per line
+
+Embeddings are reported separately, since the pipeline computes them anyway. Cascade time
+is estimated as prototype time plus the NLI time of the fallback messages.
+"""
+import json
+import time
+import argparse
+import numpy as np
+from core.parser import WhatsAppParser
+from core.embeddings import EmbeddingEngine
+from core.classification import ZeroShotClassifier, PrototypeClassifier
+
+def load_sample(args):
+    if args.sample:
+        with open(args.sample, encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+        return [r["text"] for r in rows][:args.limit], [r.get("label") for r in rows][:args.limit]
+    texts = [m.content for m in WhatsAppParser().iter_parse(args.chat)][:args.limit]
+    return texts, [None] * len(texts)
+
+def main():
+    ap = argparse.ArgumentParser()
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--chat", help="WhatsApp export to sample messages from")
+    src.add_argument("--sample", help="JSONL file of {'text', 'label'} rows")
+    ap.add_argument("--limit", type=int, default=2000)
+    ap.add_argument("--mode", default="local", choices=("local", "api"))
+    ap.add_argument("--margins", default="0,0.02,0.05,0.1,0.2,1")
+    args = ap.parse_args()
+
+    texts, gold = load_sample(args)
+    engine = EmbeddingEngine(mode=args.mode)
+    start = time.perf_counter()
+    embeddings = engine.encode(texts)
+    t_embed = time.perf_counter() - start
+
+    proto = PrototypeClassifier(engine)
+    proto.prototypes  # seed embedding is a one-off cost, kept out of the timing
+    start = time.perf_counter()
+    sims = proto.similarities(embeddings)
+    t_proto = time.perf_counter() - start
+    top2 = np.sort(sims, axis=1)[:, -2:]
+    gap = top2[:, 1] - top2[:, 0]
+    proto_labels = np.array(proto.LABELS)[sims.argmax(axis=1)]
+
+    nli = ZeroShotClassifier()
+    start = time.perf_counter()
+    nli_labels = np.array([r['label'] for r in nli.analyze_batch(texts)])
+    t_nli = time.perf_counter() - start
+
+    n = len(texts)
+    labeled = np.array([g is not None for g in gold])
+    gold_arr = np.array([g or "" for g in gold])
+    print(f"{n} messages | embeddings {n / t_embed:,.0f} msg/s (shared with the pipeline) | "
+          f"prototype {n / t_proto:,.0f} msg/s | NLI {n / t_nli:,.1f} msg/s")
+    if labeled.any():
+        print(f"NLI accuracy on {int(labeled.sum())} gold labels: {np.mean(nli_labels[labeled] == gold_arr[labeled]):.3f}")
+
+    for margin in (float(m) for m in args.margins.split(",")):
+        fallback = gap < margin
+        labels = np.where(fallback, nli_labels, proto_labels)
+        t_cascade = t_proto + t_nli * fallback.mean()
+        line = (f"margin {margin:<5g} fallback {fallback.mean():6.1%} | agreement with NLI {np.mean(labels == nli_labels):6.1%} | "
+                f"speedup {t_nli / t_cascade:7.1f}x")
+        if labeled.any():
+            line += f" | accuracy {np.mean(labels[labeled] == gold_arr[labeled]):.3f}"
+        print(line)
+
+if __name__ == "__main__":
+    main()
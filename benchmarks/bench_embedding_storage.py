@@ -0,0 +1,89 @@
+"""
+Memory saved vs. drift of the embedding storage modes (EmbeddingCodec): for each mode, the
+bytes of the embedding matrix and how far uniqueness and idea-influence (echo) move from
+the float32 results, per message (mean absolute error) and as per-participant rankings
+(Spearman correlation, top-10 overlap).
+
+    python -m benchmarks.bench_embedding_storage --messages 50000 --users 200
+    python -m benchmarks.bench_embedding_storage --npy embeddings.npy   # real unit embeddings, in chat order
+
+Synthetic embeddings follow a conversation: topics persist over runs of messages and lie
+in a low-rank subspace plus noise, like sentence embeddings do. Modes are
+"storage[:projection:dims]", e.g. "int8:pca:256".
+"""
+import time
+import argparse
+import numpy as np
+from scipy.stats import spearmanr
+from core.compact import EmbeddingCodec
+from core.influence import SemanticInfluenceEngine
+from core.table import MessageTable
+
+MODES = ("float32", "float16", "int8", "float32:truncate:512", "float32:truncate:256", "float32:pca:256",
+         "float16:pca:256", "int8:pca:256", "int8:pca:128")
+
+def synthetic(n: int, dim: int, topics: int, rank: int, noise: float, rng) -> np.ndarray:
+    basis = np.linalg.qr(rng.normal(size=(dim, rank)))[0].T
+    centres = rng.normal(size=(topics, rank)) @ basis
+    # Topic of each message: kept with probability 0.8, otherwise a new random one
+    switch = rng.random(n) < 0.2
+    topic = rng.integers(0, topics, n)
+    topic = topic[np.maximum.accumulate(np.where(switch | (np.arange(n) == 0), np.arange(n), 0))]
+    x = centres[topic] + noise * rng.normal(size=(n, dim)) / np.sqrt(dim) * np.linalg.norm(centres, axis=1).mean()
+    return (x / np.linalg.norm(x, axis=1, keepdims=True)).astype(np.float32)
+
+def per_user(engine, table, scores) -> np.ndarray:
+    means = engine.average_by_sender(table, scores)
+    return np.array([means.get(u, 0.0) for u in table.senders])
+
+def top_overlap(a: np.ndarray, b: np.ndarray, k: int = 10) -> float:
+    k = min(k, len(a))
+    return len(np.intersect1d(np.argsort(-a)[:k], np.argsort(-b)[:k])) / k if k else 1.0
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--npy", help="(n, dim) unit embeddings in chat order instead of synthetic ones")
+    ap.add_argument("--messages", type=int, default=50000)
+    ap.add_argument("--dim", type=int, default=1024)
+    ap.add_argument("--users", type=int, default=200)
+    ap.add_argument("--topics", type=int, default=500)
+    ap.add_argument("--rank", type=int, default=128, help="dimension of the synthetic topic subspace")
+    ap.add_argument("--noise", type=float, default=0.5)
+    ap.add_argument("--modes", default=",".join(MODES))
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    emb = np.load(args.npy).astype(np.float32) if args.npy else synthetic(
+        args.messages, args.dim, args.topics, args.rank, args.noise, rng)
+    n = len(emb)
+    # Zipf-like activity, so rankings have a head and a long tail
+    activity = 1.0 / np.arange(1, args.users + 1)
+    sender_ids = rng.choice(args.users, size=n, p=activity / activity.sum()).astype(np.int32)
+    table = MessageTable(np.arange(n, dtype=np.int64) * 60, sender_ids, [f"User {i}" for i in range(args.users)],
+                         b"", np.zeros(n + 1, dtype=np.int64), np.arange(n, dtype=np.int64))
+    engine = SemanticInfluenceEngine()
+
+    base_u = engine.message_uniqueness(table, emb)
+    base_e = engine.message_echo(table, emb)
+    base_uu, base_ue = per_user(engine, table, base_u), per_user(engine, table, base_e)
+
+    print(f"{n:,} messages x {emb.shape[1]} dims, {args.users} participants")
+    print(f"{'mode':22s} {'MiB':>8s} {'saved':>7s} {'encode s':>9s} | {'uniq MAE':>9s} {'rho':>6s} {'top10':>6s} | "
+          f"{'echo MAE':>9s} {'rho':>6s} {'top10':>6s}")
+    for mode in args.modes.split(","):
+        storage, projection, dims = (mode.split(":") + [None, None])[:3]
+        codec = EmbeddingCodec(storage, int(dims) if dims else None, projection or 'truncate', seed=args.seed)
+        start = time.perf_counter()
+        compact = codec.encode(emb)
+        t_encode = time.perf_counter() - start
+
+        u = engine.message_uniqueness(table, compact)
+        e = engine.message_echo(table, compact)
+        uu, ue = per_user(engine, table, u), per_user(engine, table, e)
+        print(f"{mode:22s} {compact.nbytes / 2 ** 20:8.1f} {1 - compact.nbytes / emb.nbytes:7.1%} {t_encode:9.2f} | "
+              f"{np.abs(u - base_u).mean():9.5f} {spearmanr(uu, base_uu)[0]:6.3f} {top_overlap(uu, base_uu):6.2f} | "
+              f"{np.abs(e - base_e).mean():9.5f} {spearmanr(ue, base_ue)[0]:6.3f} {top_overlap(ue, base_ue):6.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Int8 ONNX Runtime backend vs. fp32 PyTorch for the transformer stages, on a fixed message
+corpus: throughput of each backend and the accuracy drift of the quantized outputs.
+
+    python -m benchmarks.bench_onnx --messages 2000 --threads 4
+    python -m benchmarks.bench_onnx --corpus export.txt --models emotions,embeddings
+
+Drift is reported as top-label agreement and max score difference for the classifiers, and
+as mean / minimum cosine similarity between fp32 and int8 vectors for the embeddings. The
+first ONNX run exports and quantizes each model; its cached artifacts are reused afterwards.
+"""
+import time
+import argparse
+import numpy as np
+from core.parser import WhatsAppParser
+from benchmarks.synthetic import generate_lines
+
+def load_corpus(args):
+    parser = WhatsAppParser()
+    if args.corpus:
+        texts = [m.content for m in parser.iter_parse(args.corpus)]
+    else:
+        texts = [m.content for m in parser.parse("\n".join(generate_lines(args.messages * 2, seed=args.seed)))]
+    return texts[:args.messages]
+
+def build(name, backend, threads):
+    if name == "emotions":
+        from core.sentiment import EmotionAnalyzer
+        return EmotionAnalyzer(backend=backend, threads=threads)
+    if name == "classification":
+        from core.classification import ZeroShotClassifier
+        return ZeroShotClassifier(backend=backend, threads=threads)
+    from core.embeddings import EmbeddingEngine
+    return EmbeddingEngine(mode="local", backend=backend, threads=threads).load()
+
+def infer(name, engine, texts):
+    return engine.encode(texts) if name == "embeddings" else engine.analyze_batch(texts)
+
+def drift(name, ref, out):
+    if name == "embeddings":
+        cos = np.einsum("ij,ij->i", ref, out) / (np.linalg.norm(ref, axis=1) * np.linalg.norm(out, axis=1))
+        return f"cosine mean {cos.mean():.4f} min {cos.min():.4f}"
+    key = "emotion" if name == "emotions" else "label"
+    agree = np.mean([a[key] == b[key] for a, b in zip(ref, out)])
+    score = max(abs(a["score"] - b["score"]) for a, b in zip(ref, out))
+    return f"label agreement {agree:.1%} | max score diff {score:.3f}"
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--corpus", help="WhatsApp export to take messages from (default: synthetic)")
+    ap.add_argument("--messages", type=int, default=2000)
+    ap.add_argument("--models", default="emotions,classification,embeddings")
+    ap.add_argument("--threads", type=int, default=None, help="ONNX Runtime intra-op threads")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    texts = load_corpus(args)
+    print(f"{len(texts)} messages")
+    for name in args.models.split(","):
+        outputs, rates = {}, {}
+        for backend in ("torch", "onnx"):
+            engine = build(name, backend, args.threads)
+            infer(name, engine, texts[:32])  # warm-up
+            start = time.perf_counter()
+            outputs[backend] = infer(name, engine, texts)
+            rates[backend] = len(texts) / (time.perf_counter() - start)
+        print(f"{name:15s} torch {rates['torch']:8.1f} msg/s | onnx-int8 {rates['onnx']:8.1f} msg/s | "
+              f"speedup {rates['onnx'] / rates['torch']:4.1f}x | {drift(name, outputs['torch'], outputs['onnx'])}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Parser throughput on synthetic exports: format-locked fast path vs. the generic
+try-every-pattern-and-format path.
+
+    python -m benchmarks.bench_parser --lines 1000000
+"""
+import os
+import time
+import argparse
+import tempfile
+from core.parser import WhatsAppParser
+from benchmarks.synthetic import write_export
+
+def run(path: str, detect_format: bool):
+    parser = WhatsAppParser(detect_format=detect_format)
+    start = time.perf_counter()
+    n = sum(1 for _ in parser.iter_parse(path))
+    return n, time.perf_counter() - start
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--lines", type=int, default=1_000_000)
+    ap.add_argument("--users", type=int, default=50)
+    ap.add_argument("--multiline-ratio", type=float, default=0.1)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for style in ("bracket", "dash"):
+            path = write_export(os.path.join(tmp, f"{style}.txt"), args.lines, n_users=args.users,
+                                multiline_ratio=args.multiline_ratio, style=style, seed=args.seed)
+            size_mb = os.path.getsize(path) / 1e6
+            n_generic, t_generic = run(path, detect_format=False)
+            n_fast, t_fast = run(path, detect_format=True)
+            assert n_fast == n_generic, (n_fast, n_generic)
+            print(f"{style:8s} {args.lines:>9,d} lines ({size_mb:.0f} MB) -> {n_fast:,d} messages | "
+                  f"generic {args.lines / t_generic:>10,.0f} lines/s | "
+                  f"fast {args.lines / t_fast:>10,.0f} lines/s | speedup {t_generic / t_fast:.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Cold-start breakdown: import time of `core` and the dashboard module, V6Pipeline
+construction by component, and (with --load) each model's first load. Every import is
+timed in a fresh interpreter so earlier imports do not hide later costs.
+
+    python -m benchmarks.bench_startup --load
+"""
+import sys
+import json
+import argparse
+import subprocess
+
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+
+PIPELINE_SNIPPET = """
+import json, time
+t = time.perf_counter()
+from core.pipeline import V6Pipeline
+imported = time.perf_counter() - t
+t = time.perf_counter()
+p = V6Pipeline(mode={mode!r}, classification={classification!r})
+built = time.perf_counter() - t
+if {load}:
+    for name in p.models.status():
+        p.models.get(name)
+report = p.startup_report()
+report["import_pipeline"] = imported
+report["construct"] = built
+print(json.dumps(report))
+"""
+
+def run(code: str) -> str:
+    return subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout.strip().splitlines()[-1]
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mode", default="local", choices=("local", "api"))
+    ap.add_argument("--classification", default="cascade")
+    ap.add_argument("--load", action="store_true", help="also load every registered model and time it")
+    args = ap.parse_args()
+
+    for module in ("core", "dashboard"):
+        print(f"import {module:<10s} {float(run(IMPORT_SNIPPET.format(module=module))):7.3f}s")
+
+    report = json.loads(run(PIPELINE_SNIPPET.format(mode=args.mode, classification=args.classification, load=args.load)))
+    print(f"import core.pipeline {report['import_pipeline']:7.3f}s")
+    print(f"V6Pipeline()         {report['construct']:7.3f}s")
+    for component, seconds in report["init"].items():
+        print(f"  {component:<18s} {seconds:7.3f}s")
+    for name, status in report["model_status"].items():
+        seconds = report["models"].get(name)
+        print(f"model {name:<14s} {f'{seconds:7.3f}s' if seconds is not None else status:>8s}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Local OpenAI-compatible embedding server for exercising the API client without network
+access or cost. Vectors are deterministic per text. Latency, transient 5xx errors, 429s
+and a server-side request rate limit can be injected.
+
+    python -m benchmarks.stub_embedding_server --port 8765 --latency 0.2 --error-rate 0.05
+    PPLX_BASE_URL=http://127.0.0.1:8765 PPLX_API_KEY=stub python dashboard.py
+"""
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+import numpy as np
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class StubEmbeddingServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, dim: int = 1024, latency: float = 0.05, jitter: float = 0.5,
+                 error_rate: float = 0.0, throttle_rate: float = 0.0, requests_per_sec: float = None, seed: int = 0):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.dim = dim
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.requests_per_sec = requests_per_sec
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.recent = deque()
+        self.counts = {"requests": 0, "errors": 0, "throttled": 0, "in_flight": 0, "max_in_flight": 0}
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self) -> "StubEmbeddingServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def vector(self, text: str) -> list:
+        seed = int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:8], "little")
+        return np.random.default_rng(seed).normal(size=self.dim).astype(np.float32).tolist()
+
+    def outcome(self) -> int:
+        """HTTP status for the next request: 200, 429 (throttled) or 500 (injected error)."""
+        with self.lock:
+            self.counts["requests"] += 1
+            now = time.monotonic()
+            while self.recent and now - self.recent[0] > 1.0:
+                self.recent.popleft()
+            over_limit = self.requests_per_sec is not None and len(self.recent) >= self.requests_per_sec
+            self.recent.append(now)
+            roll = self.rng.random()
+            if over_limit or roll < self.throttle_rate:
+                self.counts["throttled"] += 1
+                return 429
+            if roll < self.throttle_rate + self.error_rate:
+                self.counts["errors"] += 1
+                return 500
+            return 200
+
+class _Handler(BaseHTTPRequestHandler):
+    server: StubEmbeddingServer
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        srv = self.server
+        with srv.lock:
+            srv.counts["in_flight"] += 1
+            srv.counts["max_in_flight"] = max(srv.counts["max_in_flight"], srv.counts["in_flight"])
+        try:
+            time.sleep(srv.latency * (1 + srv.jitter * (2 * random.random() - 1)))
+            status = srv.outcome()
+            if status != 200:
+                return self._reply(status, {"error": {"message": "injected failure", "type": "server_error"}})
+            inputs = body.get("input", [])
+            inputs = [inputs] if isinstance(inputs, str) else inputs
+            self._reply(200, {
+                "object": "list",
+                "model": body.get("model"),
+                "data": [{"object": "embedding", "index": i, "embedding": srv.vector(t)} for i, t in enumerate(inputs)],
+                "usage": {"prompt_tokens": sum(len(t) // 4 + 1 for t in inputs), "total_tokens": 0},
+            })
+        finally:
+            with srv.lock:
+                srv.counts["in_flight"] -= 1
+
+    def _reply(self, status: int, payload: dict):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--dim", type=int, default=1024)
+    ap.add_argument("--latency", type=float, default=0.05)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--throttle-rate", type=float, default=0.0)
+    ap.add_argument("--requests-per-sec", type=float, default=None)
+    args = ap.parse_args()
+    server = StubEmbeddingServer(args.port, args.dim, args.latency, error_rate=args.error_rate,
+                                 throttle_rate=args.throttle_rate, requests_per_sec=args.requests_per_sec)
+    print(f"Stub embedding server on {server.url}")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    main()
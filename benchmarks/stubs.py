@@ -0,0 +1,41 @@
+"""
+Model stand-ins for benchmarks: deterministic, fast, and free of model downloads, with the
+interfaces of EmbeddingEngine and the transformer analyzers.
+"""
+import zlib
+import numpy as np
+from typing import Dict, List
+
+class StubEmbedder:
+    """
+    EmbeddingEngine stand-in. Each text maps (by CRC32) to a row of a fixed random table,
+    so identical texts share a vector and the cost is a hash and a gather per text.
+    """
+    model_name = 'stub'
+    cache = None
+
+    def __init__(self, dim: int = 64, rows: int = 1 << 16, seed: int = 0):
+        self.dim = dim
+        table = np.random.default_rng(seed).normal(size=(rows, dim)).astype(np.float32)
+        self._table = table / np.linalg.norm(table, axis=1, keepdims=True)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        rows = np.fromiter((zlib.crc32(t.encode('utf-8')) for t in texts), dtype=np.int64, count=len(texts))
+        return self._table[rows % len(self._table)]
+
+    def load(self):
+        return self
+
+class StubClassifier:
+    """EmotionAnalyzer / ZeroShotClassifier stand-in labelling messages by keyword rules."""
+    RULES = (('?', 'question'), ('http', 'resource'), ('def ', 'code'), ('fix', 'solution'), ('idea', 'idea'))
+
+    def __init__(self, key: str = 'label'):
+        self.key = key
+
+    def analyze_batch(self, texts: List[str]) -> List[Dict]:
+        out = []
+        for t in texts:
+            label = next((name for token, name in self.RULES if token in t), 'reaction')
+            out.append({self.key: label, 'score': 1.0})
+        return out
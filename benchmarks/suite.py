@@ -0,0 +1,179 @@
+"""
+Scaling benchmark for the analysis stages on synthetic exports, runnable without model
+downloads (embeddings and classifiers are stubs from benchmarks.stubs).
+
+For every size a fresh interpreter generates the export and times parse, embed (stub),
+influence, long-horizon echo (ANN index build and lookups), graph, classification (prototypes
+over stub embeddings), behavioral features and scoring, recording throughput and peak RSS per
+stage. Results are written as JSON; --compare checks them against an earlier results file and
+exits non-zero on regressions.
+
+    python -m benchmarks.suite --sizes 10000,100000,1000000 --out bench.json
+    python -m benchmarks.suite --sizes 10000000 --dim 32 --out big.json
+    python -m benchmarks.suite --compare base.json --out new.json
+    python -m benchmarks.suite --compare base.json --against new.json
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+from datetime import datetime, timezone
+from core.metrics import RSSSampler
+
+STAGES = ("parse", "embed", "influence", "long_echo", "graph", "classification", "features", "scoring")
+
+def measure(results, stage, items, fn):
+    with RSSSampler() as rss:
+        start = time.perf_counter()
+        out = fn()
+        elapsed = time.perf_counter() - start
+    results[stage] = {
+        "seconds": round(elapsed, 4),
+        "items": items,
+        "throughput": round(items / elapsed, 1) if elapsed > 0 else None,
+        "peak_rss_mb": round(rss.peak / 2 ** 20, 1),
+        "rss_delta_mb": round((rss.peak - rss.start) / 2 ** 20, 1),
+    }
+    return out
+
+def run_size(args) -> dict:
+    """Runs every stage once on a `args.lines`-line export in this process."""
+    from benchmarks.synthetic import write_export
+    from benchmarks.stubs import StubEmbedder
+    from core.parser import WhatsAppParser
+    from core.table import MessageTable
+    from core.influence import SemanticInfluenceEngine
+    from core.ann import IVFIndex
+    from core.graphs import SocialGraphEngine
+    from core.classification import PrototypeClassifier
+    from core.features import BehaviorFeatureExtractor
+    from core.scoring import ValueScorer
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_export(os.path.join(tmp, "chat.txt"), args.lines, n_users=args.users, style=args.style,
+                            multiline_ratio=args.multiline_ratio, burstiness=args.burstiness, seed=args.seed)
+        table = measure(results, "parse", args.lines,
+                        lambda: MessageTable.from_records(WhatsAppParser().iter_records(path)))
+    n = len(table)
+
+    embedder = StubEmbedder(dim=args.dim, seed=args.seed)
+    texts, emb = measure(results, "embed", n, lambda: (lambda t: (t, embedder.encode(t)))(table.texts()))
+
+    influence = SemanticInfluenceEngine()
+    uniqueness, echo = measure(results, "influence", n, lambda: (influence.message_uniqueness(table, emb),
+                                                                  influence.message_echo(table, emb)))
+    measure(results, "long_echo", n, lambda: influence.long_horizon_echo(table, emb, IVFIndex.build(emb)))
+
+    graph = SocialGraphEngine()
+    measure(results, "graph", n, lambda: graph.graph_from_counts(graph.count_interactions(table)))
+
+    classifier = PrototypeClassifier(embedder)
+    labels = measure(results, "classification", n, lambda: classifier.analyze_batch(texts, emb))
+
+    features = measure(results, "features", n, lambda: BehaviorFeatureExtractor().extract(table))
+
+    def score():
+        table.annotate("msg_type", [r["label"] for r in labels])
+        table.annotate("uniqueness", uniqueness)
+        table.annotate("echo", echo)
+        for name, values in features.items():
+            table.annotate(name, values)
+        return ValueScorer().compute_scores(table.user_stats())
+    measure(results, "scoring", n, score)
+    return {"messages": n, "stages": results}
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def compare(base: dict, new: dict, threshold: float) -> bool:
+    """Prints per-stage throughput ratios new/base; True if any stage slowed by more than `threshold`."""
+    regressed = False
+    print(f"\ncompare {base['meta']['commit']} -> {new['meta']['commit']} (threshold {threshold:.0%})")
+    for size, entry in new["results"].items():
+        old = base["results"].get(size)
+        if old is None:
+            continue
+        for stage, m in entry["stages"].items():
+            o = old["stages"].get(stage)
+            if not o or not o["throughput"] or not m["throughput"]:
+                continue
+            ratio = m["throughput"] / o["throughput"]
+            flag = ""
+            if ratio < 1 - threshold:
+                flag, regressed = "  REGRESSION", True
+            print(f"  {int(size):>10,d} {stage:15s} {ratio:6.2f}x  rss {o['peak_rss_mb']:8.1f} -> {m['peak_rss_mb']:8.1f} MB{flag}")
+    return regressed
+
+def print_table(report: dict):
+    sizes = list(report["results"])
+    print(f"\n{'stage':15s}" + "".join(f"{int(s):>14,d}" for s in sizes) + "   (msg/s | peak RSS MB)")
+    for stage in STAGES:
+        cells = []
+        for s in sizes:
+            m = report["results"][s]["stages"].get(stage)
+            cells.append(f"{m['throughput']:>9,.0f}|{m['peak_rss_mb']:<4.0f}" if m else f"{'-':>14s}")
+        print(f"{stage:15s}" + "".join(f"{c:>14s}" for c in cells))
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="10000,100000,1000000", help="export sizes in lines")
+    ap.add_argument("--users", type=int, default=50)
+    ap.add_argument("--style", default="bracket")
+    ap.add_argument("--multiline-ratio", type=float, default=0.1)
+    ap.add_argument("--burstiness", type=float, default=0.8)
+    ap.add_argument("--dim", type=int, default=64, help="stub embedding dimension")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", help="write results JSON here")
+    ap.add_argument("--compare", help="earlier results JSON to compare against")
+    ap.add_argument("--against", help="compare this results JSON instead of running")
+    ap.add_argument("--threshold", type=float, default=0.1, help="throughput drop counted as a regression")
+    ap.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    ap.add_argument("--lines", type=int, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_size(args)))
+        return
+
+    if args.against:
+        with open(args.against) as f:
+            report = json.load(f)
+    else:
+        report = {
+            "meta": {"commit": git_commit(), "python": platform.python_version(), "numpy": np.__version__,
+                     "platform": platform.platform(), "cpus": os.cpu_count(),
+                     "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                     "config": {k: v for k, v in vars(args).items() if k not in ("worker", "lines", "out", "compare", "against")}},
+            "results": {},
+        }
+        passthrough = ["--users", str(args.users), "--style", args.style, "--multiline-ratio", str(args.multiline_ratio),
+                       "--burstiness", str(args.burstiness), "--dim", str(args.dim), "--seed", str(args.seed)]
+        for size in (int(s) for s in args.sizes.split(",")):
+            # A fresh interpreter per size keeps peak RSS from leaking across sizes
+            out = subprocess.run([sys.executable, "-m", "benchmarks.suite", "--worker", "--lines", str(size)] + passthrough,
+                                 capture_output=True, text=True, check=True).stdout
+            report["results"][str(size)] = json.loads(out.strip().splitlines()[-1])
+            print(f"{size:>12,d} lines done")
+        if args.out:
+            with open(args.out, "w") as f:
+                json.dump(report, f, indent=2)
+
+    print_table(report)
+    if args.compare:
+        with open(args.compare) as f:
+            base = json.load(f)
+        if compare(base, report, args.threshold):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
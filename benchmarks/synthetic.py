@@ -0,0 +1,65 @@
+"""
+Seeded synthetic WhatsApp export generator for benchmarks.
+"""
+import random
+from datetime import datetime, timedelta
+from typing import Iterator
+
+WORDS = ("the deploy broke again can someone check logs try restarting pod thanks lol ok "
+         "here is the fix https://example.com/pr/42 why does this fail on python3 works "
+         "for me what version are you on nice idea let's ship it tomorrow").split()
+
+STYLES = ('bracket', 'dash', 'dash24', 'us')
+
+def _header(t: datetime, sender: str, style: str) -> str:
+    if style == 'bracket':
+        return f"[{t.day:02d}/{t.month:02d}/{t.year}, {t:%H:%M:%S}] {sender}: "
+    if style == 'dash':
+        return f"{t.day}/{t.month}/{t:%y}, {t:%I:%M %p} - {sender}: "
+    if style == 'dash24':
+        return f"{t.day:02d}/{t.month:02d}/{t.year}, {t:%H:%M} - {sender}: "
+    return f"{t.month}/{t.day}/{t.year}, {t:%I:%M %p} - {sender}: "
+
+def generate_lines(n_lines: int, n_users: int = 20, multiline_ratio: float = 0.1,
+                   style: str = 'bracket', seed: int = 0, burstiness: float = 0.0) -> Iterator[str]:
+    """
+    Yields `n_lines` export lines. `style` is one of STYLES: 'bracket' (iOS,
+    "[d/m/Y, H:M:S] Name: ..."), 'dash' (Android, "d/m/y, I:M p - Name: ..."), 'dash24'
+    ("d/m/Y, H:M - Name: ...") or 'us' ("m/d/Y, I:M p - Name: ...").
+    `burstiness` in [0, 1) is the probability that the next message continues the current
+    burst: seconds apart and among the burst's few participants, with hour-long gaps between
+    bursts. 0 draws gaps and senders independently.
+    """
+    if style not in STYLES:
+        raise ValueError(f"Unknown style '{style}'. Use one of {STYLES}.")
+    rng = random.Random(seed)
+    users = [f"User {i:03d}" for i in range(n_users)]
+    t = datetime(2023, 1, 1, 9, 0)
+    participants = users
+    emitted = 0
+    while emitted < n_lines:
+        if burstiness <= 0:
+            # Drawn in the original order (gap, body, sender), so seeded exports stay the same
+            t += timedelta(seconds=rng.choice((5, 30, 60, 120, 600, 3600)))
+            body = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 12)))
+            sender = users[rng.randrange(n_users)]
+        else:
+            if rng.random() < burstiness:
+                t += timedelta(seconds=1 + int(rng.expovariate(1 / 20)))
+            else:
+                t += timedelta(seconds=60 + int(rng.expovariate(1 / 7200)))
+                participants = rng.sample(users, min(n_users, rng.randint(2, 5)))
+            sender = rng.choice(participants)
+            body = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 12)))
+        yield _header(t, sender, style) + body
+        emitted += 1
+        while emitted < n_lines and rng.random() < multiline_ratio:
+            yield " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 8)))
+            emitted += 1
+
+def write_export(path: str, n_lines: int, **kwargs) -> str:
+    with open(path, "w", encoding="utf-8") as f:
+        for line in generate_lines(n_lines, **kwargs):
+            f.write(line)
+            f.write("\n")
+    return path
@@ -1,8 +1,13 @@
 # core/__init__.py
-from .embeddings import EmbeddingEngine
-from .sentiment import EmotionAnalyzer
-from .topics import TopicDiscoverer
-from .graphs import SocialGraphEngine
+# Exports are resolved on first access, so `import core` does not pull in NetworkX or model code
+import importlib
+
+_EXPORTS = {
+    'EmbeddingEngine': '.embeddings',
+    'EmotionAnalyzer': '.sentiment',
+    'TopicDiscoverer': '.topics',
+    'SocialGraphEngine': '.graphs',
+}
 
 __all__ = [
     'EmbeddingEngine',
@@ -10,3 +15,10 @@ __all__ = [
     'TopicDiscoverer',
     'SocialGraphEngine'
 ]
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,222 @@
+import os
+import json
+import logging
+import numpy as np
+import scipy.sparse as sp
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class IVFIndex:
+    """
+    Inverted-file approximate nearest-neighbour index for cosine similarity, in NumPy.
+    Unit vectors are assigned to the nearest of `n_lists` spherical k-means centroids; a query
+    scans only the lists of its `n_probe` nearest centroids. Batched queries are grouped by
+    list, so each probed list is scored against all its queries with one matrix product.
+
+    With a `path`, vectors, ids and list assignments are raw files opened memory-mapped, and
+    `add` appends to them in place (the row count in meta.json is written last, so an
+    interrupted append is ignored on the next load). Vectors are stored as `dtype`; float16
+    halves the index for compact embeddings, and each scanned list is scored in float32.
+    """
+    QUERY_BATCH = 16384
+    # Vectors are normalized and assigned this many rows at a time
+    ADD_BATCH = 65536
+    # Query × centroid similarities are scored this many entries at a time
+    SCORE_BUDGET = 1 << 22
+    SAMPLES_PER_LIST = 32
+
+    def __init__(self, dim: int, n_lists: int = None, n_probe: int = 8, seed: int = 0, path: str = None,
+                 dtype: str = 'float32'):
+        self.dim = dim
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.seed = seed
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.centroids: Optional[np.ndarray] = None
+        # Vectors the centroids were trained on, to tell how far appends have outgrown them
+        self.trained = 0
+        self.vectors = np.zeros((0, dim), dtype=self.dtype)
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.lists = np.zeros(0, dtype=np.int32)
+        self._order = self._offsets = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, ids: np.ndarray = None, path: str = None, **kwargs) -> 'IVFIndex':
+        """Trains on `vectors` and adds them."""
+        index = cls(vectors.shape[1], path=path, **kwargs)
+        index.train(vectors)
+        index.add(vectors, ids)
+        return index
+
+    @staticmethod
+    def _unit(x: np.ndarray) -> np.ndarray:
+        x = np.asarray(x, dtype=np.float32)
+        norms = np.linalg.norm(x, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return x / norms
+
+    def train(self, vectors: np.ndarray, iterations: int = 10):
+        """Spherical k-means on a sample of `vectors`; `n_lists` defaults to about 4 * sqrt(n)."""
+        rng = np.random.default_rng(self.seed)
+        n = len(vectors)
+        if n == 0:
+            raise ValueError("Cannot train an index on zero vectors.")
+        self.n_lists = int(min(self.n_lists or max(1, 4 * int(np.sqrt(n))), n))
+        sample = self._unit(vectors[np.sort(rng.choice(n, min(n, self.n_lists * self.SAMPLES_PER_LIST), replace=False))])
+        centroids = sample[rng.choice(len(sample), self.n_lists, replace=False)]
+        for _ in range(iterations):
+            assign = self._nearest(sample, centroids)
+            onehot = sp.csr_matrix((np.ones(len(sample), dtype=np.float32), (assign, np.arange(len(sample)))),
+                                   shape=(self.n_lists, len(sample)))
+            sums = np.asarray(onehot @ sample)
+            empty = np.flatnonzero(np.bincount(assign, minlength=self.n_lists) == 0)
+            # Empty lists are re-seeded from random sample points
+            sums[empty] = sample[rng.choice(len(sample), len(empty))]
+            centroids = self._unit(sums)
+        self.centroids = centroids
+        self.trained = n
+        if self.path:
+            os.makedirs(self.path, exist_ok=True)
+            np.save(os.path.join(self.path, "centroids.npy"), centroids)
+            self._write_meta()
+
+    def _nearest(self, x: np.ndarray, centroids: np.ndarray, probe: int = 1) -> np.ndarray:
+        """Indices of the `probe` most similar centroids per row (unordered), or of the best one."""
+        out = np.empty((len(x), probe), dtype=np.int32)
+        rows = max(1, self.SCORE_BUDGET // len(centroids))
+        for b0 in range(0, len(x), rows):
+            sims = x[b0:b0 + rows] @ centroids.T
+            out[b0:b0 + rows] = sims.argmax(axis=1)[:, None] if probe == 1 else np.argpartition(-sims, probe - 1, axis=1)[:, :probe]
+        return out[:, 0] if probe == 1 else out
+
+    def add(self, vectors: np.ndarray, ids: np.ndarray = None):
+        """Appends vectors (ids default to their running position) and assigns them to lists."""
+        if self.centroids is None:
+            self.train(vectors)
+        ids = np.arange(len(self), len(self) + len(vectors), dtype=np.int64) if ids is None else np.asarray(ids, dtype=np.int64)
+        parts = []
+        for b0 in range(0, len(vectors), self.ADD_BATCH):
+            unit = self._unit(vectors[b0:b0 + self.ADD_BATCH])
+            part = (unit.astype(self.dtype), ids[b0:b0 + self.ADD_BATCH], self._nearest(unit, self.centroids))
+            if self.path:
+                self._append(*part)
+            else:
+                parts.append(part)
+        if parts:
+            self._append(*(np.concatenate(cols) for cols in zip(*parts)))
+
+    def _append(self, unit: np.ndarray, ids: np.ndarray, lists: np.ndarray):
+        if self.path:
+            count = len(self)
+            for name, data in ((self._vector_file, unit), ("ids.i64", ids), ("lists.i32", lists)):
+                with open(os.path.join(self.path, name), "ab") as f:
+                    f.truncate(count * data.itemsize * (self.dim if data.ndim == 2 else 1))
+                    f.write(np.ascontiguousarray(data).tobytes())
+            self._write_meta(count + len(unit))
+            self._map(count + len(unit))
+        else:
+            self.vectors = np.concatenate([self.vectors, unit])
+            self.ids = np.concatenate([self.ids, ids])
+            self.lists = np.concatenate([self.lists, lists])
+        self._order = None
+
+    @property
+    def _vector_file(self) -> str:
+        return f"vectors.f{self.dtype.itemsize * 8}"
+
+    def _write_meta(self, count: int = None):
+        meta = {"dim": self.dim, "n_lists": self.n_lists, "n_probe": self.n_probe, "seed": self.seed,
+                "dtype": self.dtype.name, "trained": self.trained, "count": len(self) if count is None else count}
+        tmp = os.path.join(self.path, "meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(self.path, "meta.json"))
+
+    def _map(self, count: int):
+        def mapped(name, dtype, shape):
+            return np.memmap(os.path.join(self.path, name), dtype=dtype, mode="r", shape=shape) if count else np.zeros(shape, dtype)
+        self.vectors = mapped(self._vector_file, self.dtype, (count, self.dim))
+        self.ids = mapped("ids.i64", np.int64, (count,))
+        self.lists = mapped("lists.i32", np.int32, (count,))
+
+    @classmethod
+    def load(cls, path: str) -> Optional['IVFIndex']:
+        """Opens a saved index memory-mapped; None if there is none at `path`."""
+        if not os.path.exists(os.path.join(path, "meta.json")):
+            return None
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        index = cls(meta["dim"], meta["n_lists"], meta["n_probe"], meta["seed"], path=path, dtype=meta.get("dtype", "float32"))
+        index.centroids = np.load(os.path.join(path, "centroids.npy"))
+        index.trained = meta.get("trained", meta["count"])
+        index._map(meta["count"])
+        return index
+
+    def save(self, path: str) -> 'IVFIndex':
+        """Writes this index to `path` and returns the memory-mapped copy."""
+        index = IVFIndex(self.dim, self.n_lists, self.n_probe, self.seed, path=path, dtype=self.dtype)
+        os.makedirs(path, exist_ok=True)
+        for name in (self._vector_file, "ids.i64", "lists.i32"):
+            if os.path.exists(os.path.join(path, name)):
+                os.remove(os.path.join(path, name))
+        index.centroids, index.trained = self.centroids, self.trained
+        np.save(os.path.join(path, "centroids.npy"), self.centroids)
+        index._write_meta(0)
+        if len(self):
+            index._append(np.asarray(self.vectors), np.asarray(self.ids), np.asarray(self.lists))
+        return index
+
+    def _inverted(self) -> Tuple[np.ndarray, np.ndarray]:
+        if self._order is None:
+            self._order = np.argsort(self.lists, kind='stable')
+            self._offsets = np.searchsorted(self.lists[self._order], np.arange(self.n_lists + 1))
+        return self._order, self._offsets
+
+    def search(self, queries: np.ndarray, k: int = 10, n_probe: int = None,
+               before: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-`k` cosine neighbours of each query row: (scores, ids), both (queries, k) and sorted
+        by descending score; missing neighbours have id -1 and score -inf.
+        With `before`, only ids below before[q] are candidates for query q (e.g. only messages
+        older than it), so newer entries cannot crowd them out of the top k.
+        """
+        queries = self._unit(np.atleast_2d(queries))
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        ids = np.full((len(queries), k), -1, dtype=np.int64)
+        if len(self) == 0 or len(queries) == 0:
+            return scores, ids
+        probe = min(n_probe or self.n_probe, self.n_lists)
+        order, offsets = self._inverted()
+        for q0 in range(0, len(queries), self.QUERY_BATCH):
+            q = queries[q0:q0 + self.QUERY_BATCH]
+            s, i = scores[q0:q0 + self.QUERY_BATCH], ids[q0:q0 + self.QUERY_BATCH]
+            limit = None if before is None else np.asarray(before)[q0:q0 + self.QUERY_BATCH]
+            probed = self._nearest(q, self.centroids, probe).reshape(len(q), probe)
+            pairs = np.argsort(probed, axis=None, kind='stable')
+            query_of, list_of = np.divmod(pairs, probe)[0], probed.ravel()[pairs]
+            bounds = np.searchsorted(list_of, np.arange(self.n_lists + 1))
+            for l in np.flatnonzero(np.diff(bounds)):
+                # Stable argsort keeps each list's rows ascending, so the gather reads forward
+                rows = order[offsets[l]:offsets[l + 1]]
+                if not len(rows):
+                    continue
+                qs = query_of[bounds[l]:bounds[l + 1]]
+                sims = q[qs] @ np.asarray(self.vectors[rows], dtype=np.float32).T
+                cand_ids = np.asarray(self.ids[rows])
+                if limit is not None:
+                    sims[cand_ids[None, :] >= limit[qs, None]] = -np.inf
+                kk = min(k, len(rows))
+                top = np.argpartition(-sims, kk - 1, axis=1)[:, :kk]
+                merged_s = np.concatenate([s[qs], np.take_along_axis(sims, top, axis=1)], axis=1)
+                merged_i = np.concatenate([i[qs], cand_ids[top]], axis=1)
+                keep = np.argpartition(-merged_s, k - 1, axis=1)[:, :k]
+                s[qs] = np.take_along_axis(merged_s, keep, axis=1)
+                i[qs] = np.take_along_axis(merged_i, keep, axis=1)
+        ids[scores == -np.inf] = -1
+        ranked = np.argsort(-scores, axis=1, kind='stable')
+        return np.take_along_axis(scores, ranked, axis=1), np.take_along_axis(ids, ranked, axis=1)
@@ -0,0 +1,150 @@
+import time
+import random
+import asyncio
+import logging
+import numpy as np
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class RateLimiter:
+    """
+    Token buckets for requests per minute and (estimated) input tokens per minute.
+    Each bucket holds at most one minute's allowance; None disables that limit.
+    """
+    def __init__(self, requests_per_min: Optional[float] = None, tokens_per_min: Optional[float] = None):
+        self.limits = {'requests': requests_per_min, 'tokens': tokens_per_min}
+        self.levels = {k: v for k, v in self.limits.items() if v}
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: int):
+        async with self._lock:
+            need = {'requests': 1, 'tokens': tokens}
+            while True:
+                now = time.monotonic()
+                for k in self.levels:
+                    self.levels[k] = min(self.limits[k], self.levels[k] + (now - self._updated) * self.limits[k] / 60)
+                self._updated = now
+                # A request larger than a whole minute's budget waits for a full bucket, then proceeds
+                short = {k: min(need[k], self.limits[k]) - self.levels[k] for k in self.levels}
+                wait = max([s * 60 / self.limits[k] for k, s in short.items() if s > 0], default=0.0)
+                if wait <= 0:
+                    for k in self.levels:
+                        self.levels[k] -= min(need[k], self.limits[k])
+                    return
+                await asyncio.sleep(wait)
+
+class AsyncEmbeddingClient:
+    """
+    Concurrent client for OpenAI-compatible embedding endpoints (Perplexity in API mode).
+    Texts are split into batches of at most `batch_size` items / `batch_tokens` estimated
+    tokens, sent over one pooled connection with at most `max_concurrency` requests in
+    flight, throttled by a RateLimiter, and retried with exponential backoff and jitter on
+    connection errors, timeouts, 429s and 5xx responses.
+    Each finished batch is handed to `on_batch(positions, vectors)` as it completes, so
+    callers can persist progress and resume an interrupted run.
+    """
+    def __init__(self, api_key: str, base_url: str, model: str, batch_size: int = 100, batch_tokens: int = 50_000,
+                 max_concurrency: int = 8, requests_per_min: float = None, tokens_per_min: float = None,
+                 max_retries: int = 6, backoff: float = 0.5, max_backoff: float = 30.0, timeout: float = 60.0):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.model = model
+        self.batch_size = batch_size
+        self.batch_tokens = batch_tokens
+        self.max_concurrency = max_concurrency
+        self.requests_per_min = requests_per_min
+        self.tokens_per_min = tokens_per_min
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.stats: Dict[str, float] = {}
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        return len(text) // 4 + 1
+
+    def batches(self, texts: List[str]) -> List[List[int]]:
+        out, current, tokens = [], [], 0
+        for i, t in enumerate(texts):
+            n = self.estimate_tokens(t)
+            if current and (len(current) >= self.batch_size or tokens + n > self.batch_tokens):
+                out.append(current)
+                current, tokens = [], 0
+            current.append(i)
+            tokens += n
+        if current:
+            out.append(current)
+        return out
+
+    def embed(self, texts: List[str], on_batch: Callable[[List[int], np.ndarray], None] = None) -> np.ndarray:
+        """Blocking wrapper around `aembed`; must not be called from a running event loop."""
+        return asyncio.run(self.aembed(texts, on_batch))
+
+    async def aembed(self, texts: List[str], on_batch: Callable[[List[int], np.ndarray], None] = None) -> np.ndarray:
+        """Returns the (n, dim) raw embeddings of `texts` in input order."""
+        try:
+            import openai
+        except ImportError:
+            raise ImportError("Please install openai.")
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        self.stats = {'requests': 0, 'retries': 0, 'batches': 0}
+        start = time.perf_counter()
+        limiter = RateLimiter(self.requests_per_min, self.tokens_per_min)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        results: List[Optional[np.ndarray]] = [None] * len(texts)
+
+        # Retries are handled here (with the rate limiter in the loop), not by the SDK
+        async with openai.AsyncOpenAI(api_key=self.api_key, base_url=self.base_url,
+                                      max_retries=0, timeout=self.timeout) as client:
+            async def run_batch(positions: List[int]):
+                inputs = [texts[i] for i in positions]
+                tokens = sum(self.estimate_tokens(t) for t in inputs)
+                async with semaphore:
+                    vectors = await self._request(client, limiter, inputs, tokens)
+                for i, v in zip(positions, vectors):
+                    results[i] = v
+                self.stats['batches'] += 1
+                if on_batch is not None:
+                    on_batch(positions, vectors)
+
+            tasks = [asyncio.ensure_future(run_batch(b)) for b in self.batches(texts)]
+            try:
+                await asyncio.gather(*tasks)
+            except BaseException:
+                for t in tasks:
+                    t.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+
+        self.stats['seconds'] = round(time.perf_counter() - start, 3)
+        logger.info(f"Embedded {len(texts)} texts via API in {self.stats['batches']} batches "
+                    f"({self.stats['retries']} retries, {self.stats['seconds']:.1f}s)")
+        return np.vstack(results).astype(np.float32)
+
+    async def _request(self, client, limiter: RateLimiter, inputs: List[str], tokens: int) -> np.ndarray:
+        import openai
+        for attempt in range(self.max_retries + 1):
+            await limiter.acquire(tokens)
+            self.stats['requests'] += 1
+            try:
+                resp = await client.embeddings.create(model=self.model, input=inputs)
+                data = sorted(resp.data, key=lambda e: e.index)
+                return np.array([e.embedding for e in data], dtype=np.float32)
+            except (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError) as e:
+                if attempt == self.max_retries:
+                    raise
+                error = e
+            except openai.APIStatusError as e:
+                # Other 4xx errors (bad key, bad input) will not succeed on retry
+                if e.status_code not in (408, 409) or attempt == self.max_retries:
+                    raise
+                error = e
+            delay = min(self.max_backoff, self.backoff * 2 ** attempt) * random.uniform(0.5, 1.0)
+            self.stats['retries'] += 1
+            logger.warning(f"Embedding request failed ({type(error).__name__}); retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
@@ -0,0 +1,150 @@
+import os
+import sqlite3
+import hashlib
+import logging
+import threading
+import time
+import unicodedata
+import numpy as np
+from typing import List, Tuple, Dict
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed embedding store.
+    Keys are SHA-1 digests of (model name, normalized text). Vectors are kept as float32
+    in chunked .npy files that are opened memory-mapped, with a small SQLite index mapping
+    each key to its (chunk, row). Once the store grows past `max_bytes`, the least recently
+    used chunks are evicted.
+    """
+    CHUNK_ROWS = 65536
+    _QUERY_BATCH = 500
+
+    def __init__(self, cache_dir: str, dim: int, max_bytes: int = 2 * 1024 ** 3):
+        self.cache_dir = cache_dir
+        self.dim = dim
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._mmaps: Dict[int, np.ndarray] = {}
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(cache_dir, "index.sqlite"), check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, chunk INTEGER, row INTEGER);
+            CREATE TABLE IF NOT EXISTS chunks (id INTEGER PRIMARY KEY, rows INTEGER, bytes INTEGER, last_used REAL);
+            CREATE INDEX IF NOT EXISTS entries_chunk ON entries(chunk);
+        """)
+        self._db.commit()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Unicode NFC + surrounding whitespace stripped; the embedded text itself is not altered."""
+        return unicodedata.normalize("NFC", text).strip()
+
+    def key(self, model: str, text: str) -> str:
+        return hashlib.sha1(f"{model}\x00{self.normalize(text)}".encode("utf-8")).hexdigest()
+
+    def _chunk_path(self, chunk_id: int) -> str:
+        return os.path.join(self.cache_dir, f"chunk_{chunk_id:08d}.npy")
+
+    def _load_chunk(self, chunk_id: int) -> np.ndarray:
+        arr = self._mmaps.get(chunk_id)
+        if arr is None:
+            arr = np.load(self._chunk_path(chunk_id), mmap_mode="r")
+            self._mmaps[chunk_id] = arr
+        return arr
+
+    def get_many(self, keys: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Looks up vectors for `keys`.
+        Returns:
+            vectors: (len(keys), dim) float32 matrix; rows of misses are zero.
+            hit: boolean mask of which keys were found.
+        """
+        out = np.zeros((len(keys), self.dim), dtype=np.float32)
+        hit = np.zeros(len(keys), dtype=bool)
+        positions: Dict[str, List[int]] = {}
+        for i, k in enumerate(keys):
+            positions.setdefault(k, []).append(i)
+
+        with self._lock:
+            found = []
+            uniq = list(positions)
+            for s in range(0, len(uniq), self._QUERY_BATCH):
+                batch = uniq[s:s + self._QUERY_BATCH]
+                q = f"SELECT key, chunk, row FROM entries WHERE key IN ({','.join('?' * len(batch))})"
+                found.extend(self._db.execute(q, batch).fetchall())
+
+            by_chunk: Dict[int, List[Tuple[str, int]]] = {}
+            for k, chunk, row in found:
+                by_chunk.setdefault(chunk, []).append((k, row))
+            for chunk, rows in by_chunk.items():
+                arr = self._load_chunk(chunk)
+                for k, row in rows:
+                    idx = positions[k]
+                    out[idx] = arr[row]
+                    hit[idx] = True
+            if by_chunk:
+                now = time.time()
+                self._db.executemany("UPDATE chunks SET last_used = ? WHERE id = ?", [(now, c) for c in by_chunk])
+                self._db.commit()
+
+            n_hit = int(hit.sum())
+            self.hits += n_hit
+            self.misses += len(keys) - n_hit
+        return out, hit
+
+    def put_many(self, keys: List[str], vectors: np.ndarray):
+        """Stores vectors under `keys`, skipping keys already present, then enforces the size budget."""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            seen = set()
+            fresh = []
+            for i, k in enumerate(keys):
+                if k in seen:
+                    continue
+                seen.add(k)
+                if self._db.execute("SELECT 1 FROM entries WHERE key = ?", (k,)).fetchone() is None:
+                    fresh.append(i)
+
+            for s in range(0, len(fresh), self.CHUNK_ROWS):
+                rows = fresh[s:s + self.CHUNK_ROWS]
+                block = np.ascontiguousarray(vectors[rows])
+                cur = self._db.execute("INSERT INTO chunks (rows, bytes, last_used) VALUES (?, ?, ?)",
+                                       (len(rows), block.nbytes, time.time()))
+                chunk_id = cur.lastrowid
+                tmp = self._chunk_path(chunk_id) + ".tmp"
+                with open(tmp, "wb") as f:
+                    np.save(f, block)
+                os.replace(tmp, self._chunk_path(chunk_id))
+                self._db.executemany("INSERT OR IGNORE INTO entries (key, chunk, row) VALUES (?, ?, ?)",
+                                     [(keys[i], chunk_id, r) for r, i in enumerate(rows)])
+            self._db.commit()
+            self._evict()
+
+    def _evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(bytes), 0) FROM chunks").fetchone()[0]
+        while total > self.max_bytes:
+            row = self._db.execute("SELECT id, bytes FROM chunks ORDER BY last_used ASC LIMIT 1").fetchone()
+            if row is None:
+                break
+            chunk_id, nbytes = row
+            self._db.execute("DELETE FROM entries WHERE chunk = ?", (chunk_id,))
+            self._db.execute("DELETE FROM chunks WHERE id = ?", (chunk_id,))
+            self._mmaps.pop(chunk_id, None)
+            try:
+                os.remove(self._chunk_path(chunk_id))
+            except FileNotFoundError:
+                pass
+            total -= nbytes
+            logger.info(f"Evicted embedding cache chunk {chunk_id} ({nbytes} bytes)")
+        self._db.commit()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            nbytes = self._db.execute("SELECT COALESCE(SUM(bytes), 0) FROM chunks").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": nbytes}
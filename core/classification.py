@@ -1,5 +1,10 @@
 from typing import List, Dict
 import logging
+import numpy as np
+from core.inference import InferenceScheduler
+from core.onnx_backend import check_backend
+from core.metrics import count, instrument
+from core.compact import EmbeddingCodec
 
 logger = logging.getLogger(__name__)
 
@@ -9,18 +14,38 @@ class ZeroShotClassifier:
     """
     LABELS = ["solution", "code", "idea", "resource", "question", "reaction"]
     
-    def __init__(self):
+    MODEL = "facebook/bart-large-mnli"
+    
+    def __init__(self, max_length: int = 128, token_budget: int = 16384,
+                 backend: str = 'torch', onnx_dir: str = None, threads: int = None):
+        """`backend='onnx'` runs an int8 ONNX Runtime export with `threads` intra-op threads."""
+        check_backend(backend)
+        self.backend = backend
         try:
             from transformers import pipeline
-            logger.info("Loading BART Zero-Shot Classifier (this may take a minute)...")
-            self.classifier = pipeline("zero-shot-classification", model="facebook/bart-large-mnli")
-            logger.info("Loaded facebook/bart-large-mnli for Zero-Shot Classification")
+            logger.info(f"Loading BART Zero-Shot Classifier ({backend}, this may take a minute)...")
+            if backend == 'onnx':
+                from core.onnx_backend import load_sequence_classifier
+                model, tokenizer = load_sequence_classifier(self.MODEL, onnx_dir, threads)
+                self.classifier = pipeline("zero-shot-classification", model=model, tokenizer=tokenizer)
+            else:
+                self.classifier = pipeline("zero-shot-classification", model=self.MODEL)
+            logger.info(f"Loaded {self.MODEL} for Zero-Shot Classification")
         except ImportError:
             raise ImportError("Please install transformers and torch.")
+        # Each text is scored as one premise/hypothesis pair per label (~8 hypothesis tokens)
+        self.scheduler = InferenceScheduler(self.classifier.tokenizer, max_length, token_budget,
+                                            pairs_per_text=len(self.LABELS), extra_tokens=8)
 
+    @instrument('nli.analyze_batch')
     def analyze_batch(self, texts: List[str]) -> List[Dict]:
         """Returns top predicted label and score for each text."""
-        out = self.classifier(texts, candidate_labels=self.LABELS, multi_label=False)
+        return self.scheduler.run(texts, self._infer_batch, name='classification')
+
+    def _infer_batch(self, texts: List[str]) -> List[Dict]:
+        # The zero-shot pipeline has no max_length argument, so long texts are cut beforehand
+        out = self.classifier(self.scheduler.truncate(texts), candidate_labels=self.LABELS,
+                              multi_label=False, batch_size=len(texts) * len(self.LABELS))
         results = []
         for res in out:
             results.append({
@@ -28,3 +53,86 @@ class ZeroShotClassifier:
                 'score': res['scores'][0]
             })
         return results
+
+class PrototypeClassifier:
+    """
+    Classifies messages by cosine similarity between their existing embeddings and one
+    prototype embedding per label (the mean of that label's seed texts), in a single matrix
+    product. With an `nli` ZeroShotClassifier, messages whose top-two similarity gap is
+    below `margin` are re-classified by NLI (cascade); without one, all labels come from
+    the prototypes. Prototypes are embedded at full precision and brought into the storage
+    form of the messages' codec when compared, so they follow a chat's own PCA basis.
+    """
+    LABELS = ZeroShotClassifier.LABELS
+    SEEDS = {
+        "solution": ["This fixed it, you need to restart the service after changing the config.",
+                     "The answer is to upgrade the package, that solves the error.",
+                     "Try clearing the cache first, that worked for me."],
+        "code": ["def main():\n    return 0",
+                 "import numpy as np\nx = np.zeros(10)",
+                 "SELECT * FROM users WHERE id = 1;"],
+        "idea": ["What if we built a bot that summarizes the chat every week?",
+                 "We could add a leaderboard to make it more fun.",
+                 "I have an idea for a new feature for the project."],
+        "resource": ["Here is a good tutorial: https://example.com/guide",
+                     "Check out this paper on transformers, it's really useful.",
+                     "Sharing the docs link for the API."],
+        "question": ["How do I install this on Windows?",
+                     "Does anyone know why my build keeps failing?",
+                     "What time is the meeting tomorrow?"],
+        "reaction": ["haha nice", "lol", "Thanks a lot!", "wow 🔥🔥"],
+    }
+
+    def __init__(self, embed_engine, nli: 'ZeroShotClassifier' = None, margin: float = 0.05,
+                 seeds: Dict[str, List[str]] = None):
+        self.embed_engine = embed_engine
+        self.nli = nli
+        self.margin = margin
+        self.seeds = seeds or self.SEEDS
+        self.stats: Dict[str, int] = {}
+        self._prototypes = None
+
+    @staticmethod
+    def _unit(x: np.ndarray) -> np.ndarray:
+        x = np.asarray(x, dtype=np.float32)
+        norms = np.linalg.norm(x, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return x / norms
+
+    @property
+    def prototypes(self) -> np.ndarray:
+        """(labels, full dim) unit prototype matrix, embedded on first use."""
+        if self._prototypes is None:
+            protos = [self._unit(self.embed_engine.encode(self.seeds[label], EmbeddingCodec())).mean(axis=0)
+                      for label in self.LABELS]
+            self._prototypes = self._unit(np.vstack(protos))
+        return self._prototypes
+
+    def similarities(self, embeddings: np.ndarray, codec: EmbeddingCodec = None) -> np.ndarray:
+        """
+        (n, labels) cosine similarity of each message to each label prototype, for embeddings
+        encoded with `codec` (default the engine's).
+        """
+        protos = self._unit((codec or self.embed_engine.codec).encode(self.prototypes))
+        return self._unit(embeddings) @ protos.T
+
+    @instrument('prototype.analyze_batch')
+    def analyze_batch(self, texts: List[str], embeddings: np.ndarray, codec: EmbeddingCodec = None) -> List[Dict]:
+        """Returns top label, score and source ('prototype' or 'nli') for each text."""
+        if not texts:
+            self.stats = {}
+            return []
+        sims = self.similarities(embeddings, codec)
+        top2 = np.sort(sims, axis=1)[:, -2:]
+        best = sims.argmax(axis=1)
+        results = [{'label': self.LABELS[b], 'score': float(s), 'source': 'prototype'}
+                   for b, s in zip(best.tolist(), top2[:, 1].tolist())]
+
+        uncertain = np.flatnonzero(top2[:, 1] - top2[:, 0] < self.margin) if self.nli else np.zeros(0, dtype=np.int64)
+        if len(uncertain):
+            for i, res in zip(uncertain.tolist(), self.nli.analyze_batch([texts[i] for i in uncertain.tolist()])):
+                results[i] = dict(res, source='nli')
+        self.stats = {'messages': len(texts), 'nli_fallback': len(uncertain)}
+        count('nli_fallback', len(uncertain))
+        logger.info(f"Prototype classification: {len(texts)} messages, {len(uncertain)} sent to NLI")
+        return results
@@ -0,0 +1,156 @@
+import logging
+import threading
+import numpy as np
+from typing import List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+class QuantizedEmbeddings:
+    """
+    int8 embedding matrix with one float32 scale per row (row ~= codes * scale), about a quarter
+    of the float32 size. Row indexing and slicing return another QuantizedEmbeddings; NumPy
+    conversion (np.asarray, astype) dequantizes, so consumers that read block by block only
+    ever expand the block in hand.
+    """
+    dtype = np.dtype(np.float32)
+    ndim = 2
+
+    def __init__(self, codes: np.ndarray, scales: np.ndarray):
+        self.codes = codes
+        self.scales = scales
+
+    @classmethod
+    def quantize(cls, vectors: np.ndarray) -> 'QuantizedEmbeddings':
+        vectors = np.asarray(vectors, dtype=np.float32)
+        scales = np.abs(vectors).max(axis=1) / 127 if len(vectors) else np.zeros(0, dtype=np.float32)
+        scales[scales == 0] = 1.0
+        codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+        return cls(codes, scales.astype(np.float32))
+
+    @classmethod
+    def concat(cls, parts: List['QuantizedEmbeddings']) -> 'QuantizedEmbeddings':
+        return cls(np.concatenate([p.codes for p in parts]), np.concatenate([p.scales for p in parts]))
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.scales.nbytes
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, (int, np.integer)):
+            return self.codes[idx] * self.scales[idx]
+        return QuantizedEmbeddings(self.codes[idx], self.scales[idx])
+
+    def __array__(self, dtype=None, copy=None):
+        out = self.codes.astype(np.float32)
+        out *= self.scales[:, None]
+        return out if dtype is None else out.astype(dtype, copy=False)
+
+    def astype(self, dtype, copy: bool = True) -> np.ndarray:
+        return np.asarray(self, dtype=dtype)
+
+Embeddings = Union[np.ndarray, QuantizedEmbeddings]
+
+def concat_embeddings(parts: List[Embeddings]) -> Embeddings:
+    """Row-wise concatenation that keeps the compact form of its parts."""
+    if any(isinstance(p, QuantizedEmbeddings) for p in parts):
+        return QuantizedEmbeddings.concat([p if isinstance(p, QuantizedEmbeddings) else QuantizedEmbeddings.quantize(p)
+                                           for p in parts])
+    return np.concatenate(parts)
+
+class EmbeddingCodec:
+    """
+    Storage form of EmbeddingEngine output.
+    `storage` is 'float32', 'float16' or 'int8' (QuantizedEmbeddings). With `dims`, vectors are
+    first reduced to that many dimensions, either by keeping the leading ones ('truncate') or
+    by projecting onto principal directions ('pca'), and re-normalized.
+    The PCA basis is fitted on the first vectors encoded. A pipeline gives each chat its own
+    codec (`fork`) and keeps the basis with the chat's embeddings, so its incremental runs
+    project the same way and no chat is projected onto another chat's directions.
+    """
+    STORAGES = ('float32', 'float16', 'int8')
+    PROJECTIONS = ('truncate', 'pca')
+    # Rows the PCA basis is fitted on, at most; a basis fitted on fewer than
+    # MIN_ROWS_PER_DIM * dims rows is `underfitted`
+    FIT_ROWS = 20000
+    MIN_ROWS_PER_DIM = 4
+
+    def __init__(self, storage: str = 'float32', dims: int = None, projection: str = 'truncate',
+                 basis: np.ndarray = None, fit_rows: int = 0, seed: int = 0):
+        if storage not in self.STORAGES:
+            raise ValueError(f"Unknown embedding storage '{storage}'. Use one of {self.STORAGES}.")
+        if projection not in self.PROJECTIONS:
+            raise ValueError(f"Unknown projection '{projection}'. Use one of {self.PROJECTIONS}.")
+        self.storage = storage
+        self.dims = dims
+        self.projection = projection
+        self.seed = seed
+        # The PCA basis and the number of rows it was fitted on
+        self.basis: Optional[np.ndarray] = basis
+        self.fit_rows = fit_rows
+        self._lock = threading.Lock()
+
+    def fork(self, basis: np.ndarray = None, fit_rows: int = 0) -> 'EmbeddingCodec':
+        """A codec with the same settings and `basis` (unfitted by default), e.g. for one chat."""
+        return EmbeddingCodec(self.storage, self.dims, self.projection, basis, fit_rows, self.seed)
+
+    @property
+    def fingerprint(self) -> str:
+        """Identifies the storage settings; a PCA basis is kept alongside the vectors it projected."""
+        parts = [self.storage]
+        if self.dims:
+            parts.append(f"{self.projection}{self.dims}")
+        return "/".join(parts)
+
+    @property
+    def underfitted(self) -> bool:
+        """Whether the PCA basis was fitted on too few rows to trust its directions."""
+        return self.basis is not None and self.fit_rows < self.MIN_ROWS_PER_DIM * self.dims
+
+    def encode(self, vectors: np.ndarray) -> Embeddings:
+        """Reduces and converts unit float32 `vectors` to the storage form."""
+        vectors = self._reduce(np.asarray(vectors, dtype=np.float32))
+        if self.storage == 'float16':
+            return vectors.astype(np.float16)
+        if self.storage == 'int8':
+            return QuantizedEmbeddings.quantize(vectors)
+        return vectors
+
+    def _reduce(self, vectors: np.ndarray) -> np.ndarray:
+        if not self.dims or self.dims >= vectors.shape[1]:
+            return vectors
+        if self.projection == 'truncate':
+            reduced = vectors[:, :self.dims]
+        else:
+            if self.basis is None:
+                if not len(vectors):
+                    return np.zeros((0, self.dims), dtype=np.float32)
+                self.fit(vectors)
+            reduced = vectors @ self.basis.T
+        norms = np.linalg.norm(reduced, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return np.ascontiguousarray(reduced / norms, dtype=np.float32)
+
+    def fit(self, vectors: np.ndarray):
+        """
+        PCA basis (uncentered, so dot products are preserved best) from up to FIT_ROWS of
+        `vectors`. With fewer rows than `dims`, the basis is completed with random
+        orthogonal directions.
+        """
+        with self._lock:
+            if self.basis is not None:
+                return
+            rng = np.random.default_rng(self.seed)
+            sample = vectors[np.sort(rng.choice(len(vectors), min(len(vectors), self.FIT_ROWS), replace=False))]
+            basis = np.linalg.svd(sample.astype(np.float64), full_matrices=False)[2][:self.dims]
+            if len(basis) < self.dims:
+                extra = rng.normal(size=(self.dims - len(basis), vectors.shape[1]))
+                basis = np.linalg.qr(np.vstack([basis, extra]).T)[0].T
+            self.basis, self.fit_rows = basis.astype(np.float32), len(sample)
+            logger.info(f"Fitted {self.dims}-dim PCA embedding basis on {len(sample)} vectors")
@@ -1,7 +1,12 @@
 import os
 import logging
+import threading
+import importlib.util
 import numpy as np
 from typing import List, Tuple, Dict
+from core.onnx_backend import check_backend
+from core.metrics import count, instrument
+from core.compact import EmbeddingCodec, Embeddings
 
 logger = logging.getLogger(__name__)
 
@@ -9,15 +14,39 @@ class EmbeddingEngine:
     """
     V6 SOTA Embedding Engine using BAAI/bge-m3 (Dense, Multilingual, Multimodal-capable)
     or Perplexity API.
+    `storage`, `dims` and `projection` select a compact output form (see EmbeddingCodec):
+    float16, or int8 with a per-vector scale, optionally truncated or PCA-projected to `dims`.
+    The cache keeps full float32 vectors, so changing the form never re-embeds.
     """
     LOCAL_MODEL = 'BAAI/bge-m3'
     API_MODEL   = 'pplx-embed-v1'
+    API_BASE_URL = 'https://api.perplexity.ai'
+    # Vectors finished by the API client are written to the cache in groups of this many
+    CHECKPOINT_ROWS = 4096
 
-    def __init__(self, mode: str = 'local', api_key: str = None):
+    def __init__(self, mode: str = 'local', api_key: str = None,
+                 cache_dir: str = None, cache_max_bytes: int = 2 * 1024 ** 3,
+                 backend: str = 'torch', onnx_dir: str = None, threads: int = None,
+                 api_options: Dict = None, storage: str = 'float32', dims: int = None,
+                 projection: str = 'truncate'):
+        check_backend(backend)
         self.mode = mode
+        # Local model runtime: eager fp32 PyTorch, or an int8 ONNX Runtime export
+        self.backend = backend
+        self.onnx_dir = onnx_dir
+        self.threads = threads
+        # Passed on to AsyncEmbeddingClient (max_concurrency, requests_per_min, tokens_per_min, ...)
+        self.api_options = api_options or {}
         self.dim = 1024
         self._model = None
         self._client = None
+        self._load_lock = threading.Lock()
+        self.cache = None
+        if cache_dir:
+            from core.cache import EmbeddingCache
+            self.cache = EmbeddingCache(cache_dir, dim=self.dim, max_bytes=cache_max_bytes)
+        # The pipeline forks a codec per chat from this one, so each keeps its own PCA basis
+        self.codec = EmbeddingCodec(storage, dims, projection)
         
         if mode == 'local':
             self._init_local()
@@ -27,33 +56,113 @@ class EmbeddingEngine:
             raise ValueError("Only 'local' and 'api' modes supported in V6.")
 
     def _init_local(self):
-        try:
-            from sentence_transformers import SentenceTransformer
-            self._model = SentenceTransformer(self.LOCAL_MODEL)
-            logger.info(f"Loaded V6 Local Model: {self.LOCAL_MODEL} (1024-dim, Multilingual)")
-        except ImportError:
+        # The model itself is loaded on first encode (or an explicit load()), keeping construction cheap
+        if importlib.util.find_spec('sentence_transformers') is None:
             raise ImportError("Please install sentence-transformers.")
 
+    def load(self):
+        """Loads the local model now rather than on first encode; a no-op in API mode."""
+        with self._load_lock:
+            if self.mode == 'local' and self._model is None:
+                if self.backend == 'onnx':
+                    from core.onnx_backend import load_sentence_transformer
+                    self._model = load_sentence_transformer(self.LOCAL_MODEL, self.onnx_dir, self.threads)
+                else:
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(self.LOCAL_MODEL)
+                logger.info(f"Loaded V6 Local Model: {self.LOCAL_MODEL} (1024-dim, Multilingual, {self.backend})")
+        return self
+
     def _init_api(self, api_key: str):
         key = api_key or os.environ.get('PPLX_API_KEY')
         if not key:
             raise ValueError("PPLX_API_KEY not set!")
-        from openai import OpenAI
-        self._client = OpenAI(api_key=key, base_url="https://api.perplexity.ai")
+        if importlib.util.find_spec('openai') is None:
+            raise ImportError("Please install openai.")
+        from core.api_client import AsyncEmbeddingClient
+        self._client = AsyncEmbeddingClient(api_key=key, base_url=os.environ.get('PPLX_BASE_URL', self.API_BASE_URL),
+                                            model=self.API_MODEL, **self.api_options)
         logger.info(f"Loaded V6 API Model: {self.API_MODEL}")
 
-    def encode(self, texts: List[str]) -> np.ndarray:
+    @property
+    def model_name(self) -> str:
+        if self.mode == 'api':
+            return self.API_MODEL
+        # Quantized vectors differ slightly, so they get their own cache keys
+        return self.LOCAL_MODEL + ('@onnx-int8' if self.backend == 'onnx' else '')
+
+    @instrument('embeddings.encode')
+    def encode(self, texts: List[str], codec: EmbeddingCodec = None) -> Embeddings:
+        """
+        Embeds `texts` and returns an (n, dim) matrix in input order, in the storage form of
+        `codec` (default `self.codec`). With a cache configured, only texts missing from it
+        are sent to the model.
+        """
+        return (codec or self.codec).encode(self._encode_cached(texts))
+
+    def empty(self, codec: EmbeddingCodec = None) -> Embeddings:
+        """A zero-row matrix in the storage form."""
+        return (codec or self.codec).encode(np.zeros((0, self.dim), dtype=np.float32))
+
+    def _encode_cached(self, texts: List[str]) -> np.ndarray:
+        if self.cache is None:
+            return self._encode(texts)
+
+        keys = [self.cache.key(self.model_name, t) for t in texts]
+        out, hit = self.cache.get_many(keys)
+        count('cache_hits', int(hit.sum()))
+        count('cache_misses', int((~hit).sum()))
+        if hit.all():
+            return out
+
+        # Embed each distinct missing text once, then scatter back to every position
+        first_pos: Dict[str, int] = {}
+        for i in np.flatnonzero(~hit):
+            first_pos.setdefault(keys[i], int(i))
+        miss_keys = list(first_pos)
+        if self.mode == 'api':
+            # Completed API batches are cached as they arrive, so a failed run resumes where it stopped
+            pending_keys, pending_vecs = [], []
+
+            def checkpoint(positions, vectors, force=False):
+                if len(positions):
+                    pending_keys.extend(miss_keys[p] for p in positions)
+                    pending_vecs.extend(self._normalize(vectors))
+                if pending_keys and (force or len(pending_keys) >= self.CHECKPOINT_ROWS):
+                    self.cache.put_many(pending_keys, np.asarray(pending_vecs))
+                    pending_keys.clear()
+                    pending_vecs.clear()
+
+            try:
+                miss_embs = self._normalize(self._client.embed([texts[first_pos[k]] for k in miss_keys], checkpoint))
+            finally:
+                checkpoint([], [], force=True)
+        else:
+            miss_embs = np.asarray(self._encode([texts[first_pos[k]] for k in miss_keys]), dtype=np.float32)
+            self.cache.put_many(miss_keys, miss_embs)
+
+        row_of = {k: r for r, k in enumerate(miss_keys)}
+        for i in np.flatnonzero(~hit):
+            out[i] = miss_embs[row_of[keys[i]]]
+        logger.info(f"Embedding cache: {int(hit.sum())} hits, {len(miss_keys)} new texts embedded")
+        return out
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
         if self.mode == 'api':
             return self._encode_api(texts)
         return self._encode_local(texts)
 
     def _encode_local(self, texts: List[str]) -> np.ndarray:
+        if self._model is None:
+            self.load()
         return self._model.encode(texts, batch_size=32, show_progress_bar=True, normalize_embeddings=True)
 
     def _encode_api(self, texts: List[str]) -> np.ndarray:
-        from sklearn.preprocessing import normalize
-        all_embs = []
-        for i in range(0, len(texts), 100):
-            resp = self._client.embeddings.create(model=self.API_MODEL, input=texts[i:i+100])
-            all_embs.extend(e.embedding for e in resp.data)
-        return normalize(np.array(all_embs, dtype=np.float32))
+        return self._normalize(self._client.embed(texts))
+
+    @staticmethod
+    def _normalize(vectors) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
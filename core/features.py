@@ -0,0 +1,160 @@
+import re
+import numpy as np
+from typing import Dict, List, Union
+from core.parser import Message
+from core.table import MessageTable
+from core.metrics import instrument
+
+Messages = Union[List[Message], MessageTable]
+
+class BehaviorFeatureExtractor:
+    """
+    Per-message behavioral features for ValueScorer, computed over the table's content buffer
+    with NumPy instead of per-message Python objects.
+
+    Messages are joined into one newline-separated buffer. Word counts, '?' marks and regex
+    matches (code, links, question openers) are located in it once and mapped back to their
+    message by offset. Words are split on whitespace and PUNCTUATION, case-insensitively, for
+    both the total and the distinct counts; '?' inside links (query strings) is not a question. Reply structure comes from shifted sender/timestamp columns:
+    - a conversation starts after a gap of more than `gap_mins`;
+    - a message replies to the previous one when the sender changes within `reply_window_mins`
+      (its response latency is the time between them);
+    - a question is answered by the first message of each other sender within
+      `answer_window_mins` after it, before the next question.
+    First uses of a word by a sender and first replies of an engager to a sender are counted
+    on the message where they happen, so per-sender sums give the distinct counts.
+    """
+    FIELDS = ('replies_triggered', 'conversation_starts', 'questions_asked', 'questions_answered', 'code_snippets',
+              'links_shared', 'total_words', 'num_unique_words', 'num_unique_engagers')
+    CODE_RE = re.compile(rb"```|`[^`\n]+`")
+    LINK_RE = re.compile(rb"(?:https?://|www\.)[^\s]+", re.IGNORECASE)
+    # Lines opening with these ask a question even without a '?'; auxiliaries ("Do this first.") need the mark
+    QUESTION_RE = re.compile(rb"(?:^|(?<=\n))[ \t]*(?:what|why|how|when|where|who|which|anyone)\b", re.IGNORECASE)
+    PUNCTUATION = b'.,!?;:()[]{}<>"*_~`|'
+    # bytes.split() whitespace, so NumPy word boundaries agree with it
+    _SPACE = np.zeros(256, dtype=bool)
+    _SPACE[[9, 10, 11, 12, 13, 32]] = True
+    _TO_SPACE = bytes.maketrans(PUNCTUATION, b' ' * len(PUNCTUATION))
+    # Words are hashed this many buffer bytes at a time, bounding the transient bytes objects
+    HASH_CHUNK = 1 << 22
+
+    def __init__(self, gap_mins: int = 60, reply_window_mins: int = 30, answer_window_mins: int = 60):
+        self.gap_mins = gap_mins
+        self.reply_window_mins = reply_window_mins
+        self.answer_window_mins = answer_window_mins
+
+    @instrument('features.extract')
+    def extract(self, messages: Messages) -> Dict[str, np.ndarray]:
+        """
+        Returns per-message columns named like the UserStats fields they sum into
+        (COUNTER_FIELDS), plus 'response_latency' (seconds, NaN if not a reply).
+        """
+        table = messages if isinstance(messages, MessageTable) else MessageTable.from_messages(messages)
+        n = len(table)
+        if n == 0:
+            return dict({f: np.zeros(0, dtype=np.int64) for f in self.FIELDS}, response_latency=np.zeros(0))
+
+        buf, starts = self._joined(table)
+        links = np.array([m.span() for m in self.LINK_RE.finditer(buf)], dtype=np.int64).reshape(-1, 2)
+        words = buf.lower().translate(self._TO_SPACE)
+        cols = {
+            'total_words': np.bincount(self._locate(self._word_starts(words), starts), minlength=n),
+            'code_snippets': self._code_snippets(buf, starts, n),
+            'links_shared': np.bincount(self._locate(links[:, 0], starts), minlength=n),
+        }
+        marks = np.flatnonzero(np.frombuffer(buf, dtype=np.uint8) == ord('?'))
+        if len(links):
+            # A '?' in a link's query string does not make a question
+            inside = self._locate(marks, links[:, 0])
+            marks = marks[(inside < 0) | (marks >= links[np.maximum(inside, 0), 1])]
+        is_question = np.bincount(self._locate(marks, starts), minlength=n) > 0
+        is_question |= self._count_matches(self.QUESTION_RE, buf, starts, n) > 0
+        cols['questions_asked'] = is_question.astype(np.int64)
+        cols['num_unique_words'] = self._first_words(words, starts, n, table.sender_ids)
+        cols.update(self._replies(table, is_question))
+        return cols
+
+    def annotate(self, table: MessageTable) -> MessageTable:
+        """Extracts the features and stores them as annotation columns of `table`."""
+        for name, values in self.extract(table).items():
+            table.annotate(name, values)
+        return table
+
+    @staticmethod
+    def _joined(table: MessageTable):
+        """The table's contents joined by newlines, and each message's start offset in it."""
+        n = len(table)
+        rel = table.offsets - table.offsets[0]
+        raw = np.frombuffer(table.content, dtype=np.uint8, count=int(rel[-1]), offset=int(table.offsets[0]))
+        joined = np.insert(raw, rel[1:-1], ord('\n'))
+        return joined.tobytes(), rel[:-1] + np.arange(n)
+
+    @staticmethod
+    def _locate(positions: np.ndarray, starts: np.ndarray) -> np.ndarray:
+        return np.searchsorted(starts, positions, side='right') - 1
+
+    def _count_matches(self, pattern: re.Pattern, buf: bytes, starts: np.ndarray, n: int) -> np.ndarray:
+        positions = np.fromiter((m.start() for m in pattern.finditer(buf)), dtype=np.int64)
+        return np.bincount(self._locate(positions, starts), minlength=n)
+
+    def _code_snippets(self, buf: bytes, starts: np.ndarray, n: int) -> np.ndarray:
+        """Fenced blocks (an unclosed fence counts) plus inline code spans per message."""
+        fences, inline = [], []
+        for m in self.CODE_RE.finditer(buf):
+            (fences if m.group() == b"```" else inline).append(m.start())
+        per_fence = np.bincount(self._locate(np.asarray(fences, dtype=np.int64), starts), minlength=n)
+        per_inline = np.bincount(self._locate(np.asarray(inline, dtype=np.int64), starts), minlength=n)
+        return (per_fence + 1) // 2 + per_inline
+
+    def _word_starts(self, buf: bytes) -> np.ndarray:
+        space = self._SPACE[np.frombuffer(buf, dtype=np.uint8)]
+        return np.flatnonzero(~space & np.concatenate(([True], space[:-1])))
+
+    def _first_words(self, buf: bytes, starts: np.ndarray, n: int, sender_ids: np.ndarray) -> np.ndarray:
+        """Per message, the number of words its sender uses there for the first time."""
+        word_pos = self._word_starts(buf)
+        word_msg = self._locate(word_pos, starts)
+        # Chunks end where a word starts, so no word is split across two
+        idx = np.searchsorted(word_pos, np.arange(self.HASH_CHUNK, len(buf), self.HASH_CHUNK))
+        bounds = [0] + np.unique(word_pos[idx[idx < len(word_pos)]]).tolist() + [len(buf)]
+        hashes = np.concatenate([np.fromiter(map(hash, buf[a:b].split()), dtype=np.int64)
+                                 for a, b in zip(bounds, bounds[1:])]).view(np.uint64)
+        # Mixing the sender into the word hash gives one key per (sender, word) pair
+        keys = hashes ^ (sender_ids[word_msg].astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15))
+        _, first = np.unique(keys, return_index=True)
+        return np.bincount(word_msg[first], minlength=n)
+
+    def _replies(self, table: MessageTable, is_question: np.ndarray) -> Dict[str, np.ndarray]:
+        n = len(table)
+        sid = table.sender_ids.astype(np.int64)
+        ts = np.maximum.accumulate(table.timestamps)
+        k = max(len(table.senders), 1)
+        gap = np.diff(ts, prepend=ts[0])
+
+        starts = np.ones(n, dtype=bool)
+        starts[1:] = gap[1:] > self.gap_mins * 60
+        reply = np.zeros(n, dtype=bool)
+        reply[1:] = (sid[1:] != sid[:-1]) & ~starts[1:] & (gap[1:] <= self.reply_window_mins * 60)
+        replies = np.flatnonzero(reply)
+        triggers = replies - 1
+
+        replies_triggered = np.bincount(triggers, minlength=n)
+        latency = np.full(n, np.nan)
+        latency[replies] = gap[replies]
+        # First reply of each engager to each sender
+        _, first = np.unique(sid[triggers] * k + sid[replies], return_index=True)
+        new_engagers = np.bincount(triggers[first], minlength=n)
+
+        # The question each message follows: the latest one strictly before it
+        idx = np.arange(n)
+        last_q = np.maximum.accumulate(np.where(is_question, idx, -1))
+        prev_q = np.concatenate(([-1], last_q[:-1]))
+        candidates = np.flatnonzero(prev_q >= 0)
+        q = prev_q[candidates]
+        ok = (sid[candidates] != sid[q]) & (ts[candidates] - ts[q] <= self.answer_window_mins * 60)
+        candidates, q = candidates[ok], q[ok]
+        _, first = np.unique(q * k + sid[candidates], return_index=True)
+        answered = np.bincount(candidates[first], minlength=n)
+
+        return {'conversation_starts': starts.astype(np.int64), 'replies_triggered': replies_triggered,
+                'num_unique_engagers': new_engagers, 'questions_answered': answered, 'response_latency': latency}
@@ -1,20 +1,34 @@
+import time
 import networkx as nx
 import numpy as np
-from datetime import timedelta
-from typing import List, Dict, Tuple
+import scipy.sparse as sp
+from collections import Counter
+from typing import List, Dict, Tuple, Union
+from core.centrality import CentralityBackend
+from core.table import MessageTable, columns_of
+from core.metrics import instrument
 
 class SocialGraphEngine:
     """
     V6 SOTA Social Graph Engine. Computes dynamic temporal graphing and Network Centralities 
     (Betweenness, Eigenvector) mapping structural conversational flow.
     """
-    def __init__(self):
+    PAIR_BUDGET = 1 << 22
+
+    def __init__(self, centrality: str = 'sparse', betweenness_samples: int = 256, seed: int = 0):
         self.graph = nx.DiGraph()
+        self.centrality = CentralityBackend(method=centrality, betweenness_samples=betweenness_samples, seed=seed)
+        self.timings: Dict[str, float] = {}
         
-    def generate_html(self, output_path: str = "graph.html") -> str:
+    def generate_html(self, graph: nx.DiGraph = None, stats: Dict[str, Dict] = None, top_k: int = 150,
+                      min_weight: float = 1, collapse_tail: bool = True, max_groups: int = 20,
+                      max_edges: int = 1500, layout: bool = True, output_path: str = None) -> str:
         """
-        Generates an interactive HTML network graph using pyvis.
-        Returns the raw HTML string for rendering.
+        Renders `graph` (default: the last built one) as an interactive pyvis network and
+        returns the HTML string, built in memory; `output_path` additionally writes it to disk.
+        The drawing is reduced with `level_of_detail` first, so the payload stays bounded by
+        `top_k`, `max_groups` and `max_edges` however many participants the chat has. With
+        `layout`, positions are computed here and browser-side physics is switched off.
         """
         try:
             from pyvis.network import Network
@@ -22,53 +36,274 @@ class SocialGraphEngine:
             import logging
             logging.getLogger(__name__).warning("pyvis not installed. Cannot generate HTML graph.")
             return "<p>Interactive graph not available (pyvis not installed).</p>"
-            
-        net = Network(height="600px", width="100%", bgcolor="#ffffff", font_color="black", directed=True)
-        net.from_nx(self.graph)
-        net.toggle_physics(True)
-        
-        # Save and return HTML
-        net.save_graph(output_path)
-        with open(output_path, "r", encoding="utf-8") as f:
-            html = f.read()
-            
+
+        t = time.perf_counter()
+        reduced = self.level_of_detail(self.graph if graph is None else graph, stats, top_k=top_k,
+                                       min_weight=min_weight, collapse_tail=collapse_tail,
+                                       max_groups=max_groups, max_edges=max_edges)
+        positions = {}
+        if layout and len(reduced):
+            scale = 60 * np.sqrt(len(reduced))
+            positions = nx.spring_layout(reduced, weight='weight', seed=0, iterations=100, scale=scale)
+
+        net = Network(height="600px", width="100%", bgcolor="#ffffff", font_color="black", directed=True,
+                      cdn_resources='remote')
+        for node, attr in reduced.nodes(data=True):
+            options = {'x': float(positions[node][0]), 'y': float(positions[node][1]), 'physics': False} if positions else {}
+            if attr['aggregate']:
+                options.update(shape='box', color='#CBD5E0')
+            net.add_node(node, label=attr['label'], title=attr['title'], value=attr['degree'], **options)
+        for u, v, w in reduced.edges(data='weight'):
+            net.add_edge(u, v, value=w, title=f"{w:g} interactions")
+        net.toggle_physics(not positions)
+
+        html = net.generate_html(notebook=False)
+        if output_path:
+            with open(output_path, "w", encoding="utf-8") as f:
+                f.write(html)
+        self.timings['render_html'] = time.perf_counter() - t
         return html
 
-    def compute_graph(self, messages: List, engage_win_mins: int = 30) -> Tuple[nx.DiGraph, Dict]:
+    def level_of_detail(self, graph: nx.DiGraph, stats: Dict[str, Dict] = None, top_k: int = 150,
+                        min_weight: float = 1, collapse_tail: bool = True, max_groups: int = 20,
+                        max_edges: int = 1500) -> nx.DiGraph:
+        """
+        Reduces `graph` for drawing. The `top_k` participants by eigenvector centrality (from
+        `stats`, ties broken by weighted degree) are kept. With `collapse_tail`, every other
+        participant is merged into an aggregate node for the kept participant they engage with
+        most (the `max_groups` largest such circles, the rest into one "others" node); without
+        it they are dropped. Edges between the resulting nodes are summed, those below
+        `min_weight` are dropped and only the `max_edges` heaviest are kept.
+        Nodes carry 'label', 'title', 'degree', 'members' and 'aggregate' attributes.
+        """
+        stats = stats or {}
+        degree = dict(graph.degree(weight='weight'))
+        rank = sorted(graph.nodes(), key=lambda n: (-stats.get(n, {}).get('eigenvector', 0.0), -degree[n], str(n)))
+        kept, tail = rank[:top_k], rank[top_k:]
+        group_of = {n: n for n in kept}
+
+        groups: Dict[str, List] = {}
+        if collapse_tail and tail:
+            kept_set = set(kept)
+            anchors = {}
+            for n in tail:
+                links = Counter()
+                for neighbors in (graph.succ[n], graph.pred[n]):
+                    for m, attr in neighbors.items():
+                        if m in kept_set:
+                            links[m] += attr.get('weight', 1)
+                anchors[n] = max(links, key=lambda m: (links[m], str(m))) if links else None
+            circles = Counter(a for a in anchors.values() if a is not None)
+            largest = {a for a, _ in sorted(circles.items(), key=lambda x: (-x[1], str(x[0])))[:max_groups]}
+            for n, a in anchors.items():
+                group = f"~circle:{a}" if a in largest else "~others"
+                group_of[n] = group
+                groups.setdefault(group, []).append(n)
+
+        weights = Counter()
+        for u, v, w in graph.edges(data='weight', default=1):
+            gu, gv = group_of.get(u), group_of.get(v)
+            if gu is not None and gv is not None and gu != gv:
+                weights[gu, gv] += w
+        edges = sorted(((e, w) for e, w in weights.items() if w >= min_weight), key=lambda x: (-x[1], str(x[0])))[:max_edges]
+
+        reduced = nx.DiGraph()
+        for n in kept:
+            s = stats.get(n, {})
+            label = str(n) if len(str(n)) <= 30 else str(n)[:29] + "…"
+            title = (f"{n}<br>eigenvector {s.get('eigenvector', 0.0):.3f} · betweenness {s.get('betweenness', 0.0):.3f}"
+                     f"<br>{degree[n]:g} interactions")
+            reduced.add_node(n, label=label, title=title, degree=float(degree[n]), members=1, aggregate=False)
+        for group, members in groups.items():
+            anchor = group.split(':', 1)[1] if group.startswith('~circle:') else None
+            names = ", ".join(sorted(map(str, members))[:10]) + (f", … (+{len(members) - 10})" if len(members) > 10 else "")
+            label = f"+{len(members)} around {anchor}" if anchor else f"+{len(members)} others"
+            reduced.add_node(group, label=label[:40], title=names, degree=float(sum(degree[m] for m in members)),
+                             members=len(members), aggregate=True)
+        reduced.add_weighted_edges_from((u, v, w) for (u, v), w in edges)
+        return reduced
+
+    @instrument('graph.count_interactions')
+    def count_interactions(self, messages: Union[List, MessageTable], engage_win_mins: int = 30,
+                           start: int = 0, stop: int = None) -> Counter:
+        """
+        Counts (replier, target) engagements for replies at positions [start, stop).
+        A message engages every earlier message by another sender within `engage_win_mins`;
+        earlier messages are only read as context, so counts over disjoint ranges add up.
+
+        For each reply, np.searchsorted finds the first message still inside its window (the
+        trailing pointer). The (reply, target) pairs in between are expanded in chunks of at
+        most PAIR_BUDGET and aggregated as sender-pair codes (a sparse COO of weights), so no
+        per-pair Python work is done and memory stays bounded in busy bursts.
+        """
+        sender_ids, timestamps, senders = columns_of(messages)
+        stop = len(messages) if stop is None else stop
+        k = len(senders)
+        if stop <= start:
+            return Counter()
+        pair, totals = self._pair_weights(sender_ids, timestamps, k, engage_win_mins, start, stop)
+        return Counter({(senders[c // k], senders[c % k]): int(w) for c, w in zip(pair.tolist(), totals.tolist())})
+
+    def _pair_weights(self, sender_ids: np.ndarray, timestamps: np.ndarray, k: int, engage_win_mins: int,
+                      start: int, stop: int, groups: np.ndarray = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Distinct engagement codes src * k + dst (plus groups[reply] * k * k when `groups`
+        labels each message, e.g. with its time window) and their counts.
+        """
+        # Exports are chronological; a running max keeps the window search well-defined
+        # across clock jumps such as DST changes
+        monotonic = np.maximum.accumulate(timestamps[:stop])
+        replies = np.arange(start, stop)
+        lo = np.searchsorted(monotonic, timestamps[start:stop] - engage_win_mins * 60, side='left')
+        lens = replies - lo
+        ends = np.cumsum(lens)
+
+        codes, weights = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+        c0 = 0
+        while c0 < len(replies):
+            base = ends[c0 - 1] if c0 else 0
+            c1 = max(int(np.searchsorted(ends, base + self.PAIR_BUDGET, side='right')), c0 + 1)
+            chunk_lens = lens[c0:c1]
+            owner = np.repeat(np.arange(c0, c1), chunk_lens)
+            offset = np.arange(len(owner)) - np.repeat(ends[c0:c1] - chunk_lens - base, chunk_lens)
+            src = sender_ids[replies[owner]].astype(np.int64)
+            dst = sender_ids[lo[owner] + offset].astype(np.int64)
+            code = src * k + dst
+            if groups is not None:
+                code += groups[replies[owner]].astype(np.int64) * k * k
+            pair, count = np.unique(code[src != dst], return_counts=True)
+            codes.append(pair)
+            weights.append(count)
+            c0 = c1
+
+        pair, inverse = np.unique(np.concatenate(codes), return_inverse=True)
+        return pair, np.bincount(inverse, weights=np.concatenate(weights), minlength=len(pair)).astype(np.int64)
+
+    @instrument('graph.temporal_centrality')
+    def temporal_centrality(self, messages: Union[List, MessageTable], window_days: float = 30,
+                            step_days: float = None, engage_win_mins: int = 30, betweenness: bool = True,
+                            previous: Dict = None, start: int = 0, keep: int = None) -> Dict:
+        """
+        Per-user centralities over time. Engagements (as in `count_interactions`) are bucketed
+        by reply time into steps of `step_days` (default `window_days`, i.e. tumbling windows),
+        and each snapshot covers the last `window_days`. Edge weights are kept incrementally:
+        each step adds the bucket entering the window and subtracts the one leaving it.
+        Centralities are only recomputed for snapshots whose edges changed, with eigenvector
+        iteration warm-started from the previous snapshot.
+
+        Returns 'users', 'window_start' / 'window_end' (epoch seconds), float32 windows × users
+        arrays 'eigenvector', 'betweenness', 'in_degree' and 'out_degree' (0 where a user has no
+        engagement in the window), and 'recomputed' (bool per window).
+
+        With `keep`, 'resume' holds the windows before messages[keep]'s bucket, which later
+        messages cannot change. Passed back as `previous` for an export whose first `start`
+        messages are the same (start <= keep), those windows are reused and only the
+        ones from messages[start]'s bucket onward are recomputed, as a full run would.
+        """
+        sender_ids, timestamps, senders = columns_of(messages)
+        n, k = len(sender_ids), len(senders)
+        step = max(1, int(round((step_days or window_days) * 86400)))
+        span = max(1, int(round(window_days * 86400 / step)))
+        if n == 0:
+            empty = np.zeros((0, k), dtype=np.float32)
+            return {'users': list(senders), 'window_start': np.zeros(0, dtype=np.int64), 'window_end': np.zeros(0, dtype=np.int64),
+                    'eigenvector': empty, 'betweenness': empty, 'in_degree': empty, 'out_degree': empty,
+                    'recomputed': np.zeros(0, dtype=bool)}
+
+        monotonic = np.maximum.accumulate(timestamps)
+        origin = int(monotonic[0]) // step * step
+        buckets = (monotonic - origin) // step
+        n_windows = int(buckets[-1]) + 1
+        pair, weight = self._pair_weights(sender_ids, timestamps, k, engage_win_mins, 0, n, groups=buckets)
+        bounds = np.searchsorted(pair // (k * k), np.arange(n_windows + 1))
+        edge = pair % (k * k)
+
+        series = {name: np.zeros((n_windows, k), dtype=np.float32)
+                  for name in ('eigenvector', 'betweenness', 'in_degree', 'out_degree')}
+        recomputed = np.zeros(n_windows, dtype=bool)
+        current: Dict[int, int] = {}
+        warm = np.zeros(k)
+        resume_at = int(buckets[keep]) if keep is not None and keep < n else None
+        first = int(buckets[start]) if start < n else n_windows
+        config = {'origin': origin, 'step': step, 'span': span, 'with_betweenness': betweenness}
+        if previous and all(previous[key] == value for key, value in config.items()) and previous['windows'] == first:
+            # Carry the settled windows and pick up the edge weights and eigenvector warm start they ended on
+            position = {user: i for i, user in enumerate(senders)}
+            cols = np.array([position[user] for user in previous['users']], dtype=np.int64)
+            for name, values in series.items():
+                values[:first, cols] = previous[name]
+            recomputed[:first] = previous['recomputed']
+            warm[cols] = previous['warm']
+            for i in range(bounds[max(0, first - span)], bounds[first]):
+                current[edge[i]] = current.get(edge[i], 0) + weight[i]
+        else:
+            first = 0
+        for t in range(first, n_windows):
+            if t == resume_at:
+                resume = {**config, 'users': list(senders), 'windows': t, 'warm': warm.copy(), 'recomputed': recomputed[:t].copy(),
+                          **{name: values[:t].copy() for name, values in series.items()}}
+            entering = range(bounds[t], bounds[t + 1])
+            leaving = range(bounds[t - span], bounds[t - span + 1]) if t >= span else range(0)
+            for i in entering:
+                current[edge[i]] = current.get(edge[i], 0) + weight[i]
+            for i in leaving:
+                left = current[edge[i]] - weight[i]
+                if left:
+                    current[edge[i]] = left
+                else:
+                    del current[edge[i]]
+            if t and not entering and not leaving:
+                for values in series.values():
+                    values[t] = values[t - 1]
+                continue
+
+            recomputed[t] = True
+            if not current:
+                warm[:] = 0
+                continue
+            codes = np.fromiter(current.keys(), dtype=np.int64, count=len(current))
+            w = np.fromiter(current.values(), dtype=np.float64, count=len(current))
+            # In code order, so a resumed run sums each row in the same order as a full one
+            order = np.argsort(codes)
+            codes, w = codes[order], w[order]
+            src, dst = codes // k, codes % k
+            active = np.unique(np.concatenate([src, dst]))
+            m = len(active)
+            adj = sp.csr_matrix((w, (np.searchsorted(active, src), np.searchsorted(active, dst))), shape=(m, m))
+            eig = self.centrality.eigenvector(adj, x0=warm[active])
+            warm[:] = 0
+            warm[active] = eig
+            series['eigenvector'][t, active] = eig
+            if betweenness:
+                series['betweenness'][t, active] = self.centrality.betweenness(adj)
+            series['out_degree'][t, active] = np.asarray(adj.sum(axis=1)).ravel()
+            series['in_degree'][t, active] = np.asarray(adj.sum(axis=0)).ravel()
+
+        starts = origin + (np.arange(n_windows) - span + 1).clip(0) * step
+        result = {'users': list(senders), 'window_start': starts, 'window_end': origin + (np.arange(n_windows) + 1) * step,
+                  **series, 'recomputed': recomputed}
+        if resume_at is not None:
+            result['resume'] = resume
+        return result
+
+    def compute_graph(self, messages: Union[List, MessageTable], engage_win_mins: int = 30) -> Tuple[nx.DiGraph, Dict]:
         """
         Builds the temporal communication graph and extracts centrality stats.
-        Requires message objects to have `sender` and `timestamp`.
+        Accepts a MessageTable or message objects with `sender` and `timestamp`.
         """
-        engage_win = timedelta(minutes=engage_win_mins)
-        n = len(messages)
-        
-        for i, msg in enumerate(messages):
-            j = i + 1
-            while j < n and (messages[j].timestamp - msg.timestamp) <= engage_win:
-                if messages[j].sender != msg.sender:
-                    u, v = messages[j].sender, msg.sender
-                    if self.graph.has_edge(u, v):
-                        self.graph[u][v]['weight'] += 1
-                    else:
-                        self.graph.add_edge(u, v, weight=1)
-                j += 1
-
-        stats = {}
-        if len(self.graph) > 0:
-            betweenness = nx.betweenness_centrality(self.graph, weight='weight')
-            try: 
-                eigenvector = nx.eigenvector_centrality_numpy(self.graph, weight='weight')
-            except Exception:
-                eigenvector = {node: 0.0 for node in self.graph.nodes()}
-            in_degree = dict(self.graph.in_degree(weight='weight'))
-            out_degree = dict(self.graph.out_degree(weight='weight'))
-            
-            for node in self.graph.nodes():
-                stats[node] = {
-                    'betweenness': float(betweenness.get(node, 0)),
-                    'eigenvector': float(eigenvector.get(node, 0)),
-                    'in_degree': in_degree.get(node, 0),
-                    'out_degree': out_degree.get(node, 0)
-                }
-        
+        return self.graph_from_counts(self.count_interactions(messages, engage_win_mins))
+
+    @instrument('graph.graph_from_counts')
+    def graph_from_counts(self, counts: Counter) -> Tuple[nx.DiGraph, Dict]:
+        """
+        Builds a fresh graph from aggregated engagement counts and extracts centrality stats.
+        Edges are inserted in sorted order so the graph does not depend on how counts were merged.
+        Per-phase timings of the last call are kept in `timings`.
+        """
+        t = time.perf_counter()
+        self.graph = nx.DiGraph()
+        self.graph.add_weighted_edges_from((u, v, w) for (u, v), w in sorted(counts.items()))
+        build_time = time.perf_counter() - t
+        stats, self.timings = self.centrality.compute(self.graph)
+        self.timings = {'build_graph': build_time, **self.timings}
         return self.graph, stats
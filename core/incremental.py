@@ -0,0 +1,178 @@
+import os
+import json
+import uuid
+import pickle
+import shutil
+import hashlib
+import logging
+import threading
+import numpy as np
+from typing import Dict, List, Optional, BinaryIO, Tuple
+from core.compact import QuantizedEmbeddings
+from core.parser import WhatsAppParser
+
+logger = logging.getLogger(__name__)
+
+class IncrementalStore:
+    """
+    Persists per-chat analysis state so a re-export that only appended messages is
+    processed from its last previously-seen message onwards.
+
+    Exports are read as seekable binary streams. A state records the byte offset of the
+    header line of the last message of the previous export (the "boundary"), a hash of the
+    bytes up to it, and every per-message result computed so far. The boundary message is
+    always re-analyzed, since later exports may have extended it with continuation lines.
+
+    Each chat has a directory named by `chat_key`; every per-chat file (state, ANN index,
+    topic model, value-score matrix) lives there. The directory is claimed with a hash of the
+    export up to the chat's first message, and files are only reused by the chat owning it.
+    """
+    KEY_BYTES = 4096
+    # Lines scanned for the first message that is not a system message
+    KEY_LINES = 1000
+    _READ_BLOCK = 1 << 20
+
+    def __init__(self, state_dir: str):
+        self.state_dir = state_dir
+        os.makedirs(state_dir, exist_ok=True)
+        # Concurrent runs of the same chat would otherwise interleave the .tmp files
+        self._lock = threading.Lock()
+
+    @classmethod
+    def _key_lines(cls, stream: BinaryIO) -> Tuple[List[bytes], int]:
+        """
+        The first non-blank line of the export and the header line of its first message that
+        is not a system message (exports open with the same encryption notice), plus the
+        byte offset of that header line.
+        """
+        parser = WhatsAppParser()
+        stream.seek(0)
+        lines, offset, pos = [], 0, 0
+        for _ in range(cls.KEY_LINES):
+            line = stream.readline(cls.KEY_BYTES)
+            if not line:
+                break
+            offset, pos = pos, pos + len(line)
+            text = line.strip()
+            if not text:
+                continue
+            if not lines:
+                lines.append(text)
+            msg = parser._try_parse(text.decode('utf-8-sig', errors='replace'), 0)
+            if msg and not parser._is_system([msg.content]):
+                if text != lines[0]:
+                    lines.append(text)
+                break
+        return lines, offset
+
+    @classmethod
+    def chat_key(cls, stream: BinaryIO) -> str:
+        """
+        Identifies a chat by its first line and first message header, which later exports
+        share however short the chat was when first analyzed.
+        """
+        return hashlib.sha1(b'\n'.join(cls._key_lines(stream)[0])).hexdigest()
+
+    @classmethod
+    def chat_hash(cls, stream: BinaryIO) -> str:
+        """Hash of the export up to its first message header: everything the key stands for."""
+        return cls.prefix_hash(stream, cls._key_lines(stream)[1])
+
+    @classmethod
+    def prefix_hash(cls, stream: BinaryIO, offset: int) -> str:
+        """Hash of the export up to and including the header line starting at `offset`."""
+        stream.seek(offset)
+        end = offset + len(stream.readline().rstrip(b'\n'))
+        h = hashlib.sha256()
+        stream.seek(0)
+        remaining = end
+        while remaining > 0:
+            block = stream.read(min(cls._READ_BLOCK, remaining))
+            if not block:
+                break
+            h.update(block)
+            remaining -= len(block)
+        return h.hexdigest()
+
+    def _dir(self, stream: BinaryIO) -> str:
+        return os.path.join(self.state_dir, self.chat_key(stream))
+
+    def owns(self, stream: BinaryIO) -> bool:
+        """Whether the chat directory of `stream`'s key was claimed by this chat."""
+        try:
+            with open(os.path.join(self._dir(stream), "chat.json")) as f:
+                return json.load(f)["chat_hash"] == self.chat_hash(stream)
+        except (OSError, ValueError, KeyError):
+            return False
+
+    def claim(self, stream: BinaryIO):
+        """
+        Claims the chat directory of `stream`'s key before any per-chat file is written. Files
+        of another chat with the same key are removed rather than reused.
+        """
+        path = self._dir(stream)
+        with self._lock:
+            if self.owns(stream):
+                return
+            if os.path.exists(path):
+                logger.warning(f"Chat directory {path} belongs to another chat with the same key; replacing it.")
+                shutil.rmtree(path)
+            os.makedirs(path)
+            with open(os.path.join(path, "chat.json.tmp"), "w") as f:
+                json.dump({"chat_hash": self.chat_hash(stream)}, f)
+            os.replace(os.path.join(path, "chat.json.tmp"), os.path.join(path, "chat.json"))
+
+    def load(self, stream: BinaryIO, config: Dict) -> Optional[Dict]:
+        """
+        Returns the saved state if the export in `stream` extends the one it was saved
+        from under the same pipeline `config`, else None.
+        """
+        path = self._dir(stream)
+        if not os.path.exists(os.path.join(path, "state.pkl")) or not self.owns(stream):
+            return None
+        with open(os.path.join(path, "state.pkl"), "rb") as f:
+            state = pickle.load(f)
+
+        if state["config"] != config:
+            logger.info("Pipeline configuration changed since last run; running full analysis.")
+            return None
+        if self.prefix_hash(stream, state["boundary_offset"]) != state["prefix_hash"]:
+            logger.info("Export does not extend the previously analyzed one; running full analysis.")
+            return None
+
+        # Files of a newer save may already have replaced these
+        files = state.pop("embedding_files")
+        try:
+            state["embeddings"] = np.load(os.path.join(path, files["embeddings"]))
+            if "scales" in files:
+                state["embeddings"] = QuantizedEmbeddings(state["embeddings"], np.load(os.path.join(path, files["scales"])))
+        except FileNotFoundError:
+            return None
+        return state
+
+    def save(self, stream: BinaryIO, state: Dict):
+        path = self._dir(stream)
+        os.makedirs(path, exist_ok=True)
+        state = dict(state)
+        embeddings = state.pop("embeddings")
+        state["prefix_hash"] = self.prefix_hash(stream, state["boundary_offset"])
+
+        # Embeddings keep their storage form: float32 / float16 arrays, or int8 codes plus scales.
+        # Their files are named after this save and only referenced once state.pkl is swapped
+        # in, so an interrupted save never pairs new and old files.
+        version = uuid.uuid4().hex
+        quantized = isinstance(embeddings, QuantizedEmbeddings)
+        files = {"embeddings": f"embeddings.{version}.npy"}
+        if quantized:
+            files["scales"] = f"embedding_scales.{version}.npy"
+        state["embedding_files"] = files
+        with self._lock:
+            np.save(os.path.join(path, files["embeddings"]), embeddings.codes if quantized else np.asarray(embeddings))
+            if quantized:
+                np.save(os.path.join(path, files["scales"]), embeddings.scales)
+            with open(os.path.join(path, "state.pkl.tmp"), "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(os.path.join(path, "state.pkl.tmp"), os.path.join(path, "state.pkl"))
+            for name in os.listdir(path):
+                if name.startswith("embedding") and name.endswith(".npy") and name not in files.values():
+                    os.remove(os.path.join(path, name))
@@ -0,0 +1,95 @@
+import time
+import logging
+import numpy as np
+from typing import List, Dict, Callable, Any
+
+logger = logging.getLogger(__name__)
+
+class InferenceScheduler:
+    """
+    Length-bucketed, token-budgeted batching for HuggingFace pipelines.
+    Identical texts are inferred once. Unique texts are sorted by token length and packed
+    into batches whose padded size (batch size x longest member) stays within
+    `token_budget`, so short chat messages are not padded to the length of pasted code.
+    Results are scattered back in the original order, and per-stage throughput is kept in
+    `stats`.
+    """
+    def __init__(self, tokenizer=None, max_length: int = 256, token_budget: int = 8192,
+                 max_batch_size: int = 256, pairs_per_text: int = 1, extra_tokens: int = 0):
+        """
+        `pairs_per_text` and `extra_tokens` describe pipelines that expand each text into
+        several sequences, e.g. zero-shot NLI runs one premise/hypothesis pair per label.
+        """
+        self.tokenizer = tokenizer
+        self.max_length = max_length
+        self.token_budget = token_budget
+        self.max_batch_size = max_batch_size
+        self.pairs_per_text = pairs_per_text
+        self.extra_tokens = extra_tokens
+        self.stats: Dict[str, Dict] = {}
+
+    def _tokenize(self, texts: List[str]) -> List[List[int]]:
+        return self.tokenizer(texts, add_special_tokens=False, truncation=False)['input_ids']
+
+    def truncate(self, texts: List[str]) -> List[str]:
+        """Cuts texts longer than `max_length` tokens, for pipelines that take no max_length."""
+        if self.tokenizer is None:
+            return texts
+        return [t if len(ids) <= self.max_length else self.tokenizer.decode(ids[:self.max_length])
+                for t, ids in zip(texts, self._tokenize(texts))]
+
+    def lengths(self, texts: List[str]) -> np.ndarray:
+        """Token counts capped at `max_length` (a ~4 chars/token estimate without a tokenizer)."""
+        if self.tokenizer is None:
+            raw = np.fromiter((len(t) // 4 + 1 for t in texts), dtype=np.int64, count=len(texts))
+        else:
+            raw = np.fromiter((len(ids) for ids in self._tokenize(texts)), dtype=np.int64, count=len(texts))
+        return np.minimum(raw, self.max_length)
+
+    def batches(self, lengths: np.ndarray) -> List[np.ndarray]:
+        """Groups positions into length-sorted batches within the token budget."""
+        order = np.argsort(lengths, kind='stable')
+        out, current = [], []
+        for pos in order.tolist():
+            cost = (int(lengths[pos]) + self.extra_tokens) * self.pairs_per_text
+            # Sorted ascending, so the newest member is the longest and sets the padded width
+            if current and (len(current) + 1) * cost > self.token_budget or len(current) >= self.max_batch_size:
+                out.append(np.asarray(current))
+                current = []
+            current.append(pos)
+        if current:
+            out.append(np.asarray(current))
+        return out
+
+    def run(self, texts: List[str], infer: Callable[[List[str]], List[Any]], name: str) -> List[Any]:
+        """Runs `infer` over deduplicated, length-bucketed batches and returns results in input order."""
+        if not texts:
+            self.stats.pop(name, None)
+            return []
+        start = time.perf_counter()
+        first: Dict[str, int] = {}
+        inverse = np.fromiter((first.setdefault(t, len(first)) for t in texts), dtype=np.int64, count=len(texts))
+        unique = list(first)
+
+        lengths = self.lengths(unique)
+        results: List[Any] = [None] * len(unique)
+        padded = 0
+        batches = self.batches(lengths)
+        for batch in batches:
+            outputs = infer([unique[i] for i in batch.tolist()])
+            for i, res in zip(batch.tolist(), outputs):
+                results[i] = res
+            padded += len(batch) * int(lengths[batch].max())
+
+        elapsed = time.perf_counter() - start
+        self.stats[name] = {
+            'texts': len(texts),
+            'unique_texts': len(unique),
+            'batches': len(batches),
+            'tokens': int(lengths.sum()),
+            'padding_efficiency': round(float(lengths.sum()) / max(padded, 1), 3),
+            'seconds': round(elapsed, 3),
+            'texts_per_second': round(len(texts) / elapsed, 1) if elapsed > 0 else None,
+        }
+        logger.info(f"{name}: {len(texts)} texts ({len(unique)} unique) in {len(batches)} batches, {elapsed:.2f}s")
+        return [results[i] for i in inverse.tolist()]
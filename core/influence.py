@@ -1,78 +1,135 @@
 import numpy as np
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Union
 from core.parser import Message
+from core.table import MessageTable, columns_of
+from core.metrics import instrument
+from core.ann import IVFIndex
+from core.compact import Embeddings
+
+Messages = Union[List[Message], MessageTable]
 
 class SemanticInfluenceEngine:
     """
     Calculates Semantic Uniqueness and Idea Influence using MTEB/bge-m3 embeddings.
+    Embeddings may be in a compact form from core.compact (float16, QuantizedEmbeddings):
+    each block of rows is expanded to float64 only as it is processed.
     """
-    def __init__(self):
-        try:
-            from sklearn.metrics.pairwise import cosine_similarity
-            self.cosine_similarity = cosine_similarity
-        except ImportError:
-            raise ImportError("Please install scikit-learn.")
+    BLOCK_ROWS = 4096
 
-    def calculate_uniqueness(self, messages: List[Message], embeddings: np.ndarray, window: int = 50) -> Dict[str, float]:
+    def calculate_uniqueness(self, messages: Messages, embeddings: Embeddings, window: int = 50) -> Dict[str, float]:
         """
         Calculates uniqueness per user based on message embeddings.
-        Uniqueness is 1 - cosine_similarity(msg, mean(previous N msgs)).
+        Uniqueness is 1 minus the cosine similarity of a message to the mean of the previous N.
         Returns a dictionary of {sender: average_uniqueness}.
         """
-        user_scores = {msg.sender: 0.0 for msg in messages}
-        user_counts = {msg.sender: 0 for msg in messages}
-        
-        n = len(messages)
-        for i in range(n):
-            sender = messages[i].sender
-            if i == 0:
-                user_scores[sender] += 1.0
-            else:
-                start_idx = max(0, i - window)
-                prev_embs = embeddings[start_idx:i]
-                mean_emb = np.mean(prev_embs, axis=0).reshape(1, -1)
-                curr_emb = embeddings[i].reshape(1, -1)
-                
-                sim = self.cosine_similarity(curr_emb, mean_emb)[0][0]
-                user_scores[sender] += float(1.0 - sim)
-                
-            user_counts[sender] += 1
-            
-        for sender in user_scores:
-            if user_counts[sender] > 0:
-                user_scores[sender] = float(user_scores[sender] / user_counts[sender])
-                
-        return user_scores
+        return self.average_by_sender(messages, self.message_uniqueness(messages, embeddings, window))
 
-    def calculate_idea_influence(self, messages: List[Message], embeddings: np.ndarray, reply_window: int = 10) -> Dict[str, float]:
+    def calculate_idea_influence(self, messages: Messages, embeddings: Embeddings, reply_window: int = 10) -> Dict[str, float]:
         """
         Calculates how much a user's messages echo through subsequent replies by others.
         Returns a dictionary of {sender: average_influence_score}.
         """
-        user_influence = {msg.sender: 0.0 for msg in messages}
-        user_counts = {msg.sender: 0 for msg in messages}
+        return self.average_by_sender(messages, self.message_echo(messages, embeddings, reply_window))
+
+    @instrument('influence.message_uniqueness')
+    def message_uniqueness(self, messages: Messages, embeddings: Embeddings, window: int = 50, start: int = 0) -> np.ndarray:
+        """
+        Per-message uniqueness for messages[start:].
+        Window means come from a float64 prefix sum taken over blocks of BLOCK_ROWS messages
+        (plus the `window` rows before each block), and all similarities in a block are
+        computed in one batched operation. Blocks are aligned to absolute positions, so a
+        message's score does not depend on `start`.
+        """
+        n = len(messages)
+        scores = np.empty(max(n - start, 0), dtype=np.float64)
+        for b0 in range(start - start % self.BLOCK_ROWS, n, self.BLOCK_ROWS):
+            b1 = min(b0 + self.BLOCK_ROWS, n)
+            lo = max(0, b0 - window)
+            prefix = np.zeros((b1 - lo + 1, embeddings.shape[1]), dtype=np.float64)
+            np.cumsum(np.asarray(embeddings[lo:b1]), axis=0, dtype=np.float64, out=prefix[1:])
+
+            rows = np.arange(b0, b1)
+            # Cosine similarity is scale-invariant, so the window sum stands in for its mean
+            win_sum = prefix[rows - lo] - prefix[np.maximum(rows - window, 0) - lo]
+            curr = np.asarray(embeddings[b0:b1], dtype=np.float64)
+            sim = np.einsum('ij,ij->i', curr, win_sum) / (self._norms(curr) * self._norms(win_sum))
+            block = 1.0 - sim
+            if b0 == 0:
+                block[0] = 1.0
+
+            keep = max(start, b0)
+            scores[keep - start:b1 - start] = block[keep - b0:]
+        return scores
+
+    @staticmethod
+    def _norms(x: np.ndarray) -> np.ndarray:
+        """Row norms, with zero rows given norm 1 so their similarity is 0 (as in sklearn)."""
+        norms = np.linalg.norm(x, axis=1)
+        norms[norms == 0] = 1.0
+        return norms
+
+    @instrument('influence.message_echo')
+    def message_echo(self, messages: Messages, embeddings: Embeddings, reply_window: int = 10, start: int = 0) -> np.ndarray:
+        """
+        Per-message echo score (summed positive similarity of the next `reply_window`
+        replies by other users) for messages[start:].
+        Computed as a banded similarity: for each lag 1..reply_window, one row-wise dot
+        product between the embeddings and the same matrix shifted by that lag, masked where
+        the sender repeats and clipped at zero. Rows are processed in chunks of BLOCK_ROWS,
+        so memory stays O(BLOCK_ROWS * (dim + reply_window)).
+        """
+        sender_ids = columns_of(messages)[0]
         n = len(messages)
-        
-        for i in range(n):
-            sender = messages[i].sender
-            root_emb = embeddings[i].reshape(1, -1)
-            
-            # Look ahead for replies by OTHER users
-            echo_score = 0.0
-            replies = 0
-            for j in range(i + 1, min(i + 1 + reply_window, n)):
-                if messages[j].sender != sender:
-                    reply_emb = embeddings[j].reshape(1, -1)
-                    sim = self.cosine_similarity(root_emb, reply_emb)[0][0]
-                    echo_score += float(max(0.0, sim)) # only count positive echo
-                    replies += 1
-            
-            user_influence[sender] += echo_score
-            user_counts[sender] += 1
-            
-        # Average influence per user
-        for sender in user_influence:
-            if user_counts[sender] > 0:
-                user_influence[sender] = float(user_influence[sender] / user_counts[sender])
-                
-        return user_influence
+        scores = np.zeros(max(n - start, 0), dtype=np.float64)
+        for c0 in range(start, n, self.BLOCK_ROWS):
+            c1 = min(c0 + self.BLOCK_ROWS, n)
+            hi = min(c1 + reply_window, n)
+            band = np.asarray(embeddings[c0:hi], dtype=np.float64)
+            unit = band / self._norms(band)[:, None]
+            ids = sender_ids[c0:hi]
+
+            echo = scores[c0 - start:c1 - start]
+            for lag in range(1, reply_window + 1):
+                m = min(c1, n - lag) - c0
+                if m <= 0:
+                    break
+                sim = np.einsum('ij,ij->i', unit[:m], unit[lag:lag + m])
+                # only count positive echo, and only from OTHER users
+                sim[ids[:m] == ids[lag:lag + m]] = 0.0
+                echo[:m] += np.maximum(sim, 0.0)
+        return scores
+
+    @instrument('influence.long_horizon_echo')
+    def long_horizon_echo(self, messages: Messages, embeddings: Embeddings, index: IVFIndex, start: int = 0,
+                          stop: int = None, k: int = 20, min_gap_hours: float = 24, threshold: float = 0.75) -> np.ndarray:
+        """
+        Echo of ideas that resurface long after the reply window, credited to their originals.
+        Each of messages[start:stop] looks up its `k` nearest neighbours among the messages at
+        least `min_gap_hours` older in `index` (an IVFIndex whose ids are message positions).
+        Every neighbour by another sender with similarity >= `threshold` receives that
+        similarity. Returns the credit received by each message of `messages`.
+        """
+        sender_ids, timestamps, _ = columns_of(messages)
+        n = len(messages)
+        stop = n if stop is None else stop
+        credits = np.zeros(n, dtype=np.float64)
+        if stop <= start or not len(index):
+            return credits
+        ts = np.maximum.accumulate(timestamps)
+        # Messages before this position are old enough to be resurfaced by each query
+        before = np.searchsorted(ts, ts[start:stop] - min_gap_hours * 3600, side='right')
+        for c0 in range(start, stop, index.QUERY_BATCH):
+            c1 = min(c0 + index.QUERY_BATCH, stop)
+            scores, ids = index.search(embeddings[c0:c1], k, before=before[c0 - start:c1 - start])
+            ok = (ids >= 0) & (scores >= threshold)
+            ok &= sender_ids[np.where(ok, ids, 0)] != sender_ids[c0:c1, None]
+            credits += np.bincount(ids[ok], weights=scores[ok], minlength=n)
+        return credits
+
+    @staticmethod
+    def average_by_sender(messages: Messages, per_message: np.ndarray) -> Dict[str, float]:
+        """Averages a per-message score array into {sender: mean score}."""
+        sender_ids, _, senders = columns_of(messages)
+        counts = np.bincount(sender_ids, minlength=len(senders))
+        totals = np.bincount(sender_ids, weights=per_message, minlength=len(senders))
+        return {senders[s]: float(totals[s] / counts[s]) for s in range(len(senders)) if counts[s] > 0}
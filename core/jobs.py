@@ -0,0 +1,304 @@
+import os
+import json
+import time
+import uuid
+import queue
+import hashlib
+import logging
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+class JobCancelled(Exception):
+    """Raised from a cancelled job's progress callback to stop the run at its next step."""
+
+class QueueFull(RuntimeError):
+    """The job queue already holds its maximum number of waiting jobs."""
+
+class Job:
+    """One queued analysis: status, progress events and, once finished, its result or error."""
+    STATUSES = ('queued', 'running', 'done', 'failed', 'cancelled')
+
+    def __init__(self, key: str, path: str, options: Dict):
+        self.id = uuid.uuid4().hex[:12]
+        self.key = key
+        self.path = path
+        self.options = options
+        self.status = 'queued'
+        self.step: Optional[str] = None
+        self.progress = 0.0
+        self.events = []
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.cached = False
+        self.created = time.time()
+        self.started = self.finished = None
+        self._cancel = threading.Event()
+        self._changed = threading.Condition()
+
+    @property
+    def done(self) -> bool:
+        return self.status in ('done', 'failed', 'cancelled')
+
+    def cancel(self):
+        self._cancel.set()
+
+    def report(self, step: str, state: str, fraction: float):
+        """Progress callback for the pipeline; raises JobCancelled once the job is cancelled."""
+        if self._cancel.is_set():
+            raise JobCancelled(self.id)
+        with self._changed:
+            self.step = step
+            self.progress = max(self.progress, fraction)
+            self.events.append({'step': step, 'state': state, 'progress': round(fraction, 3),
+                                'seconds': round(time.time() - (self.started or self.created), 3)})
+            self._changed.notify_all()
+
+    def _set(self, status: str, result: Dict = None, error: str = None):
+        with self._changed:
+            self.status = status
+            if status == 'running':
+                self.started = time.time()
+            elif status in ('done', 'failed', 'cancelled'):
+                self.finished = time.time()
+                self.result, self.error = result, error
+                if status == 'done':
+                    self.progress = 1.0
+            self._changed.notify_all()
+
+    def wait(self, seen_events: int, timeout: float = None) -> bool:
+        """Blocks until there are more than `seen_events` events or the job finished; False on timeout."""
+        with self._changed:
+            return self._changed.wait_for(lambda: self.done or len(self.events) > seen_events, timeout)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {'id': self.id, 'status': self.status, 'step': self.step, 'progress': round(self.progress, 3),
+                'cached': self.cached, 'error': self.error, 'queued_seconds': round((self.started or time.time()) - self.created, 3),
+                'run_seconds': round((self.finished or time.time()) - self.started, 3) if self.started else None}
+
+def approx_bytes(obj, _seen: set = None) -> int:
+    """
+    Rough in-memory size of a result: array buffers, strings and the attributes of the
+    objects holding them. Memory-mapped arrays count as nothing, since they are paged from disk.
+    """
+    _seen = set() if _seen is None else _seen
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+    if isinstance(obj, np.memmap):
+        return 0
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, (str, bytes, bytearray)):
+        return len(obj)
+    if isinstance(obj, dict):
+        return sum(approx_bytes(k, _seen) + approx_bytes(v, _seen) for k, v in obj.items())
+    if isinstance(obj, (list, tuple, set)):
+        return 8 * len(obj) + sum(approx_bytes(v, _seen) for v in obj)
+    if hasattr(obj, '__dict__'):
+        return approx_bytes(vars(obj), _seen)
+    return 8
+
+class ResultCache:
+    """
+    In-memory LRU of finished results keyed by content hash plus configuration, bounded by
+    `max_entries` and by `max_bytes` of approximate result size (the newest result is always
+    kept). Evicted results are released: their per-message entries (RELEASED, e.g. the
+    MessageTable and the memory-mapped ANN index) are dropped from the result dict, which jobs
+    in the queue's history share, so only scores, stats and rendered artifacts stay alive.
+    """
+    RELEASED = ('messages', 'message_index')
+
+    def __init__(self, max_entries: int = 32, max_bytes: int = 1 << 30):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._items: 'OrderedDict[str, Dict]' = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            result = self._items.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key: str, result: Dict):
+        if self.max_entries <= 0:
+            return
+        size = approx_bytes(result)
+        with self._lock:
+            self._items[key] = result
+            self._sizes[key] = size
+            self._items.move_to_end(key)
+            while len(self._items) > 1 and (len(self._items) > self.max_entries or self.bytes > self.max_bytes):
+                old_key, old = self._items.popitem(last=False)
+                del self._sizes[old_key]
+                self.release(old)
+
+    @property
+    def bytes(self) -> int:
+        return sum(self._sizes.values())
+
+    @classmethod
+    def release(cls, result: Dict):
+        """Drops the per-message entries of `result`, closing its index memory maps once unreferenced."""
+        for name in cls.RELEASED:
+            result.pop(name, None)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'entries': len(self._items), 'bytes': self.bytes, 'hits': self.hits, 'misses': self.misses}
+
+def content_key(path: str, config: Dict) -> str:
+    """sha256 of the file's bytes and the JSON-serialized `config`."""
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    h.update(json.dumps(config, sort_keys=True, default=str).encode('utf-8'))
+    return h.hexdigest()
+
+def available_memory() -> Optional[int]:
+    """MemAvailable in bytes from /proc/meminfo; None where it cannot be read."""
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+def default_workers(job_memory_mb: int = 1024) -> int:
+    """
+    Concurrent jobs the machine can take: half the cores (each run already uses a few threads
+    of its own), and no more than fit into the available memory at `job_memory_mb` each.
+    """
+    workers = max(1, (os.cpu_count() or 1) // 2)
+    memory = available_memory()
+    if memory is not None:
+        workers = min(workers, max(1, memory // (job_memory_mb * 2 ** 20)))
+    return workers
+
+class JobQueue:
+    """
+    Bounded background queue for analysis runs.
+    `runner(path, options, progress)` does the work on one of `workers` threads; `progress` is
+    the job's `report` callback. Finished results are cached by file content hash plus
+    `options` and `config`, so an identical re-upload returns immediately, and a submission
+    identical to a queued or running job joins that job instead of starting another. The
+    cache holds at most `cache_entries` results and about `cache_bytes`; see ResultCache.
+    Cancellation takes effect at the run's next progress step (a queued job never starts).
+    """
+    def __init__(self, runner: Callable[[str, Dict, Callable[[str, str, float], None]], Dict],
+                 workers: int = None, max_pending: int = 16, cache_entries: int = 32,
+                 cache_bytes: int = 1 << 30, job_memory_mb: int = 1024, history: int = 256):
+        self.runner = runner
+        self.workers = workers or default_workers(job_memory_mb)
+        self.max_pending = max_pending
+        self.history = history
+        self.cache = ResultCache(cache_entries, cache_bytes)
+        self.jobs: 'OrderedDict[str, Job]' = OrderedDict()
+        self._active: Dict[str, Job] = {}
+        self._queue: 'queue.Queue[Job]' = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = [threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                         for i in range(self.workers)]
+        for t in self._threads:
+            t.start()
+        logger.info(f"Job queue started with {self.workers} workers")
+
+    def submit(self, path: str, options: Dict = None, config: Dict = None) -> Job:
+        """Queues an analysis of the file at `path`; raises QueueFull when too many jobs are waiting."""
+        options = dict(options or {})
+        key = content_key(path, {'options': options, 'config': config or {}})
+        with self._lock:
+            active = self._active.get(key)
+            if active is not None and not active._cancel.is_set():
+                return active
+            job = Job(key, path, options)
+            result = self.cache.get(key)
+            if result is not None:
+                job.cached = True
+                job._set('done', result=result)
+            else:
+                if self._queue.qsize() >= self.max_pending:
+                    raise QueueFull(f"{self._queue.qsize()} jobs are already waiting; try again shortly.")
+                self._active[key] = job
+                self._queue.put(job)
+            self._remember(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """Requests cancellation; False if the job is unknown or already finished."""
+        job = self.jobs.get(job_id)
+        if job is None or job.done:
+            return False
+        job.cancel()
+        return True
+
+    def stream(self, job_id: str, timeout: float = 1.0) -> Iterator[Job]:
+        """Yields the job after each progress event (and at least every `timeout` seconds) until it finishes."""
+        job = self.jobs[job_id]
+        seen = len(job.events)
+        yield job
+        while not job.done:
+            job.wait(seen, timeout)
+            seen = len(job.events)
+            yield job
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counts = {s: 0 for s in Job.STATUSES}
+            for job in self.jobs.values():
+                counts[job.status] += 1
+        return {'workers': self.workers, 'waiting': self._queue.qsize(), 'jobs': counts, 'results': self.cache.stats()}
+
+    def _remember(self, job: Job):
+        self.jobs[job.id] = job
+        while len(self.jobs) > self.history:
+            oldest = next(iter(self.jobs))
+            if not self.jobs[oldest].done:
+                break
+            del self.jobs[oldest]
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            try:
+                self._run(job)
+            finally:
+                with self._lock:
+                    if self._active.get(job.key) is job:
+                        del self._active[job.key]
+                self._queue.task_done()
+
+    def _run(self, job: Job):
+        if job._cancel.is_set():
+            job._set('cancelled')
+            return
+        job._set('running')
+        try:
+            result = self.runner(job.path, job.options, job.report)
+        except JobCancelled:
+            logger.info(f"Job {job.id} cancelled at step '{job.step}'")
+            job._set('cancelled')
+            return
+        except Exception as e:
+            logger.exception(f"Job {job.id} failed")
+            job._set('failed', error=f"{type(e).__name__}: {e}")
+            return
+        if "error" not in result:
+            self.cache.put(job.key, result)
+        job._set('done', result=result)
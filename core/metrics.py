@@ -0,0 +1,184 @@
+import io
+import os
+import sys
+import time
+import pstats
+import cProfile
+import logging
+import functools
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+_recorder: ContextVar[Optional['MetricsRecorder']] = ContextVar('wa_metrics_recorder', default=None)
+_record: ContextVar[Optional[Dict]] = ContextVar('wa_metrics_record', default=None)
+
+class RSSSampler:
+    """Samples this process' resident set size on a background thread; peak and start in bytes."""
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.page = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+        self.start = self.peak = 0
+        self._stop = threading.Event()
+
+    def rss(self) -> int:
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * self.page
+        except OSError:
+            import resource
+            # Peak-so-far fallback off Linux (kilobytes on Linux, bytes on macOS)
+            scale = 1 if sys.platform == "darwin" else 1024
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self.rss())
+
+    def __enter__(self):
+        self.start = self.peak = self.rss()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.rss())
+
+class MetricsRecorder:
+    """
+    Collects per-span metrics for one pipeline run: calls, wall and thread CPU seconds,
+    peak RSS growth, items processed, and any counters (e.g. cache hits) added with `count`.
+    Spans with the same name are aggregated.
+    `profile` names spans to run under cProfile (True for all); `trace_memory` adds
+    tracemalloc peaks. RSS and tracemalloc are process-wide, so spans running concurrently
+    see each other's allocations.
+    """
+    def __init__(self, profile: Union[bool, Iterable[str]] = (), trace_memory: bool = False,
+                 profile_dir: str = None):
+        self.profile = profile if profile is True else set(profile or ())
+        self.trace_memory = trace_memory
+        self.profile_dir = profile_dir
+        self.records: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def activate(self):
+        """Makes this recorder receive spans and counts from instrumented code in this context."""
+        token = _recorder.set(self)
+        try:
+            yield self
+        finally:
+            _recorder.reset(token)
+
+    @contextmanager
+    def span(self, name: str, items: int = None):
+        record = {'items': items} if items is not None else {}
+        token = _record.set(record)
+        profiler = cProfile.Profile() if self.profile is True or name in self.profile else None
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        traced_start = tracemalloc.get_traced_memory()[0] if self.trace_memory else 0
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+
+        rss = RSSSampler().__enter__()
+        wall, cpu = time.perf_counter(), time.thread_time()
+        if profiler:
+            profiler.enable()
+        try:
+            yield record
+        finally:
+            if profiler:
+                profiler.disable()
+            record['wall_seconds'] = time.perf_counter() - wall
+            record['cpu_seconds'] = time.thread_time() - cpu
+            rss.__exit__(None, None, None)
+            _record.reset(token)
+            record['rss_peak_delta_mb'] = (rss.peak - rss.start) / 2 ** 20
+            if self.trace_memory:
+                record['traced_peak_mb'] = (tracemalloc.get_traced_memory()[1] - traced_start) / 2 ** 20
+            if profiler:
+                record['profile'] = self._profile_summary(name, profiler)
+            self._merge(name, record)
+
+    def _profile_summary(self, name: str, profiler: cProfile.Profile) -> str:
+        if self.profile_dir:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            profiler.dump_stats(os.path.join(self.profile_dir, f"{name}.prof"))
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(20)
+        return out.getvalue()
+
+    def _merge(self, name: str, record: Dict):
+        with self._lock:
+            agg = self.records.setdefault(name, {'calls': 0})
+            agg['calls'] += 1
+            for k, v in record.items():
+                if k == 'profile':
+                    agg[k] = v
+                elif k in ('rss_peak_delta_mb', 'traced_peak_mb'):
+                    agg[k] = round(max(agg.get(k, 0.0), v), 3)
+                else:
+                    agg[k] = round(agg.get(k, 0) + v, 6) if isinstance(v, float) else agg.get(k, 0) + v
+
+    def as_dict(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {k: dict(v) for k, v in self.records.items()}
+
+    def to_prometheus(self, prefix: str = 'wa_pipeline') -> str:
+        """Prometheus text exposition format, one gauge family per numeric field, labelled by span."""
+        families: Dict[str, list] = {}
+        for name, record in self.as_dict().items():
+            for field, value in record.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    families.setdefault(field, []).append((name, value))
+        lines = []
+        for field in sorted(families):
+            metric = f"{prefix}_{field}"
+            lines.append(f"# HELP {metric} Per-stage {field.replace('_', ' ')} of the last pipeline run.")
+            lines.append(f"# TYPE {metric} gauge")
+            for name, value in families[field]:
+                lines.append(f'{metric}{{stage="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str, prefix: str = 'wa_pipeline'):
+        """Atomically writes `to_prometheus()` to `path` (e.g. for node_exporter's textfile collector)."""
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(self.to_prometheus(prefix))
+        os.replace(tmp, path)
+
+@contextmanager
+def span(name: str, items: int = None):
+    """A span on the active recorder, or a no-op outside a recorded run."""
+    recorder = _recorder.get()
+    if recorder is None:
+        yield {}
+        return
+    with recorder.span(name, items) as record:
+        yield record
+
+def count(key: str, value: int = 1):
+    """Adds `value` to counter `key` of the innermost active span."""
+    record = _record.get()
+    if record is not None:
+        record[key] = record.get(key, 0) + value
+
+def instrument(name: str):
+    """Records each call of the decorated method as span `name`; items is len() of its first argument."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def inner(self, *args, **kwargs):
+            if _recorder.get() is None:
+                return fn(self, *args, **kwargs)
+            first = args[0] if args else None
+            with span(name, len(first) if hasattr(first, '__len__') else None):
+                return fn(self, *args, **kwargs)
+        return inner
+    return wrap
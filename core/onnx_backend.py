@@ -0,0 +1,83 @@
+import os
+import logging
+import platform
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Exported and quantized models are kept here, one directory per model id
+ONNX_DIR = os.environ.get("WA_ONNX_DIR", os.path.join(".wa_cache", "onnx"))
+
+QUANTIZED_FILE = "model_quantized.onnx"
+
+# 'torch' is eager fp32 PyTorch; 'onnx' is an int8-quantized ONNX Runtime export
+BACKENDS = ('torch', 'onnx')
+
+def check_backend(backend: str):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}'. Use one of {BACKENDS}.")
+
+def _quantization_target() -> str:
+    return "arm64" if platform.machine().lower() in ("arm64", "aarch64") else "avx512_vnni"
+
+def model_dir(model_id: str, cache_dir: Optional[str] = None) -> str:
+    """Cache directory of the int8 export of `model_id`."""
+    return os.path.join(cache_dir or ONNX_DIR, model_id.replace("/", "--") + "-int8-" + _quantization_target())
+
+def session_options(threads: Optional[int] = None):
+    """ONNX Runtime session options with `threads` intra-op threads (ORT's default when None)."""
+    import onnxruntime as ort
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if threads:
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+    return options
+
+def load_sequence_classifier(model_id: str, cache_dir: Optional[str] = None, threads: Optional[int] = None):
+    """
+    Returns (model, tokenizer) for a HF sequence-classification checkpoint running on ONNX
+    Runtime with dynamic int8 quantization. The export is done once and reused from disk.
+    Both can be handed to `transformers.pipeline` in place of the PyTorch model.
+    """
+    try:
+        from transformers import AutoTokenizer
+        from optimum.onnxruntime import ORTModelForSequenceClassification, ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+    except ImportError:
+        raise ImportError("Please install optimum[onnxruntime] for the ONNX backend.")
+
+    path = model_dir(model_id, cache_dir)
+    if not os.path.exists(os.path.join(path, QUANTIZED_FILE)):
+        logger.info(f"Exporting {model_id} to ONNX with int8 dynamic quantization (one-off)...")
+        fp32_path = path + "-fp32"
+        ORTModelForSequenceClassification.from_pretrained(model_id, export=True).save_pretrained(fp32_path)
+        quantizer = ORTQuantizer.from_pretrained(fp32_path)
+        config = getattr(AutoQuantizationConfig, _quantization_target())(is_static=False, per_channel=False)
+        quantizer.quantize(save_dir=path, quantization_config=config)
+        AutoTokenizer.from_pretrained(model_id).save_pretrained(path)
+        logger.info(f"Cached quantized ONNX model at {path}")
+
+    model = ORTModelForSequenceClassification.from_pretrained(
+        path, file_name=QUANTIZED_FILE, session_options=session_options(threads), provider="CPUExecutionProvider")
+    return model, AutoTokenizer.from_pretrained(path)
+
+def load_sentence_transformer(model_id: str, cache_dir: Optional[str] = None, threads: Optional[int] = None):
+    """A SentenceTransformer running an int8-quantized ONNX export, cached on disk."""
+    try:
+        from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+    except ImportError:
+        raise ImportError("Please install sentence-transformers>=3.2 and optimum[onnxruntime] for the ONNX backend.")
+
+    target = _quantization_target()
+    path = model_dir(model_id, cache_dir)
+    file_name = f"onnx/model_qint8_{target}.onnx"
+    if not os.path.exists(os.path.join(path, file_name)):
+        logger.info(f"Exporting {model_id} to ONNX with int8 dynamic quantization (one-off)...")
+        model = SentenceTransformer(model_id, backend="onnx")
+        model.save(path)
+        export_dynamic_quantized_onnx_model(model, target, path)
+        logger.info(f"Cached quantized ONNX model at {path}")
+
+    return SentenceTransformer(path, backend="onnx", model_kwargs={
+        "file_name": file_name, "provider": "CPUExecutionProvider", "session_options": session_options(threads)})
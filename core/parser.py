@@ -1,7 +1,7 @@
-import re, math
+import re, io, os, math, codecs, itertools
 from datetime import datetime
 from pydantic import BaseModel, Field
-from typing import List, Set
+from typing import List, Set, Iterator, Iterable, BinaryIO, Union, Tuple, Optional
 
 class Message(BaseModel):
     timestamp: datetime
@@ -9,9 +9,13 @@ class Message(BaseModel):
     content:   str
     index:     int
 
+# (timestamp, sender, content, index) as produced by the parser before any Message is built
+Record = Tuple[datetime, str, str, int]
+
 class UserStats(BaseModel):
     name:                str
     messages:            List[Message] = Field(default_factory=list)
+    num_messages:        int  = 0     # set instead of `messages` when built from a MessageTable
     replies_triggered:   int  = 0
     unique_engagers:     Set[str]  = Field(default_factory=set)
     conversation_starts: int  = 0
@@ -25,19 +29,71 @@ class UserStats(BaseModel):
     msg_types:           list = Field(default_factory=list)
     sentiment_scores:    list = Field(default_factory=list)
     response_latencies:  list = Field(default_factory=list)
+    num_unique_words:    int  = 0     # set instead of `unique_words` when built from a MessageTable
+    num_unique_engagers: int  = 0     # set instead of `unique_engagers` when built from a MessageTable
+
+    @property
+    def message_count(self): return len(self.messages) or self.num_messages
 
     @property
-    def message_count(self): return len(self.messages)
+    def engager_count(self): return len(self.unique_engagers) or self.num_unique_engagers
 
     @property
     def avg_msg_len(self):
-        return self.total_words / max(len(self.messages), 1)
+        return self.total_words / max(self.message_count, 1)
 
     @property
     def vocab_richness(self):
-        return len(self.unique_words) / math.sqrt(max(self.total_words, 1))
+        return (len(self.unique_words) or self.num_unique_words) / math.sqrt(max(self.total_words, 1))
+
+class _DateLayout:
+    """
+    Fast converter for one `WhatsAppParser.DATE_FMTS` layout. Splits the already-matched
+    date/time strings and builds the datetime directly instead of going through strptime,
+    accepting exactly what strptime would for that format and returning None otherwise.
+    """
+    _TIME = re.compile(r'(\d{1,2}):(\d{2})(?::(\d{2}))?(?:\s+([AP]M))?$')
+
+    def __init__(self, fmt: str):
+        self.fmt = fmt
+        date, time = fmt.split(' ', 1)
+        self.day_first = date.startswith('%d')
+        self.year_digits = 4 if '%Y' in date else 2
+        self.twelve_hour = '%I' in time
+        self.seconds = '%S' in time
+
+    def to_datetime(self, ds: str, ts: str):
+        parts = ds.split('/')
+        if len(parts) != 3 or len(parts[2]) != self.year_digits:
+            return None
+        day, month = (parts[0], parts[1]) if self.day_first else (parts[1], parts[0])
+        year = int(parts[2])
+        if self.year_digits == 2:
+            year += 2000 if year < 69 else 1900
+
+        m = self._TIME.match(ts.strip())
+        if not m:
+            return None
+        h, mi, sec, ampm = m.groups()
+        if (sec is not None) != self.seconds or (ampm is not None) != self.twelve_hour:
+            return None
+        hour = int(h)
+        if self.twelve_hour:
+            if not 1 <= hour <= 12:
+                return None
+            hour = hour % 12 + (12 if ampm == 'PM' else 0)
+        try:
+            return datetime(year, int(month), int(day), hour, int(mi), int(sec or 0))
+        except ValueError:
+            return None
 
 class WhatsAppParser:
+    """
+    Parses WhatsApp exports. An instance keeps the state of its last parse: the locked header
+    pattern and date layout (`locked_format`, also used by `last_message_offset`) and
+    `raw_count`, set once the parse is exhausted. Use one instance per export at a time;
+    instances are not safe to share between concurrent parses.
+    """
     PATTERNS = [
         r'\[(\d{1,2}/\d{1,2}/\d{2,4}),\s*(\d{1,2}:\d{2}(?::\d{2})?(?:\s*[AP]M)?)\]\s*([^:]+):\s*(.*)',
         r'(\d{1,2}/\d{1,2}/\d{2,4}),\s*(\d{1,2}:\d{2}(?::\d{2})?(?:\s*[AP]M)?)\s*[-–]\s*([^:]+):\s*(.*)',
@@ -51,30 +107,183 @@ class WhatsAppParser:
         '%d/%m/%Y %I:%M %p', '%d/%m/%Y %H:%M', '%d/%m/%y %I:%M %p', '%d/%m/%y %H:%M',
         '%m/%d/%Y %I:%M %p', '%m/%d/%Y %H:%M', '%d/%m/%Y %H:%M:%S', '%d/%m/%y %H:%M:%S',
     ]
+    _COMPILED = [re.compile(p) for p in PATTERNS]
+    _LAYOUTS = [_DateLayout(f) for f in DATE_FMTS]
+    SAMPLE_LINES = 500
+
+    def __init__(self, detect_format: bool = True, date_format: str = None):
+        """
+        With `detect_format`, the header pattern and date layout are detected once from the
+        first SAMPLE_LINES lines and tried first on every line; lines they do not fit fall
+        back to trying every pattern and format.
+        `date_format` (one of DATE_FMTS) fixes the layout instead: it is the only one tried,
+        also on fallback lines. Passing the layout an earlier parse of the same export locked
+        (`locked_format`) makes its tail read dates the same way.
+        """
+        if date_format is not None and date_format not in self.DATE_FMTS:
+            raise ValueError(f"Unknown date format '{date_format}'. Use one of {self.DATE_FMTS}.")
+        self.detect_format = detect_format
+        self.date_format = date_format
+        self._locked = None
+
+    @property
+    def locked_format(self) -> Optional[str]:
+        """The DATE_FMTS layout the last parse locked onto, if any."""
+        return self._locked[1].fmt if self._locked else None
+
+    def parse(self, text: str, start_index: int = 0) -> List[Message]:
+        """
+        Parses an export into messages, dropping system messages.
+        `start_index` offsets `Message.index` when parsing the tail of a longer export;
+        on return, `raw_count` is the number of messages found before filtering (after the
+        lazy `iter_parse` / `iter_records`, once they are exhausted).
+        """
+        return [Message(timestamp=t, sender=sender, content=content, index=idx)
+                for t, sender, content, idx in self._parse_lines(text.strip().split('\n'), start_index)]
+
+    def iter_parse(self, source: Union[str, os.PathLike, BinaryIO], start_index: int = 0,
+                   chunk_size: int = 1 << 20) -> Iterator[Message]:
+        """
+        Lazily parses an export from a file path or binary stream, reading it in
+        `chunk_size` byte chunks. Streams are read from their current position and
+        left open. Memory stays bounded by the largest single message.
+        """
+        for t, sender, content, idx in self.iter_records(source, start_index, chunk_size):
+            yield Message(timestamp=t, sender=sender, content=content, index=idx)
 
-    def parse(self, text: str) -> List[Message]:
-        msgs, current, idx = [], None, 0
-        for line in text.strip().split('\n'):
-            p = self._try_parse(line, idx)
+    def iter_records(self, source: Union[str, os.PathLike, BinaryIO], start_index: int = 0,
+                     chunk_size: int = 1 << 20) -> Iterator[Record]:
+        """Like `iter_parse`, but yields plain (timestamp, sender, content, index) tuples."""
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, 'rb') as f:
+                yield from self._parse_lines(self._iter_lines(f, chunk_size), start_index)
+        else:
+            yield from self._parse_lines(self._iter_lines(source, chunk_size), start_index)
+
+    @staticmethod
+    def _iter_lines(stream: BinaryIO, chunk_size: int) -> Iterator[str]:
+        decoder = codecs.getincrementaldecoder('utf-8-sig')(errors='replace')
+        pending = ''
+        while True:
+            chunk = stream.read(chunk_size)
+            buf = pending + decoder.decode(chunk, final=not chunk)
+            lines = buf.split('\n')
+            pending = lines.pop()
+            yield from lines
+            if not chunk:
+                break
+        if pending:
+            yield pending
+
+    def _parse_lines(self, lines: Iterable[str], start_index: int) -> Iterator[Record]:
+        self._locked = None
+        if self.detect_format:
+            lines = iter(lines)
+            sample = list(itertools.islice(lines, self.SAMPLE_LINES))
+            self._locked = self._detect(sample)
+            lines = itertools.chain(sample, lines)
+
+        current, parts, idx = None, [], start_index
+        for line in lines:
+            line = line.rstrip('\r')
+            p = self._match(line, idx)
             if p:
-                if current: msgs.append(current)
-                current = p; idx += 1
+                if current and not self._is_system(parts):
+                    yield (current[0], current[1], '\n'.join(parts), current[3])
+                current, parts = p, [p[2]]; idx += 1
             elif current:
-                current.content += '\n' + line
-        if current: msgs.append(current)
-        return [m for m in msgs
-                if not any(t in m.content.lower() for t in self.SYSTEM_TOKENS)]
+                parts.append(line)
+        self.raw_count = idx - start_index
+        if current:
+            # Trailing whitespace at the end of the export belongs to no message
+            parts[-1] = parts[-1].rstrip()
+            if not self._is_system(parts):
+                yield (current[0], current[1], '\n'.join(parts).rstrip(), current[3])
+
+    def _is_system(self, parts: List[str]) -> bool:
+        content = '\n'.join(parts).lower()
+        return any(t in content for t in self.SYSTEM_TOKENS)
+
+    def _detect(self, sample: List[str]):
+        """
+        Picks the header pattern matching most sample lines, then the date layout parsing most
+        of the unambiguous ones (a day above 12 tells day-first from month-first), then most
+        of all of them. Remaining ties go to the layout that reads the sample most
+        chronologically, as a month-first export read day-first jumps months between messages.
+        """
+        best_pat, best_groups = None, []
+        for pat in self._COMPILED:
+            groups = [m.group(1, 2) for m in map(pat.match, (l.strip() for l in sample)) if m]
+            if len(groups) > len(best_groups):
+                best_pat, best_groups = pat, groups
+        if best_pat is None:
+            return None
+
+        layouts = [self._LAYOUTS[self.DATE_FMTS.index(self.date_format)]] if self.date_format else self._LAYOUTS
+        best_layout, best_rank = None, None
+        for layout in layouts:
+            parsed = [(layout.to_datetime(ds, ts), ds) for ds, ts in best_groups]
+            times = [t for t, _ in parsed if t]
+            if not times:
+                continue
+            unambiguous = sum(1 for t, ds in parsed if t and max(map(int, ds.split('/')[:2])) > 12)
+            drift = sum(abs((b - a).total_seconds()) for a, b in zip(times, times[1:]))
+            rank = (unambiguous, len(times), -drift)
+            if best_rank is None or rank > best_rank:
+                best_layout, best_rank = layout, rank
+        return (best_pat, best_layout) if best_layout else None
 
     def _try_parse(self, line, idx):
-        for pat in self.PATTERNS:
-            m = re.match(pat, line.strip())
+        r = self._match(line, idx)
+        return Message(timestamp=r[0], sender=r[1], content=r[2], index=r[3]) if r else None
+
+    def _match(self, line, idx) -> Optional[Record]:
+        line = line.strip()
+        if self._locked:
+            pat, layout = self._locked
+            m = pat.match(line)
+            if m:
+                ds, ts, sender, content = m.groups()
+                t = layout.to_datetime(ds, ts)
+                if t: return (t, sender.strip(), content.strip(), idx)
+
+        for pat in self._COMPILED:
+            m = pat.match(line)
             if m:
                 ds, ts, sender, content = m.groups()
                 t = self._parse_ts(ds, ts)
-                if t: return Message(t, sender.strip(), content.strip(), idx)
+                if t: return (t, sender.strip(), content.strip(), idx)
         return None
 
+    def last_message_offset(self, stream: BinaryIO, block_size: int = 1 << 16) -> int:
+        """
+        Byte offset in a seekable binary stream of the header line of its last message
+        (-1 if none). Reads backwards from the end, so only the final message is scanned.
+        """
+        stream.seek(0, io.SEEK_END)
+        pos = stream.tell()
+        buf = b''
+        while pos > 0:
+            read = min(block_size, pos)
+            pos -= read
+            stream.seek(pos)
+            buf = stream.read(read) + buf
+            lines = buf.split(b'\n')
+            # Unless we reached the start, the first line may be cut off; keep it for the next block
+            head = lines.pop(0) if pos > 0 else b''
+            line_end = pos + len(buf)
+            for line in reversed(lines):
+                line_start = line_end - len(line)
+                if self._try_parse(line.decode('utf-8-sig', errors='replace'), 0):
+                    return line_start
+                line_end = line_start - 1
+            buf = head
+            block_size *= 2
+        return -1
+
     def _parse_ts(self, ds, ts):
+        if self.date_format:
+            return self._LAYOUTS[self.DATE_FMTS.index(self.date_format)].to_datetime(ds, ts)
         combined = f"{ds} {ts}".strip()
         for fmt in self.DATE_FMTS:
             try: return datetime.strptime(combined, fmt)
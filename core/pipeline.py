@@ -1,7 +1,21 @@
+import io
+import os
 import time
+import shutil
 import logging
-from typing import List, Dict, Tuple
-from core.parser import WhatsAppParser, Message, UserStats
+import threading
+import importlib.util
+from contextlib import contextmanager
+import numpy as np
+from collections import Counter
+from typing import List, Dict, Tuple, BinaryIO, Union, Iterable, Callable
+from core.parser import WhatsAppParser
+from core.table import MessageTable, to_epoch
+from core.stages import StageGraph
+from core.ann import IVFIndex
+from core.compact import Embeddings, concat_embeddings
+from core.registry import ModelRegistry
+from core.metrics import MetricsRecorder, span, count
 
 class V6Pipeline:
     """
@@ -9,121 +23,527 @@ class V6Pipeline:
     Coordinates MTEB Embeddings, RoBERTa Sentiment, BERTopic Clustering, and Temporal Graphs.
     Gracefully falls back if C-compiled libraries are missing on the runtime environment (e.g. Python 3.14).
     """
-    def __init__(self, mode: str = 'local', api_key: str = None):
+    ENGAGE_WIN_MINS = 30
+    UNIQUENESS_WINDOW = 50
+    REPLY_WINDOW = 10
+    # Long-horizon echo: neighbours looked up per message in the ANN index, and the minimum
+    # age and similarity of an earlier message to count as resurfacing it
+    LONG_ECHO_NEIGHBOURS = 20
+    LONG_ECHO_GAP_HOURS = 24
+    LONG_ECHO_THRESHOLD = 0.75
+    # A chat's index is retrained once appends grow it past this fraction of the rows its
+    # centroids were trained on
+    INDEX_RETRAIN_GROWTH = 0.5
+    CLASSIFICATION_MODES = ('nli', 'cascade', 'prototype')
+    STAGES = ('graph', 'emotions', 'topics', 'influence', 'classification')
+
+    def __init__(self, mode: str = 'local', api_key: str = None, cache_dir: str = None, state_dir: str = None,
+                 classification: str = 'cascade', classification_margin: float = 0.05,
+                 max_workers: int = 4, prewarm: Union[bool, Iterable[str]] = False,
+                 backend: str = 'torch', onnx_threads: int = None, metrics_path: str = None,
+                 profile: Union[bool, Iterable[str]] = (), trace_memory: bool = False, profile_dir: str = None,
+                 temporal_window_days: float = 30, temporal_step_days: float = None,
+                 embedding_storage: str = 'float32', embedding_dims: int = None, embedding_projection: str = 'truncate',
+                 date_format: str = None):
         self.logger = logging.getLogger(__name__)
         self.logger.info("Initializing V6 SAAS Engine...")
         self.mode = mode
-        
-        from core.embeddings import EmbeddingEngine
-        self.embed_engine = EmbeddingEngine(mode=mode, api_key=api_key)
-        
-        try:
-            from core.topics import TopicDiscoverer
-            self.topic_engine = TopicDiscoverer()
-            self.has_bertopic = True
-        except ImportError:
+        # Concurrent analysis stages; 1 runs them one after another
+        self.max_workers = max_workers
+        self.startup_timings: Dict[str, float] = {}
+
+        # 'nli' runs BART on every message, 'prototype' only compares embeddings with label
+        # prototypes, and 'cascade' sends low-margin prototype decisions to BART
+        if classification not in self.CLASSIFICATION_MODES:
+            raise ValueError(f"Unknown classification mode '{classification}'. Use one of {self.CLASSIFICATION_MODES}.")
+        self.classification = classification
+        self.classification_margin = classification_margin
+        # Runtime of the local transformer models: 'torch' (fp32) or 'onnx' (int8 ONNX Runtime)
+        self.backend = backend
+        self.onnx_threads = onnx_threads
+        # Per-stage metrics of every run; optionally also written as a Prometheus text file, and
+        # with cProfile (for the span names in `profile`, True for all) and tracemalloc capture
+        self.metrics_path = metrics_path
+        self.profile = profile
+        self.trace_memory = trace_memory
+        self.profile_dir = profile_dir
+        # Centrality time series over windows of this many days (None skips it)
+        self.temporal_window_days = temporal_window_days
+        self.temporal_step_days = temporal_step_days
+        # Date layout of the exports (one of WhatsAppParser.DATE_FMTS); None detects it per export
+        self.date_format = date_format
+
+        with self._timed("embedding_engine"):
+            from core.embeddings import EmbeddingEngine
+            # Embeddings are held (and kept in the incremental state) in this storage form
+            self.embed_engine = EmbeddingEngine(mode=mode, api_key=api_key, cache_dir=cache_dir,
+                                                backend=backend, threads=onnx_threads, storage=embedding_storage,
+                                                dims=embedding_dims, projection=embedding_projection)
+
+        # Heavy models are only checked for here and loaded on first use (or by prewarm)
+        self.has_bertopic = self._installed('bertopic', 'hdbscan', 'umap')
+        if not self.has_bertopic:
             self.logger.warning("BERTopic/HDBSCAN not fully installed. Gracefully bypassing Topic Discovery Phase.")
-            self.has_bertopic = False
-            
-        try:
-            from core.sentiment import EmotionAnalyzer
-            self.emotion_engine = EmotionAnalyzer()
-            self.has_emotions = True
-        except ImportError:
+        runtime = ('transformers', 'torch') + (('optimum', 'onnxruntime') if backend == 'onnx' else ())
+        self.has_emotions = self._installed(*runtime)
+        if not self.has_emotions:
             self.logger.warning("Transformers not fully installed. Gracefully bypassing Emotion Phase.")
-            self.has_emotions = False
-            
-        try:
-            from core.classification import ZeroShotClassifier
-            self.classifier_engine = ZeroShotClassifier()
-            self.has_classification = True
-        except ImportError:
+        self.has_nli = classification in ('nli', 'cascade') and self._installed(*runtime)
+        if classification in ('nli', 'cascade') and not self.has_nli:
             self.logger.warning("Transformers not fully installed. Gracefully bypassing Zero-Shot Classification Phase.")
-            self.has_classification = False
+        self.has_classification = self.has_nli or classification in ('prototype', 'cascade')
+
+        with self._timed("model_registry"):
+            self.models = ModelRegistry()
+            self.models.register("embeddings", self.embed_engine.load)
+            if self.has_emotions:
+                self.models.register("emotions", self._load_emotions)
+            if self.has_bertopic:
+                self.models.register("topics", self._load_topics)
+            if self.has_nli:
+                self.models.register("nli", self._load_nli)
+            if classification in ('prototype', 'cascade'):
+                self.models.register("prototype", self._load_prototype)
+
+        with self._timed("analysis_engines"):
+            from core.graphs import SocialGraphEngine
+            self.graph_engine = SocialGraphEngine()
+
+            from core.scoring import ValueScorer
+            # Each chat's feature matrix is kept in its state directory for re-weighting without a rerun
+            self.value_scorer = ValueScorer(matrix_dir=state_dir)
+
+            from core.influence import SemanticInfluenceEngine
+            self.influence_engine = SemanticInfluenceEngine()
+
+            from core.features import BehaviorFeatureExtractor
+            self.feature_extractor = BehaviorFeatureExtractor(reply_window_mins=self.ENGAGE_WIN_MINS)
+
+        # The graph and topic engines keep the current chat's graph / model on the instance, so
+        # concurrent runs (e.g. the dashboard's job workers) take turns on those stages
+        self._graph_lock = threading.Lock()
+        self._topic_lock = threading.Lock()
+        self._index_lock = threading.Lock()
+
+        # Incremental mode: appended re-exports only analyze their new tail
+        self.state_store = None
+        if state_dir:
+            with self._timed("state_store"):
+                from core.incremental import IncrementalStore
+                self.state_store = IncrementalStore(state_dir)
+
+        if prewarm:
+            self.models.prewarm(None if prewarm is True else prewarm)
+
+    @staticmethod
+    def _installed(*modules: str) -> bool:
+        return all(importlib.util.find_spec(m) is not None for m in modules)
+
+    @contextmanager
+    def _timed(self, component: str):
+        start = time.perf_counter()
+        yield
+        self.startup_timings[component] = round(time.perf_counter() - start, 3)
+
+    def _load_emotions(self):
+        from core.sentiment import EmotionAnalyzer
+        return EmotionAnalyzer(backend=self.backend, threads=self.onnx_threads)
+
+    def _load_topics(self):
+        from core.topics import TopicDiscoverer
+        # Fitted topic models are kept next to each chat's incremental state
+        return TopicDiscoverer(model_dir=self.state_store.state_dir if self.state_store else None)
+
+    def _load_nli(self):
+        from core.classification import ZeroShotClassifier
+        return ZeroShotClassifier(backend=self.backend, threads=self.onnx_threads)
+
+    def _load_prototype(self):
+        from core.classification import PrototypeClassifier
+        return PrototypeClassifier(self.embed_engine, nli=self.models.get("nli") if self.has_nli else None,
+                                   margin=self.classification_margin)
+
+    @property
+    def emotion_engine(self):
+        return self.models.get("emotions")
+
+    @property
+    def topic_engine(self):
+        return self.models.get("topics")
+
+    @property
+    def classifier_engine(self):
+        return self.models.get("nli") if "nli" in self.models else None
+
+    @property
+    def prototype_engine(self):
+        return self.models.get("prototype") if "prototype" in self.models else None
+
+    def startup_report(self) -> Dict[str, Dict]:
+        """Seconds spent constructing the pipeline, and loading each model so far."""
+        return {"init": dict(self.startup_timings), "models": dict(self.models.timings),
+                "model_status": self.models.status()}
+
+    def _state_config(self) -> Dict:
+        return {
+            "model": self.embed_engine.model_name,
+            "embedding_storage": self.embed_engine.codec.fingerprint,
+            "backend": self.backend,
+            "has_emotions": self.has_emotions,
+            "has_classification": self.has_classification,
+            "classification": self.classification,
+            "classification_nli": self.has_nli,
+            "classification_margin": self.classification_margin if self.classification != 'nli' else None,
+            "engage_win_mins": self.ENGAGE_WIN_MINS,
+            "uniqueness_window": self.UNIQUENESS_WINDOW,
+            "reply_window": self.REPLY_WINDOW,
+            "long_echo": (self.LONG_ECHO_NEIGHBOURS, self.LONG_ECHO_GAP_HOURS, self.LONG_ECHO_THRESHOLD),
+            "date_format": self.date_format,
+        }
+
+    def _parse(self, parser: WhatsAppParser, stream: BinaryIO, prev: Dict) -> Tuple[MessageTable, int, int]:
+        """
+        Parses the export, or only its tail past the previous boundary when `prev` state matches.
+        Returns (messages, number of messages reused from `prev`, raw index of the last message).
+        The tail is read with the date layout the previous parse locked, since a short tail may
+        not tell day-first from month-first dates.
+        """
+        if prev:
+            parser.date_format = prev["date_format"]
+            b_index = prev["boundary_index"]
+            stream.seek(prev["boundary_offset"])
+            tail = MessageTable.from_records(parser.iter_records(stream, start_index=b_index))
+            if not len(tail) or tail.indices[0] != b_index or tail.timestamps[0] == prev["boundary_timestamp"]:
+                keep = prev["keep"]
+                return MessageTable.concat([prev["table"].slice(0, keep), tail]), keep, b_index + parser.raw_count - 1
+            self.logger.info("Boundary message changed since last run; running full analysis.")
+            parser.date_format = self.date_format
+
+        stream.seek(0)
+        table = MessageTable.from_records(parser.iter_records(stream))
+        return table, 0, parser.raw_count - 1
+
+    def _message_index(self, chat_id: str, embeddings: Embeddings, start: int, keep: int) -> Tuple[IVFIndex, bool]:
+        """
+        (index, appended): ANN index over the embeddings of messages[:keep], and whether it is
+        the previous run's index with messages[start:keep] appended. Without a chat_id it is built in memory;
+        otherwise it lives memory-mapped under the chat's state directory, and an incremental run
+        appends messages[start:keep] to it. A full run, or one that would grow the index past
+        INDEX_RETRAIN_GROWTH of its training rows, builds a new one beside it and swaps it in,
+        so readers of the previous index keep a valid mapping. Compact embeddings get a float16 index.
 
-        from core.graphs import SocialGraphEngine
-        self.graph_engine = SocialGraphEngine()
+        Appended rows go to centroids fitted without them, so lookups against an appended index
+        are close to a full run's but not identical (tests/test_incremental.py bounds the
+        difference). A rebuilt index matches a full run's, and its lookups are redone.
+        """
+        dtype = 'float32' if self.embed_engine.codec.storage == 'float32' else 'float16'
+        if not keep:
+            return IVFIndex(embeddings.shape[1], dtype=dtype), False
+        if not chat_id:
+            return IVFIndex.build(embeddings[:keep], dtype=dtype), False
+        path = os.path.join(self.state_store.state_dir, chat_id, "ann")
+        index = IVFIndex.load(path) if start else None
+        if (index is not None and len(index) == start and index.dim == embeddings.shape[1] and index.dtype == dtype
+                and keep <= index.trained * (1 + self.INDEX_RETRAIN_GROWTH)):
+            if keep > start:
+                index.add(embeddings[start:keep], np.arange(start, keep))
+            return index, True
+        IVFIndex.build(embeddings[:keep], dtype=dtype).save(path + ".tmp")
+        shutil.rmtree(path + ".old", ignore_errors=True)
+        if os.path.exists(path):
+            os.replace(path, path + ".old")
+        os.replace(path + ".tmp", path)
+        shutil.rmtree(path + ".old", ignore_errors=True)
+        return IVFIndex.load(path), False
 
-        from core.scoring import ValueScorer
-        self.value_scorer = ValueScorer()
+    def _inference_throughput(self) -> Dict[str, Dict]:
+        """Per-stage batching and throughput figures from the transformer schedulers."""
+        stats = {}
+        for name in ("emotions", "nli"):
+            if name in self.models and self.models.loaded(name):
+                stats.update(self.models.get(name).scheduler.stats)
+        if "prototype" in self.models and self.models.loaded("prototype") and self.prototype_engine.stats:
+            stats['classification_cascade'] = self.prototype_engine.stats
+        return stats
 
-        from core.influence import SemanticInfluenceEngine
-        self.influence_engine = SemanticInfluenceEngine()
+    def process_chat(self, text: str, stages: Iterable[str] = None,
+                     progress: Callable[[str, str, float], None] = None) -> Dict:
+        """Analyzes an export held in memory as a string."""
+        return self.process_file(io.BytesIO(text.encode('utf-8')), stages, progress)
 
-    def process_chat(self, text: str) -> Dict:
+    def process_file(self, source: Union[str, os.PathLike, BinaryIO], stages: Iterable[str] = None,
+                     progress: Callable[[str, str, float], None] = None) -> Dict:
+        """
+        Analyzes an export from a file path or seekable binary stream, parsing it lazily.
+        `stages` limits the analyses to a subset of STAGES; models for skipped stages are
+        never loaded. Incremental state is only used and saved for full runs.
+        Per-stage metrics of the run are returned under "metrics".
+        `progress(step, 'start' | 'done', fraction_done)` is called as each step starts and
+        finishes; an exception it raises aborts the run before its next step.
+        """
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, 'rb') as f:
+                return self.process_file(f, stages, progress)
+        wanted = set(self.STAGES if stages is None else stages)
+        if wanted - set(self.STAGES):
+            raise ValueError(f"Unknown stages {sorted(wanted - set(self.STAGES))}. Use any of {self.STAGES}.")
+
+        recorder = MetricsRecorder(self.profile, self.trace_memory, self.profile_dir)
+        with recorder.activate():
+            result = self._process(source, wanted, progress)
+        if "error" not in result:
+            result["metrics"] = recorder.as_dict()
+            if self.metrics_path:
+                recorder.write_prometheus(self.metrics_path)
+        return result
+
+    def _process(self, stream: BinaryIO, wanted: set, progress: Callable[[str, str, float], None]) -> Dict:
         start_time = time.time()
+        store = self.state_store if wanted == set(self.STAGES) else None
+        steps = {"done": 0, "total": 0}
+        steps_lock = threading.Lock()
+
+        def report(step: str, state: str):
+            if progress is None:
+                return
+            with steps_lock:
+                steps["done"] += state == 'done'
+                fraction = steps["done"] / steps["total"] if steps["total"] else 0.0
+            progress(step, state, fraction)
         
-        parser = WhatsAppParser()
-        messages = parser.parse(text)
+        parser = WhatsAppParser(date_format=self.date_format)
+        report("parse", "start")
+        with span("parse") as record:
+            prev = store.load(stream, self._state_config()) if store else None
+            messages, start, last_index = self._parse(parser, stream, prev)
+            record['items'] = len(messages)
+            count('reused_messages', start)
         if not messages:
             return {"error": "No valid messages parsed."}
-            
+        report("parse", "done")
+        if store:
+            store.claim(stream)
+        # Each chat is projected with its own PCA basis, kept in its state beside the embeddings
+        codec = self.embed_engine.codec.fork(*prev.get("embedding_basis", (None, 0)) if prev else (None, 0))
+        if start and codec.underfitted and len(messages) >= codec.MIN_ROWS_PER_DIM * codec.dims:
+            self.logger.info(f"Refitting the embedding basis fitted on {codec.fit_rows} messages; running full analysis.")
+            start, codec = 0, self.embed_engine.codec.fork()
+        if start == 0:
+            prev = None
+
         self.logger.info(f"Parsed {len(messages)} messages.")
+        if prev:
+            self.logger.info(f"Incremental run: reusing {start} analyzed messages, processing {len(messages) - start} new.")
+
+        # Messages before the last one are final; the next export resumes from it
+        next_keep = int(np.searchsorted(messages.indices, last_index))
         
         # 1. Base Stats
-        user_stats = {}
-        msg_texts = []
-        for msg in messages:
-            if msg.sender not in user_stats:
-                user_stats[msg.sender] = UserStats(name=msg.sender)
-            user_stats[msg.sender].messages.append(msg)
-            msg_texts.append(msg.content)
+        msg_texts = messages.texts()
+        new_texts = msg_texts[start:]
             
+        # Stages 2-7 form a DAG: only topics, influence and prototype classification need the
+        # embeddings, so the graph and the transformer stages run alongside them
+        dag = StageGraph(self.max_workers)
+        prototype = "prototype" in self.models
+        needs_embeddings = bool(wanted & {"topics", "influence"}) or ("classification" in wanted and prototype)
+
         # 2. Embeddings
-        self.logger.info("Computing High-Dimensional Embeddings...")
-        embeddings = self.embed_engine.encode(msg_texts)
-        
+        def embed_stage():
+            self.logger.info("Computing High-Dimensional Embeddings...")
+            embeddings = self.embed_engine.encode(new_texts, codec) if new_texts else self.embed_engine.empty(codec)
+            if prev:
+                embeddings = concat_embeddings([prev["embeddings"][:start], embeddings])
+            return embeddings
+        if needs_embeddings:
+            dag.add("embeddings", embed_stage, uses_torch=self.mode == 'local' and self.backend == 'torch')
+
         # 3. Graph Architecture
-        self.logger.info("Computing Temporal Graph Network & Centralities...")
-        graph, centrality_stats = self.graph_engine.compute_graph(messages, engage_win_mins=30)
-        
-        self.logger.info("Generating Interactive HTML Graph...")
-        graph_html = self.graph_engine.generate_html()
-        
+        def graph_stage():
+            self.logger.info("Computing Temporal Graph Network & Centralities...")
+            edge_counts = prev["edge_counts"] if prev else Counter()
+            edge_counts = edge_counts + self.graph_engine.count_interactions(
+                messages, self.ENGAGE_WIN_MINS, start=start, stop=next_keep)
+            tail_counts = self.graph_engine.count_interactions(messages, self.ENGAGE_WIN_MINS, start=next_keep)
+            with self._graph_lock:
+                graph, centrality_stats = self.graph_engine.graph_from_counts(edge_counts + tail_counts)
+                self.logger.info("Generating Interactive HTML Graph...")
+                return edge_counts, centrality_stats, self.graph_engine.generate_html(graph, centrality_stats), dict(self.graph_engine.timings)
+        if "graph" in wanted:
+            dag.add("graph", graph_stage)
+        if "graph" in wanted and self.temporal_window_days:
+            # Windows settled before the boundary are carried in the state; later ones are redone
+            dag.add("temporal_graph", lambda: self.graph_engine.temporal_centrality(
+                messages, self.temporal_window_days, self.temporal_step_days, self.ENGAGE_WIN_MINS,
+                previous=prev.get("temporal_graph") if prev else None, start=start, keep=next_keep))
+
+        # Behavioral features for the value score: vectorized over the whole table, so they are
+        # recomputed on every run rather than carried in the incremental state
+        dag.add("features", lambda: self.feature_extractor.extract(messages))
+
         # 4. Sentiment / Emotions
-        emotion_results = []
-        if self.has_emotions:
-            self.logger.info("Running RoBERTa Emotion Classifier...")
-            emotion_results = self.emotion_engine.analyze_batch(msg_texts)
-            
+        if self.has_emotions and "emotions" in wanted:
+            def emotion_stage():
+                self.logger.info("Running RoBERTa Emotion Classifier...")
+                return (prev["emotions"][:start] if prev else []) + (self.emotion_engine.analyze_batch(new_texts) if new_texts else [])
+            dag.add("emotions", emotion_stage, uses_torch=self.backend == 'torch')
+
+        chat_id = store.chat_key(stream) if store else None
+
         # 5. BERTopic Clustering
-        topics, topic_names = [], {}
-        if self.has_bertopic:
-            self.logger.info("Discovering Semantic Topics with BERTopic & HDBSCAN...")
-            topics, topic_names = self.topic_engine.discover_topics(msg_texts, embeddings)
-            
+        if self.has_bertopic and "topics" in wanted:
+            previous = (prev["topics"][:start], prev["topic_fit_id"]) if prev and prev.get("topic_fit_id") else None
+
+            def topic_stage(embeddings):
+                # The persisted model only transforms new messages; a fresh fit is balanced over months
+                self.logger.info("Discovering Semantic Topics with BERTopic & HDBSCAN...")
+                topic_engine = self.topic_engine
+                with self._topic_lock:
+                    topics, topic_names = topic_engine.discover_topics(
+                        msg_texts, embeddings, strata=messages.timestamps // (30 * 86400), chat_id=chat_id, previous=previous)
+                    return topics, topic_names, topic_engine.fit_id
+            dag.add("topics", topic_stage, deps=["embeddings"])
+
         # 6. Semantic Influence & Uniqueness
-        self.logger.info("Calculating Semantic Influence and Uniqueness...")
-        uniqueness_scores = self.influence_engine.calculate_uniqueness(messages, embeddings)
-        influence_scores = self.influence_engine.calculate_idea_influence(messages, embeddings)
-        
+        def influence_stage(embeddings):
+            self.logger.info("Calculating Semantic Influence and Uniqueness...")
+            # Echo of a message depends on the replies after it, so the last REPLY_WINDOW reused ones are redone
+            echo_start = max(0, start - self.REPLY_WINDOW)
+            uniqueness = self.influence_engine.message_uniqueness(messages, embeddings, self.UNIQUENESS_WINDOW, start=start)
+            echo = self.influence_engine.message_echo(messages, embeddings, self.REPLY_WINDOW, start=echo_start)
+            if prev:
+                uniqueness = np.concatenate([prev["uniqueness"][:start], uniqueness])
+                echo = np.concatenate([prev["echo"][:echo_start], echo])
+            return uniqueness, echo
+        if "influence" in wanted:
+            dag.add("influence", influence_stage, deps=["embeddings"])
+
+        def long_echo_stage(embeddings):
+            # Only messages[:next_keep] are indexed and their lookups carried in the state; the
+            # tail past the boundary is looked up again on the next run, so its credits are not
+            self.logger.info("Indexing messages for long-horizon echo...")
+            with self._index_lock:
+                index, appended = self._message_index(chat_id, embeddings, start, next_keep)
+            params = dict(k=self.LONG_ECHO_NEIGHBOURS, min_gap_hours=self.LONG_ECHO_GAP_HOURS,
+                          threshold=self.LONG_ECHO_THRESHOLD)
+            # Lookups carried from the previous run are only kept while its index is
+            lookup_start = start if appended else 0
+            carried = np.zeros(len(messages))
+            if prev and appended:
+                carried[:start] = prev["long_echo"][:start]
+            carried += self.influence_engine.long_horizon_echo(messages, embeddings, index, lookup_start, next_keep, **params)
+            tail = self.influence_engine.long_horizon_echo(messages, embeddings, index, next_keep, **params)
+            return index, carried, carried + tail
+        if "influence" in wanted:
+            dag.add("long_echo", long_echo_stage, deps=["embeddings"])
+
         # 7. Zero-Shot Classification
-        if self.has_classification:
-            self.logger.info("Running Zero-Shot Message Classification...")
-            classification_results = self.classifier_engine.analyze_batch(msg_texts)
-            for msg, res in zip(messages, classification_results):
-                user_stats[msg.sender].msg_types.append(res['label'])
-                
+        if self.has_classification and "classification" in wanted:
+            def classification_stage(embeddings=None):
+                self.logger.info(f"Running Message Classification ({self.classification})...")
+                if prototype:
+                    classification_results = self.prototype_engine.analyze_batch(new_texts, embeddings[start:], codec)
+                else:
+                    classification_results = self.classifier_engine.analyze_batch(new_texts) if new_texts else []
+                return (prev["labels"][:start] if prev else []) + [res['label'] for res in classification_results]
+            dag.add("classification", classification_stage, deps=["embeddings"] if prototype else [],
+                    uses_torch=self.has_nli and self.backend == 'torch')
+
+        steps["total"] = 1 + len(dag.stages) + 1 + bool(store)
+        results = dag.run(report)
+        embeddings = results.get("embeddings")
+        edge_counts, centrality_stats, graph_html, centrality_timings = results.get("graph", (Counter(), {}, None, {}))
+        emotion_results = results.get("emotions", [])
+        temporal_graph = results.get("temporal_graph")
+        temporal_resume = temporal_graph.pop("resume", None) if temporal_graph else None
+        topics, topic_names, topic_fit_id = results.get("topics", ([], {}, None))
+        if "topics" in results:
+            messages.annotate("topic", topics)
+        uniqueness_scores, influence_scores, long_echo_scores = {}, {}, {}
+        message_index, long_echo_state = results.get("long_echo", (None, None, None))[:2]
+        if "long_echo" in results:
+            long_echo = results["long_echo"][2]
+            long_echo_scores = self.influence_engine.average_by_sender(messages, long_echo)
+            messages.annotate("long_echo", long_echo)
+        if "influence" in results:
+            uniqueness, echo = results["influence"]
+            uniqueness_scores = self.influence_engine.average_by_sender(messages, uniqueness)
+            influence_scores = self.influence_engine.average_by_sender(messages, echo)
+            messages.annotate("uniqueness", uniqueness)
+            messages.annotate("echo", echo)
+        for name, values in results["features"].items():
+            messages.annotate(name, values)
+        msg_labels = results.get("classification", [])
+        if "classification" in results:
+            messages.annotate("msg_type", msg_labels)
+
         # 8. Compute Overall Value Score
         self.logger.info("Computing 9-Dimensional Value Scores...")
-        # (Assuming parse stats are naturally populated in parser; 
-        # normally you'd want a parser phase that actually counts snippets/links/etc. 
-        # But we compute the score based on whatever is there).
-        value_scores = self.value_scorer.compute_scores(user_stats)
+        report("scoring", "start")
+        with span("scoring", len(messages)):
+            user_stats = messages.user_stats()
+            value_scores = self.value_scorer.compute_scores(user_stats, key=chat_id)
+            # The result carries its own matrix; chat_id only names the copy kept on disk
+            value_features = {"users": list(user_stats), "features": list(self.value_scorer.FEATURES),
+                              "matrix": self.value_scorer.feature_matrix(user_stats)}
+        report("scoring", "done")
+
+        if store:
+            report("save_state", "start")
+            with span("save_state", next_keep):
+                boundary_offset = parser.last_message_offset(stream)
+                stream.seek(boundary_offset)
+                boundary_line = stream.readline().decode('utf-8-sig', errors='replace')
+                store.save(stream, {
+                    "config": self._state_config(),
+                    "boundary_offset": boundary_offset,
+                    "boundary_index": last_index,
+                    "boundary_timestamp": to_epoch(parser._try_parse(boundary_line, last_index).timestamp),
+                    "date_format": parser.locked_format,
+                    "keep": next_keep,
+                    "table": messages.slice(0, next_keep),
+                    "embeddings": embeddings[:next_keep],
+                    "embedding_basis": (codec.basis, codec.fit_rows),
+                    "emotions": emotion_results[:next_keep],
+                    "labels": msg_labels[:next_keep],
+                    "uniqueness": uniqueness[:next_keep],
+                    "echo": echo[:next_keep],
+                    "long_echo": long_echo_state[:next_keep],
+                    "edge_counts": edge_counts,
+                    "temporal_graph": temporal_resume,
+                    "topics": topics[:next_keep],
+                    "topic_fit_id": topic_fit_id,
+                })
+            report("save_state", "done")
 
         self.logger.info(f"V6 Pipeline Executed in {time.time() - start_time:.2f} seconds.")
         
         return {
             "num_messages": len(messages),
             "num_users": len(user_stats),
+            "chat_key": chat_id,
+            "incremental": {"reused_messages": start, "new_messages": len(messages) - start},
             "centrality_stats": centrality_stats,
+            "centrality_timings": centrality_timings,
+            "centrality_series": temporal_graph,
+            "inference_throughput": self._inference_throughput(),
+            "stage_timeline": dag.timeline,
+            "stages": sorted(results),
+            "startup": self.startup_report(),
             "graph_html": graph_html,
             "value_scores": value_scores,
+            "value_features": value_features,
             "uniqueness_scores": uniqueness_scores,
             "influence_scores": influence_scores,
-            "has_emotions": self.has_emotions,
-            "has_bertopic": self.has_bertopic,
-            "has_classification": self.has_classification,
+            "long_echo_scores": long_echo_scores,
+            "message_index": message_index,
+            # Queries against message_index are encoded with the chat's codec
+            "embedding_codec": codec,
+            "messages": messages,
+            "has_emotions": "emotions" in results,
+            "has_bertopic": "topics" in results,
+            "has_classification": "classification" in results,
             "emotion_sample": emotion_results[:5] if emotion_results else [],
-            "topic_sample": topic_names
+            "topic_sample": topic_names,
+            "embedding_cache": self.embed_engine.cache.stats() if self.embed_engine.cache else None
         }
@@ -0,0 +1,74 @@
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional
+from core.metrics import span
+
+logger = logging.getLogger(__name__)
+
+class ModelRegistry:
+    """
+    Loads heavy models on first use instead of at construction.
+    Each entry is a zero-argument factory; `get` builds it once under a per-entry lock, so a
+    background prewarm and a pipeline stage asking for the same model never load it twice.
+    A factory raising ImportError marks the entry unavailable and `get` returns None.
+    Load times are recorded in `timings`.
+    """
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._failed: Dict[str, str] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self.timings: Dict[str, float] = {}
+        self._prewarm_thread: Optional[threading.Thread] = None
+
+    def register(self, name: str, factory: Callable[[], Any]):
+        self._factories[name] = factory
+        self._locks[name] = threading.Lock()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._factories
+
+    def loaded(self, name: str) -> bool:
+        return name in self._instances
+
+    def get(self, name: str) -> Any:
+        """Returns the model, loading it on first call; None if its dependencies are missing."""
+        if name in self._instances:
+            return self._instances[name]
+        with self._locks[name]:
+            if name in self._instances or name in self._failed:
+                return self._instances.get(name)
+            start = time.perf_counter()
+            try:
+                with span(f"load.{name}"):
+                    instance = self._factories[name]()
+            except ImportError as e:
+                self._failed[name] = str(e)
+                logger.warning(f"Model '{name}' unavailable: {e}")
+                return None
+            self.timings[name] = round(time.perf_counter() - start, 3)
+            self._instances[name] = instance
+            logger.info(f"Loaded model '{name}' in {self.timings[name]:.2f}s")
+            return instance
+
+    def prewarm(self, names: Iterable[str] = None) -> threading.Thread:
+        """Loads `names` (default: every entry) on a daemon thread and returns it."""
+        names = [n for n in (names or self._factories) if n in self._factories]
+
+        def load_all():
+            for name in names:
+                try:
+                    self.get(name)
+                except Exception as e:
+                    # Left unloaded; the stage that needs it will retry and surface the error
+                    logger.warning(f"Prewarming '{name}' failed: {e}")
+
+        self._prewarm_thread = threading.Thread(target=load_all, name="model-prewarm", daemon=True)
+        self._prewarm_thread.start()
+        return self._prewarm_thread
+
+    def status(self) -> Dict[str, str]:
+        """{name: 'loaded' | 'unavailable' | 'pending'}."""
+        return {name: 'loaded' if name in self._instances else 'unavailable' if name in self._failed else 'pending'
+                for name in self._factories}
@@ -1,11 +1,25 @@
-from typing import Dict
+import os
+import threading
+import numpy as np
+from typing import Dict, List, Tuple, Union
 from core.parser import UserStats
+from core.table import MessageTable
+from core.metrics import instrument
+
+Weights = Union[Dict[str, float], np.ndarray]
 
 class ValueScorer:
     """
     Computes a 9-dimensional weighted value score for each user.
+    The users × FEATURES matrix of the last `compute_scores` call is kept, so scores under
+    other weights are a single matrix product via `rescore` / `rescore_batch`, without
+    rerunning the pipeline. With a `matrix_dir`, each chat's matrix is also written to
+    <matrix_dir>/<key>/value_features.npz, and passing that key re-scores the chat's last run.
     """
-    def __init__(self, weights: Dict[str, float] = None):
+    FEATURES = ('replies_triggered', 'conversation_starts', 'questions_asked', 'questions_answered',
+                'code_snippets', 'links_shared', 'total_words', 'vocab_richness', 'unique_engagers')
+
+    def __init__(self, weights: Dict[str, float] = None, matrix_dir: str = None):
         if weights is None:
             self.weights = {
                 'replies_triggered': 2.0,
@@ -20,26 +34,99 @@ class ValueScorer:
             }
         else:
             self.weights = weights
+        self.matrix_dir = matrix_dir
+        self.users: List[str] = []
+        self.matrix = np.zeros((0, len(self.FEATURES)))
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_matrix(cls, users: List[str], matrix: np.ndarray, weights: Dict[str, float] = None) -> 'ValueScorer':
+        """A scorer holding an earlier run's feature matrix, for re-weighting it."""
+        scorer = cls(weights)
+        scorer.users, scorer.matrix = list(users), np.asarray(matrix, dtype=np.float64)
+        return scorer
+
+    @classmethod
+    def feature_matrix(cls, user_stats_dict: Dict[str, UserStats]) -> np.ndarray:
+        """users × FEATURES matrix in the dict's user order."""
+        rows = [(s.replies_triggered, s.conversation_starts, s.questions_asked, s.questions_answered,
+                 s.code_snippets, s.links_shared, s.total_words, s.vocab_richness, s.engager_count)
+                for s in user_stats_dict.values()]
+        return np.array(rows, dtype=np.float64).reshape(len(rows), len(cls.FEATURES))
+
+    def weight_vector(self, weights: Weights = None) -> np.ndarray:
+        """FEATURES-ordered weights; a dict falls back to 0 for missing features, None to `self.weights`."""
+        if isinstance(weights, np.ndarray):
+            return weights.astype(np.float64)
+        weights = self.weights if weights is None else weights
+        return np.array([weights.get(f, 0) for f in self.FEATURES], dtype=np.float64)
+
+    def matrix_path(self, key: str) -> str:
+        """Where the feature matrix of chat `key` is kept."""
+        if not self.matrix_dir:
+            raise ValueError("ValueScorer has no matrix_dir to keep feature matrices in.")
+        return os.path.join(self.matrix_dir, key, "value_features.npz")
+
+    @instrument('scoring.compute_scores')
+    def compute_scores(self, user_stats_dict: Union[Dict[str, UserStats], MessageTable], key: str = None) -> Dict[str, float]:
+        """Scores users 0-100; with a `key` (and `matrix_dir`), the feature matrix is saved under it."""
+        if isinstance(user_stats_dict, MessageTable):
+            user_stats_dict = user_stats_dict.user_stats()
+        users, matrix = list(user_stats_dict), self.feature_matrix(user_stats_dict)
+        with self._lock:
+            self.users, self.matrix = users, matrix
+            if key and self.matrix_dir:
+                os.makedirs(os.path.dirname(self.matrix_path(key)), exist_ok=True)
+                self.save(self.matrix_path(key))
+        return dict(zip(users, self.normalize(self.weight_vector()[None, :] @ matrix.T)[0].tolist()))
+
+    def rescore(self, weights: Weights = None, key: str = None) -> Dict[str, float]:
+        """
+        Scores under `weights` (default `self.weights`), 0-100, of the last run's users, or of
+        the last run of chat `key`.
+        """
+        users, matrix = self._features(key)
+        return dict(zip(users, self.normalize(self.weight_vector(weights)[None, :] @ matrix.T)[0].tolist()))
+
+    def rescore_batch(self, weights: Union[np.ndarray, List[Dict[str, float]]], key: str = None) -> np.ndarray:
+        """
+        (weight vectors × users) scores for many weightings at once, e.g. for sensitivity
+        analysis; `weights` is an (m, FEATURES) array or a list of weight dicts.
+        Each row is normalized so its top user scores 100.
+        """
+        if not isinstance(weights, np.ndarray):
+            weights = np.stack([self.weight_vector(w) for w in weights]) if weights else np.zeros((0, len(self.FEATURES)))
+        return self.normalize(np.atleast_2d(weights) @ self._features(key)[1].T)
+
+    def _features(self, key: str = None) -> Tuple[List[str], np.ndarray]:
+        if key is None:
+            with self._lock:
+                return self.users, self.matrix
+        path = self.matrix_path(key)
+        if not os.path.exists(path):
+            raise KeyError(f"No feature matrix saved for chat '{key}'.")
+        return self.read(path)
+
+    @staticmethod
+    def normalize(scores: np.ndarray) -> np.ndarray:
+        if scores.shape[1] == 0:
+            return scores
+        top = scores.max(axis=1, keepdims=True)
+        top[top == 0] = 1.0
+        return np.round(scores / top * 100, 2)
+
+    def save(self, path: str):
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, users=np.array(self.users, dtype=str), matrix=self.matrix, features=np.array(self.FEATURES))
+        os.replace(tmp, path)
+
+    def load(self, path: str):
+        self.users, self.matrix = self.read(path)
 
-    def compute_scores(self, user_stats_dict: Dict[str, UserStats]) -> Dict[str, float]:
-        scores = {}
-        for user, stats in user_stats_dict.items():
-            score = 0.0
-            score += stats.replies_triggered * self.weights.get('replies_triggered', 0)
-            score += stats.conversation_starts * self.weights.get('conversation_starts', 0)
-            score += stats.questions_asked * self.weights.get('questions_asked', 0)
-            score += stats.questions_answered * self.weights.get('questions_answered', 0)
-            score += stats.code_snippets * self.weights.get('code_snippets', 0)
-            score += stats.links_shared * self.weights.get('links_shared', 0)
-            score += stats.total_words * self.weights.get('total_words', 0)
-            score += stats.vocab_richness * self.weights.get('vocab_richness', 0)
-            score += len(stats.unique_engagers) * self.weights.get('unique_engagers', 0)
-            scores[user] = score
-            
-        # Optional: Normalize scores (0-100 scale)
-        if scores:
-            max_score = max(scores.values()) or 1.0
-            for user in scores:
-                scores[user] = round((scores[user] / max_score) * 100, 2)
-                
-        return scores
+    @classmethod
+    def read(cls, path: str) -> Tuple[List[str], np.ndarray]:
+        """(users, matrix) saved at `path`; empty if it was saved with other FEATURES."""
+        with np.load(path) as data:
+            if tuple(data["features"].tolist()) != cls.FEATURES:
+                return [], np.zeros((0, len(cls.FEATURES)))
+            return data["users"].tolist(), data["matrix"]
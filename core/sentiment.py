@@ -1,5 +1,8 @@
 from typing import List, Dict
 import logging
+from core.inference import InferenceScheduler
+from core.onnx_backend import check_backend
+from core.metrics import instrument
 
 logger = logging.getLogger(__name__)
 
@@ -9,19 +12,36 @@ class EmotionAnalyzer:
     Produces complex emotions (e.g. 'admiration', 'annoyance', 'joy', 'curiosity') 
     instead of flat VADER polarity.
     """
-    def __init__(self):
+    MODEL = "SamLowe/roberta-base-go_emotions"
+
+    def __init__(self, max_length: int = 256, token_budget: int = 8192,
+                 backend: str = 'torch', onnx_dir: str = None, threads: int = None):
+        """`backend='onnx'` runs an int8 ONNX Runtime export with `threads` intra-op threads."""
+        check_backend(backend)
+        self.backend = backend
         try:
             from transformers import pipeline
-            logger.info("Loading RoBERTa Emotion Classifier (this may take a minute)...")
-            self.classifier = pipeline("text-classification", model="SamLowe/roberta-base-go_emotions", top_k=1)
-            logger.info("Loaded SamLowe/roberta-base-go_emotions")
+            logger.info(f"Loading RoBERTa Emotion Classifier ({backend}, this may take a minute)...")
+            if backend == 'onnx':
+                from core.onnx_backend import load_sequence_classifier
+                model, tokenizer = load_sequence_classifier(self.MODEL, onnx_dir, threads)
+                self.classifier = pipeline("text-classification", model=model, tokenizer=tokenizer, top_k=1)
+            else:
+                self.classifier = pipeline("text-classification", model=self.MODEL, top_k=1)
+            logger.info(f"Loaded {self.MODEL}")
         except ImportError:
             raise ImportError("Please install transformers and torch.")
+        self.scheduler = InferenceScheduler(self.classifier.tokenizer, max_length, token_budget)
 
+    @instrument('emotions.analyze_batch')
     def analyze_batch(self, texts: List[str]) -> List[Dict]:
         """Returns the primary emotion and score for each text."""
+        return self.scheduler.run(texts, self._infer_batch, name='emotions')
+
+    def _infer_batch(self, texts: List[str]) -> List[Dict]:
         # Pipeline top_k=1 returns a list of lists of dicts
-        out = self.classifier(texts)
+        out = self.classifier(texts, batch_size=len(texts), truncation=True,
+                              max_length=self.scheduler.max_length)
         results = []
         for res in out:
             top_emotion = res[0]
@@ -0,0 +1,148 @@
+import os
+import time
+import logging
+import threading
+import contextvars
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, List, Sequence
+from core import metrics
+
+logger = logging.getLogger(__name__)
+
+class Stage:
+    """A named unit of pipeline work, called with the results of its dependencies in order."""
+    def __init__(self, name: str, fn: Callable[..., Any], deps: Sequence[str] = (), uses_torch: bool = False):
+        self.name = name
+        self.fn = fn
+        self.deps = tuple(deps)
+        self.uses_torch = uses_torch
+
+class StageGraph:
+    """
+    Runs a DAG of stages on a thread pool, starting each stage as soon as its dependencies
+    have finished. NumPy, SciPy and torch release the GIL in their kernels, so CPU-bound
+    graph and influence stages overlap with model inference.
+    Torch's intra-op pool is process-wide; while several torch stages can run at once, across
+    all graphs running in the process, it is capped to an equal share of the CPUs so they do
+    not oversubscribe the machine.
+    Each stage runs in a copy of the caller's context, so an active MetricsRecorder sees it
+    (and everything instrumented inside it) as a span named after the stage.
+    """
+    # Torch stages that may run at once over all running graphs, and torch's thread count before them
+    _torch_lock = threading.Lock()
+    _torch_stages = 0
+    _torch_default = None
+
+    def __init__(self, max_workers: int = 4):
+        self.max_workers = max(1, max_workers)
+        self.stages: Dict[str, Stage] = {}
+        self.timeline: List[Dict] = []
+
+    def add(self, name: str, fn: Callable[..., Any], deps: Sequence[str] = (), uses_torch: bool = False) -> 'StageGraph':
+        if name in self.stages:
+            raise ValueError(f"Stage '{name}' is already defined.")
+        self.stages[name] = Stage(name, fn, deps, uses_torch)
+        return self
+
+    def run(self, progress: Callable[[str, str], None] = None) -> Dict[str, Any]:
+        """
+        Executes every stage and returns {stage: result}; the first stage error is re-raised
+        and no further stages are started. `progress(stage, 'start' | 'done')` is called from
+        the stage's worker thread; an exception it raises fails that stage.
+        """
+        missing = {d for s in self.stages.values() for d in s.deps if d not in self.stages}
+        if missing:
+            raise ValueError(f"Unknown stage dependencies: {sorted(missing)}")
+
+        self.timeline = []
+        origin = time.perf_counter()
+        results: Dict[str, Any] = {}
+        pending = dict(self.stages)
+        restore = self._cap_torch_threads()
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stage") as pool:
+                running = {}
+
+                def submit_ready():
+                    for name, stage in list(pending.items()):
+                        if all(d in results for d in stage.deps):
+                            del pending[name]
+                            ctx = contextvars.copy_context()
+                            args = [results[d] for d in stage.deps]
+                            running[pool.submit(ctx.run, self._run_stage, stage, args, origin, progress)] = name
+
+                submit_ready()
+                while running:
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        results[running.pop(future)] = future.result()
+                    submit_ready()
+        finally:
+            restore()
+
+        if pending:
+            raise ValueError(f"Stage dependency cycle among: {sorted(pending)}")
+        self.timeline.sort(key=lambda e: e['start'])
+        return results
+
+    def _run_stage(self, stage: Stage, args: List[Any], origin: float, progress: Callable[[str, str], None]) -> Any:
+        start = time.perf_counter()
+        try:
+            if progress:
+                progress(stage.name, 'start')
+            with metrics.span(stage.name):
+                result = stage.fn(*args)
+            if progress:
+                progress(stage.name, 'done')
+            return result
+        finally:
+            end = time.perf_counter()
+            self.timeline.append({
+                'stage': stage.name,
+                'start': round(start - origin, 4),
+                'end': round(end - origin, 4),
+                'seconds': round(end - start, 4),
+                'thread': threading.current_thread().name,
+            })
+
+    def _cap_torch_threads(self) -> Callable[[], None]:
+        """
+        Counts this graph's concurrent torch stages towards the process-wide cap for the run,
+        and returns a function that releases them again (restoring the default thread count
+        once no graph has torch stages left).
+        """
+        concurrent = min(sum(s.uses_torch for s in self.stages.values()), self.max_workers)
+        torch = self._torch() if concurrent else None
+        if torch is None:
+            return lambda: None
+        cls = StageGraph
+        with cls._torch_lock:
+            if cls._torch_stages == 0:
+                cls._torch_default = torch.get_num_threads()
+            cls._torch_stages += concurrent
+            self._set_torch_threads(torch)
+
+        def release():
+            with cls._torch_lock:
+                cls._torch_stages -= concurrent
+                self._set_torch_threads(torch)
+        return release
+
+    @staticmethod
+    def _torch():
+        """The torch module, imported now if installed: on a cold start no model has loaded it yet."""
+        if importlib.util.find_spec('torch') is None:
+            return None
+        import torch
+        return torch
+
+    @staticmethod
+    def _set_torch_threads(torch):
+        # Called under _torch_lock
+        stages, default = StageGraph._torch_stages, StageGraph._torch_default
+        threads = default if stages < 2 else min(default, max(1, (os.cpu_count() or 1) // stages))
+        if torch.get_num_threads() != threads:
+            torch.set_num_threads(threads)
+            if threads < default:
+                logger.info(f"Capping torch intra-op threads at {threads} for {stages} concurrent stages")
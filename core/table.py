@@ -0,0 +1,142 @@
+import numpy as np
+from array import array
+from datetime import datetime, timedelta
+from typing import List, Dict, Iterable, Tuple, Union
+from core.parser import Message, UserStats, Record
+
+# UserStats counters that can be summed per sender from equally named annotation columns
+COUNTER_FIELDS = ('replies_triggered', 'conversation_starts', 'questions_asked', 'questions_answered',
+                  'code_snippets', 'links_shared', 'total_words', 'num_unique_words', 'num_unique_engagers')
+
+EPOCH = datetime(1970, 1, 1)
+ONE_SECOND = timedelta(seconds=1)
+
+def to_epoch(ts: datetime) -> int:
+    """Naive export timestamps as whole seconds since the Unix epoch."""
+    return (ts - EPOCH) // ONE_SECOND
+
+class MessageTable:
+    """
+    Columnar message store for large chats.
+    Timestamps are int64 epoch seconds, senders are dictionary-encoded (ids are assigned in
+    order of first appearance), and all contents live in one UTF-8 buffer addressed by
+    `offsets`. Per-message results are kept as NumPy annotation columns.
+    """
+    def __init__(self, timestamps: np.ndarray, sender_ids: np.ndarray, senders: List[str],
+                 content: bytes, offsets: np.ndarray, indices: np.ndarray,
+                 annotations: Dict[str, np.ndarray] = None):
+        self.timestamps = timestamps
+        self.sender_ids = sender_ids
+        self.senders = senders
+        self.content = content
+        self.offsets = offsets
+        self.indices = indices
+        self.annotations = annotations or {}
+
+    @classmethod
+    def from_records(cls, records: Iterable[Record]) -> 'MessageTable':
+        """Builds a table from parser records without creating per-message objects."""
+        timestamps, sender_ids, indices = array('q'), array('i'), array('q')
+        offsets = array('q', [0])
+        content = bytearray()
+        sender_map: Dict[str, int] = {}
+        for t, sender, text, idx in records:
+            sid = sender_map.get(sender)
+            if sid is None:
+                sid = sender_map[sender] = len(sender_map)
+            timestamps.append(to_epoch(t))
+            sender_ids.append(sid)
+            indices.append(idx)
+            content += text.encode('utf-8')
+            offsets.append(len(content))
+        return cls(np.frombuffer(timestamps, dtype=np.int64), np.frombuffer(sender_ids, dtype=np.int32),
+                   list(sender_map), bytes(content), np.frombuffer(offsets, dtype=np.int64),
+                   np.frombuffer(indices, dtype=np.int64))
+
+    @classmethod
+    def from_messages(cls, messages: Iterable[Message]) -> 'MessageTable':
+        return cls.from_records((m.timestamp, m.sender, m.content, m.index) for m in messages)
+
+    @classmethod
+    def concat(cls, tables: List['MessageTable']) -> 'MessageTable':
+        """Concatenates tables, re-encoding senders; annotations present in every table are kept."""
+        sender_map: Dict[str, int] = {}
+        ids, offsets, base = [], [np.zeros(1, dtype=np.int64)], 0
+        for t in tables:
+            remap = np.array([sender_map.setdefault(s, len(sender_map)) for s in t.senders], dtype=np.int32)
+            ids.append(remap[t.sender_ids] if len(t.senders) else t.sender_ids)
+            offsets.append(t.offsets[1:] - t.offsets[0] + base)
+            base += int(t.offsets[-1] - t.offsets[0])
+        shared = set.intersection(*(set(t.annotations) for t in tables)) if tables else set()
+        return cls(np.concatenate([t.timestamps for t in tables]), np.concatenate(ids).astype(np.int32),
+                   list(sender_map), b''.join(t.content[t.offsets[0]:t.offsets[-1]] for t in tables),
+                   np.concatenate(offsets), np.concatenate([t.indices for t in tables]),
+                   {k: np.concatenate([t.annotations[k] for t in tables]) for k in shared})
+
+    def slice(self, start: int, stop: int) -> 'MessageTable':
+        """Rows [start, stop); the content buffer and sender dictionary are shared, not copied."""
+        return MessageTable(self.timestamps[start:stop], self.sender_ids[start:stop], self.senders,
+                            self.content, self.offsets[start:stop + 1], self.indices[start:stop],
+                            {k: v[start:stop] for k, v in self.annotations.items()})
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def text(self, i: int) -> str:
+        return self.content[self.offsets[i]:self.offsets[i + 1]].decode('utf-8')
+
+    def texts(self) -> List[str]:
+        bounds = self.offsets.tolist()
+        buf = self.content
+        return [buf[a:b].decode('utf-8') for a, b in zip(bounds, bounds[1:])]
+
+    def sender(self, i: int) -> str:
+        return self.senders[self.sender_ids[i]]
+
+    def message(self, i: int) -> Message:
+        """Materializes row `i` as a Message, for callers that need the object form."""
+        return Message(timestamp=EPOCH + timedelta(seconds=int(self.timestamps[i])), sender=self.sender(i),
+                       content=self.text(i), index=int(self.indices[i]))
+
+    def annotate(self, name: str, values) -> np.ndarray:
+        values = np.asarray(values)
+        if len(values) != len(self):
+            raise ValueError(f"Column '{name}' has {len(values)} values for {len(self)} messages.")
+        self.annotations[name] = values
+        return values
+
+    def user_stats(self) -> Dict[str, UserStats]:
+        """
+        Per-sender UserStats without message lists. Integer counters are summed from
+        annotation columns of the same name where present, and a 'response_latency' column
+        (NaN where a message is not a reply) is gathered into `response_latencies`.
+        """
+        k = len(self.senders)
+        counts = np.bincount(self.sender_ids, minlength=k)
+        counters = [f for f in COUNTER_FIELDS if f in self.annotations]
+        sums = {f: np.bincount(self.sender_ids, weights=self.annotations[f], minlength=k) for f in counters}
+        latencies = [[] for _ in range(k)]
+        if 'response_latency' in self.annotations:
+            rows = np.flatnonzero(~np.isnan(self.annotations['response_latency']))
+            rows = rows[np.argsort(self.sender_ids[rows], kind='stable')]
+            bounds = np.searchsorted(self.sender_ids[rows], np.arange(k + 1))
+            values = self.annotations['response_latency'][rows].tolist()
+            latencies = [values[bounds[s]:bounds[s + 1]] for s in range(k)]
+        return {
+            name: UserStats(name=name, num_messages=int(counts[sid]), response_latencies=latencies[sid],
+                            **{f: int(sums[f][sid]) for f in counters})
+            for sid, name in enumerate(self.senders) if counts[sid] > 0
+        }
+
+def columns_of(messages: Union[List[Message], MessageTable]) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """
+    (sender_ids, epoch-second timestamps, sender names) for either a MessageTable or a
+    list of Message objects, with ids in order of first appearance.
+    """
+    if isinstance(messages, MessageTable):
+        return messages.sender_ids, messages.timestamps, messages.senders
+    sender_map: Dict[str, int] = {}
+    ids = np.fromiter((sender_map.setdefault(m.sender, len(sender_map)) for m in messages),
+                      dtype=np.int32, count=len(messages))
+    ts = np.fromiter((to_epoch(m.timestamp) for m in messages), dtype=np.int64, count=len(messages))
+    return ids, ts, list(sender_map)
@@ -1,6 +1,11 @@
+import os
+import json
+import uuid
 import numpy as np
 import logging
 from typing import List, Dict, Tuple, Optional
+from core.metrics import count, instrument
+from core.compact import Embeddings
 
 logger = logging.getLogger(__name__)
 
@@ -8,42 +13,124 @@ class TopicDiscoverer:
     """
     V6 SOTA Topic Discovery using BERTopic + HDBSCAN + UMAP.
     Extracts dynamic underlying conversational topics without predefined lists.
+
+    Scales to large chats by fitting on a stratified subsample of at most `max_fit_docs`
+    messages and assigning the rest with `transform` (UMAP transform + HDBSCAN approximate
+    prediction) in batches of `transform_batch`. With `model_dir`, the fitted model is saved
+    per chat id so later runs only transform new messages; the model is refit when the share of
+    new messages landing in the outlier topic (-1) exceeds the share seen at fit time by more
+    than `outlier_refit` (checked once at least `min_refit_docs` new messages arrived).
     """
-    def __init__(self):
+    def __init__(self, max_fit_docs: int = 20000, transform_batch: int = 10000, outlier_refit: float = 0.2,
+                 min_refit_docs: int = 50, model_dir: str = None, seed: int = 0):
         try:
-            from bertopic import BERTopic
-            from hdbscan import HDBSCAN
-            from umap import UMAP
-            
-            logger.info("Initializing BERTopic Engine...")
-            # We tune HDBSCAN for short sparse conversational text
-            hdbscan_model = HDBSCAN(min_cluster_size=3, metric='euclidean', cluster_selection_method='eom', prediction_data=True)
-            # UMAP initialized for clustering short text embeddings
-            umap_model = UMAP(n_neighbors=15, n_components=5, min_dist=0.0, metric='cosine')
-            
-            # Note: We provide embeddings directly, so no embedding_model initialization inside BERTopic here.
-            self.topic_model = BERTopic(
-                hdbscan_model=hdbscan_model,
-                umap_model=umap_model,
-                nr_topics="auto", 
-                language="multilingual",
-                calculate_probabilities=False
-            )
-            logger.info("BERTopic Initialized.")
+            import bertopic  # noqa: F401
+            import hdbscan  # noqa: F401
+            import umap  # noqa: F401
         except ImportError:
             raise ImportError("Please ensure bertopic is installed in the environment.")
+        self.max_fit_docs = max_fit_docs
+        self.transform_batch = transform_batch
+        self.outlier_refit = outlier_refit
+        self.min_refit_docs = min_refit_docs
+        self.model_dir = model_dir
+        self.seed = seed
+        self.topic_model = None
+        self.fit_id = None
+        self.fit_outliers = 0.0
+        self.stats: Dict = {}
+
+    def _new_model(self):
+        from bertopic import BERTopic
+        from hdbscan import HDBSCAN
+        from umap import UMAP
+
+        logger.info("Initializing BERTopic Engine...")
+        # We tune HDBSCAN for short sparse conversational text
+        hdbscan_model = HDBSCAN(min_cluster_size=3, metric='euclidean', cluster_selection_method='eom', prediction_data=True)
+        # UMAP initialized for clustering short text embeddings
+        umap_model = UMAP(n_neighbors=15, n_components=5, min_dist=0.0, metric='cosine', random_state=self.seed)
 
-    def discover_topics(self, messages: List[str], embeddings: np.ndarray) -> Tuple[List[int], Dict[int, str]]:
+        # Note: We provide embeddings directly, so no embedding_model initialization inside BERTopic here.
+        return BERTopic(
+            hdbscan_model=hdbscan_model,
+            umap_model=umap_model,
+            nr_topics="auto", 
+            language="multilingual",
+            calculate_probabilities=False
+        )
+
+    @instrument('topics.discover_topics')
+    def discover_topics(self, messages: List[str], embeddings: Embeddings, strata: Optional[np.ndarray] = None,
+                        chat_id: str = None, previous: Optional[Tuple[List[int], str]] = None) -> Tuple[List[int], Dict[int, str]]:
         """
-        Fits BERTopic on the entire conversation history.
+        Assigns a topic to every message.
         Args:
             messages: List of raw string texts.
-            embeddings: Numpy array of pre-computed embeddings for the messages.
+            embeddings: Pre-computed embeddings for the messages, as an array or a compact form from
+                core.compact (float16, QuantizedEmbeddings); only the fit subsample and one
+                transform batch at a time are expanded to float32.
+            strata: Optional per-message group labels (e.g. month) the fit subsample is balanced over.
+            chat_id: Key under `model_dir` the fitted model is persisted to and reused from.
+            previous: (topics of the first len(topics) messages, fit id of the model that produced them).
+                When it matches the persisted model, only the remaining messages are transformed.
         Returns:
             topics: List of integer topic assignments for each message.
             topic_names: Dictionary mapping topic IDs to human-readable names.
         """
-        topics, probs = self.topic_model.fit_transform(messages, embeddings)
+        n = len(messages)
+        if previous is not None and chat_id and self._load(chat_id) == previous[1]:
+            known = list(previous[0])
+            new_topics = self._transform(messages[len(known):], embeddings[len(known):])
+            outliers = float(np.mean(np.asarray(new_topics) == -1)) if new_topics else 0.0
+            if len(new_topics) < self.min_refit_docs or outliers <= self.fit_outliers + self.outlier_refit:
+                count('model_reused')
+                self.stats = {'fit_id': self.fit_id, 'refit': False, 'transformed': len(new_topics), 'outlier_fraction': outliers}
+                return known + new_topics, self._topic_names()
+            logger.info(f"{outliers:.0%} of new messages are outliers (vs {self.fit_outliers:.0%} at fit); refitting the topic model.")
+
+        sample = self._stratified_sample(n, strata)
+        self.topic_model = self._new_model()
+        fit_topics, _ = self.topic_model.fit_transform([messages[i] for i in sample],
+                                                       np.asarray(embeddings[sample], dtype=np.float32))
+        topics = np.empty(n, dtype=np.int64)
+        topics[sample] = fit_topics
+        rest = np.setdiff1d(np.arange(n), sample)
+        if len(rest):
+            topics[rest] = self._transform([messages[i] for i in rest], embeddings[rest])
+        self.fit_id = uuid.uuid4().hex
+        self.fit_outliers = float(np.mean(topics == -1)) if n else 0.0
+        if chat_id:
+            self._save(chat_id)
+        self.stats = {'fit_id': self.fit_id, 'refit': True, 'fit_docs': len(sample), 'transformed': len(rest),
+                      'outlier_fraction': self.fit_outliers}
+        return topics.tolist(), self._topic_names()
+
+    def _stratified_sample(self, n: int, strata: Optional[np.ndarray]) -> np.ndarray:
+        """Sorted positions of at most `max_fit_docs` messages, spread proportionally over `strata`."""
+        if n <= self.max_fit_docs:
+            return np.arange(n)
+        if strata is None:
+            # Default strata: consecutive stretches of the conversation
+            strata = np.arange(n) * 64 // n
+        rng = np.random.default_rng(self.seed)
+        labels, inverse, counts = np.unique(strata, return_inverse=True, return_counts=True)
+        quota = np.maximum(1, np.floor(counts * self.max_fit_docs / n).astype(np.int64))
+        order = np.argsort(inverse, kind='stable')
+        bounds = np.concatenate([[0], np.cumsum(counts)])
+        picks = [rng.choice(order[bounds[g]:bounds[g + 1]], size=min(int(quota[g]), int(counts[g])), replace=False)
+                 for g in range(len(labels))]
+        return np.sort(np.concatenate(picks))
+
+    def _transform(self, messages: List[str], embeddings: Embeddings) -> List[int]:
+        out: List[int] = []
+        for b in range(0, len(messages), self.transform_batch):
+            topics, _ = self.topic_model.transform(messages[b:b + self.transform_batch],
+                                                   np.asarray(embeddings[b:b + self.transform_batch], dtype=np.float32))
+            out.extend(int(t) for t in topics)
+        return out
+
+    def _topic_names(self) -> Dict[int, str]:
         topic_info = self.topic_model.get_topic_info()
         
         # Build dictionary of topic index -> nice topic representation (top 3 words)
@@ -56,5 +143,36 @@ class TopicDiscoverer:
                 topic_names[topic_id] = " | ".join(words[:3])
             else:
                 topic_names[topic_id] = "Unknown"
-        
-        return topics, topic_names
+        return topic_names
+
+    def _meta_path(self, chat_id: str) -> str:
+        return os.path.join(self.model_dir, chat_id, "topic_model.json")
+
+    def _save(self, chat_id: str):
+        """Writes the model under a fit-id file name, then points the metadata at it atomically."""
+        if not self.model_dir:
+            return
+        meta_path = self._meta_path(chat_id)
+        path = os.path.dirname(meta_path)
+        os.makedirs(path, exist_ok=True)
+        model_file = f"topic_model_{self.fit_id}.pkl"
+        self.topic_model.save(os.path.join(path, model_file), serialization="pickle")
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump({"fit_id": self.fit_id, "file": model_file, "fit_outliers": self.fit_outliers}, f)
+        os.replace(meta_path + ".tmp", meta_path)
+        for name in os.listdir(path):
+            if name.startswith("topic_model_") and name != model_file:
+                os.remove(os.path.join(path, name))
+
+    def _load(self, chat_id: str) -> Optional[str]:
+        """Loads the persisted model of `chat_id` and returns its fit id (None if absent)."""
+        if not self.model_dir or not os.path.exists(self._meta_path(chat_id)):
+            return None
+        with open(self._meta_path(chat_id)) as f:
+            meta = json.load(f)
+        if self.fit_id != meta["fit_id"] or self.topic_model is None:
+            from bertopic import BERTopic
+            self.topic_model = BERTopic.load(os.path.join(os.path.dirname(self._meta_path(chat_id)), meta["file"]))
+            self.fit_id = meta["fit_id"]
+            self.fit_outliers = meta["fit_outliers"]
+        return self.fit_id
@@ -1,65 +1,190 @@
-import gradio as gr
-import pandas as pd
 import json
+import os
 import time
-from core.pipeline import V6Pipeline
+
+# gradio, pandas and the pipeline are imported on first use so the module itself loads instantly;
+# the UI is built when `demo` is first accessed
 
 # We initialize the V6 Engine out-of-band for performance
 pipeline = None
+# Analyses run on a bounded background queue so uploads do not block each other
+jobs = None
+
+# Embeddings and per-chat analysis state are reused across uploads
+CACHE_DIR = os.environ.get("WA_CACHE_DIR", ".wa_cache")
+# Set WA_PREWARM=1 to load every model in the background as soon as the engine starts
+PREWARM = os.environ.get("WA_PREWARM", "0") == "1"
+# WA_BACKEND=onnx runs the local models as int8 ONNX Runtime exports (CPU-only nodes)
+BACKEND = os.environ.get("WA_BACKEND", "torch")
+# WA_METRICS_FILE=/path/wa.prom writes each run's per-stage metrics for node_exporter's textfile collector
+METRICS_FILE = os.environ.get("WA_METRICS_FILE")
+# WA_JOB_WORKERS caps concurrent analyses (default: sized to the free cores and memory)
+JOB_WORKERS = int(os.environ.get("WA_JOB_WORKERS", "0")) or None
+# WA_EMBEDDING_STORAGE=float16|int8 and WA_EMBEDDING_DIMS=256 (WA_EMBEDDING_PROJECTION=truncate|pca) shrink embeddings in memory
+EMBEDDING_STORAGE = os.environ.get("WA_EMBEDDING_STORAGE", "float32")
+EMBEDDING_DIMS = int(os.environ.get("WA_EMBEDDING_DIMS", "0")) or None
+EMBEDDING_PROJECTION = os.environ.get("WA_EMBEDDING_PROJECTION", "truncate")
+
+ANALYSES = ["graph", "influence", "emotions", "topics", "classification"]
 
 def init_pipeline(mode, api_key):
     global pipeline
     if pipeline is None:
-        pipeline = V6Pipeline(mode=mode, api_key=api_key)
+        from core.pipeline import V6Pipeline
+        pipeline = V6Pipeline(mode=mode, api_key=api_key,
+                              cache_dir=os.path.join(CACHE_DIR, "embeddings"),
+                              state_dir=os.path.join(CACHE_DIR, "chats"),
+                              prewarm=PREWARM, backend=BACKEND, metrics_path=METRICS_FILE,
+                              embedding_storage=EMBEDDING_STORAGE, embedding_dims=EMBEDDING_DIMS,
+                              embedding_projection=EMBEDDING_PROJECTION)
     return "Engine Initialized and Ready."
 
-def analyze_chat(file_obj, mode, api_key):
+def run_job(path, options, progress):
+    return pipeline.process_file(path, stages=options["stages"], progress=progress)
+
+def init_jobs():
+    global jobs
+    if jobs is None:
+        from core.jobs import JobQueue
+        jobs = JobQueue(run_job, workers=JOB_WORKERS)
+    return jobs
+
+def job_status(job):
+    status = f"{job.progress:.0%}" if job.status == "running" else job.status
+    step = f" · **Step:** `{job.step}`" if job.step else ""
+    return f"""
+    ### Analyzing... {status}
+    **Job:** `{job.id}`{step}
+    """
+
+def analyze_chat(file_obj, mode, api_key, analyses=None):
+    """Queues the upload and streams its progress; yields the dashboard outputs followed by the job id."""
+    import gradio as gr
+    from core.jobs import QueueFull
     global pipeline
     if not file_obj:
         raise gr.Error("Please upload a .txt file")
+    if analyses is not None and not analyses:
+        raise gr.Error("Select at least one analysis")
     
     if pipeline is None:
         init_pipeline(mode, api_key)
-        
-    with open(file_obj.name, 'r', encoding='utf-8') as f:
-        text = f.read()
+    queue = init_jobs()
+    options = {"stages": sorted(analyses) if analyses is not None else None}
+    try:
+        job = queue.submit(file_obj.name, options, config=pipeline._state_config())
+    except QueueFull as e:
+        raise gr.Error(str(e))
 
-    results = pipeline.process_chat(text)
-    
-    if "error" in results:
-        raise gr.Error(results["error"])
-        
+    for job in queue.stream(job.id):
+        if not job.done:
+            yield (job_status(job),) + (gr.update(),) * 6 + (job.id,)
+    if job.status == "cancelled":
+        yield ("### Analysis cancelled",) + (gr.update(),) * 6 + (job.id,)
+        return
+    if job.status == "failed":
+        raise gr.Error(job.error)
+    if "error" in job.result:
+        raise gr.Error(job.result["error"])
+    yield format_results(job.result, job) + (job.id,)
+
+def cancel_job(job_id):
+    if jobs is None or not job_id or not jobs.cancel(job_id):
+        return "### Nothing to cancel"
+    return f"### Cancelling job `{job_id}`..."
+
+def leaderboard(rows):
+    import pandas as pd
+    return pd.DataFrame(rows).sort_values(by="Value Score", ascending=False)
+
+def rerank(scoring, *weights):
+    """Re-scores the last result under slider weights from its feature matrix, without the models."""
+    import gradio as gr
+    from core.scoring import ValueScorer
+    if not scoring:
+        return gr.update()
+    scorer = ValueScorer.from_matrix(scoring["users"], scoring["matrix"], dict(zip(ValueScorer.FEATURES, weights)))
+    scores = scorer.rescore()
+    return leaderboard([dict(row, **{"Value Score": round(scores.get(row["Participant"], 0), 1)}) for row in scoring["rows"]])
+
+def centrality_over_time(series, top=10):
+    """Long-format eigenvector centrality per window for the `top` participants by peak value."""
+    import pandas as pd
+    from datetime import datetime, timezone
+    if not series or not len(series["window_end"]):
+        return pd.DataFrame(columns=["Window", "Participant", "Eigenvector Centrality"])
+    eig = series["eigenvector"]
+    leaders = eig.max(axis=0).argsort()[::-1][:top]
+    windows = [datetime.fromtimestamp(int(t), tz=timezone.utc).date().isoformat() for t in series["window_end"]]
+    return pd.DataFrame([{"Window": w, "Participant": series["users"][u], "Eigenvector Centrality": float(eig[i, u])}
+                         for u in leaders for i, w in enumerate(windows)])
+
+def similar_messages(job_id, query, k=10):
+    """Messages of the job's chat closest in meaning to `query`, looked up in its ANN index."""
+    import gradio as gr
+    import pandas as pd
+    job = jobs.get(job_id) if jobs is not None and job_id else None
+    if job is None or not job.result or job.result.get("message_index") is None:
+        raise gr.Error("Run an analysis with 'influence' selected first (older cached results no longer keep the index)")
+    columns = ["Similarity", "Time", "Sender", "Message"]
+    if not query or not query.strip():
+        return pd.DataFrame(columns=columns)
+    query_vector = pipeline.embed_engine.encode([query], job.result["embedding_codec"])
+    scores, ids = job.result["message_index"].search(query_vector, k)
+    table = job.result["messages"]
+    rows = []
+    for score, i in zip(scores[0], ids[0]):
+        if i < 0:
+            continue
+        msg = table.message(int(i))
+        rows.append({"Similarity": round(float(score), 3), "Time": msg.timestamp.strftime("%Y-%m-%d %H:%M"),
+                     "Sender": msg.sender, "Message": msg.content})
+    return pd.DataFrame(rows, columns=columns)
+
+def format_results(results, job=None):
     # Formatting output for the dashboard
     stats = results["centrality_stats"]
     value_scores = results.get("value_scores", {})
     uniqueness_scores = results.get("uniqueness_scores", {})
     influence_scores = results.get("influence_scores", {})
+    long_echo_scores = results.get("long_echo_scores", {})
     
     rows = []
-    for user, data in stats.items():
+    for user in value_scores:
+        data = stats.get(user, {})
         rows.append({
             "Participant": user,
             "Value Score": round(value_scores.get(user, 0), 1),
             "Idea Influence": round(influence_scores.get(user, 0), 3),
+            "Long-horizon Echo": round(long_echo_scores.get(user, 0), 3),
             "Semantic Uniqueness": round(uniqueness_scores.get(user, 0), 3),
-            "Betweenness Centrality": round(data['betweenness'], 3),
-            "Eigenvector Centrality": round(data['eigenvector'], 3),
-            "Messages Sent": data['out_degree']
+            "Betweenness Centrality": round(data.get('betweenness', 0), 3),
+            "Eigenvector Centrality": round(data.get('eigenvector', 0), 3),
+            "Messages Sent": data.get('out_degree', 0)
         })
-    df = pd.DataFrame(rows).sort_values(by="Value Score", ascending=False)
+    df = leaderboard(rows)
+    # Kept per session so the weight sliders re-rank this result
+    features = results["value_features"]
+    scoring = {"rows": rows, "users": features["users"], "matrix": features["matrix"]}
     
     emotions_str = json.dumps(results["emotion_sample"], indent=2) if results["has_emotions"] else "HuggingFace Transformers not active."
     topics_str = json.dumps(results["topic_sample"], indent=2) if results["has_bertopic"] else "BERTopic/HDBSCAN not active (C-compiler missing for Py3.14)."
     
+    model_loads = ", ".join(f"{k} {v:.1f}s" for k, v in results["startup"]["models"].items()) or "none"
+    stage_times = ", ".join(f"{k} {results['metrics'][k]['wall_seconds']:.1f}s"
+                            for k in ["parse"] + results["stages"] + ["scoring"] if k in results["metrics"])
     health_metrics = f"""
     ### V6 Network Health
     **Total Participants:** `{results['num_users']}`
     **Total Messages:** `{results['num_messages']}`
+    **Model load times:** `{model_loads}`
+    **Stage times:** `{stage_times}`
+    **Job:** `{job.id if job else "-"}`{" (cached result)" if job and job.cached else ""}
     """
     
-    graph_html = results.get("graph_html", "<p>Graph not available.</p>")
+    graph_html = results.get("graph_html") or "<p>Graph not available.</p>"
 
-    return health_metrics, df, emotions_str, topics_str, graph_html
+    return health_metrics, df, emotions_str, topics_str, graph_html, centrality_over_time(results.get("centrality_series")), scoring
 
 custom_css = """
 .container { max-width: 1600px; margin: auto; font-family: 'Inter', sans-serif; }
@@ -67,38 +192,70 @@ custom_css = """
 h1, h2, h3 { color: inherit !important; }
 """
 
-with gr.Blocks(title="WhatsApp Analyzer V6 SAAS", css=custom_css) as demo:
-    with gr.Column(elem_classes="container"):
-        gr.HTML("<div class='header-bg'><h1>WhatsApp Analyzer V6 Enterprise</h1><p>Powered by BGE-M3 Embeddings, RoBERTa Emotions, and TGNN Flow</p></div>")
+def build_demo():
+    import gradio as gr
+    from core.scoring import ValueScorer
+    with gr.Blocks(title="WhatsApp Analyzer V6 SAAS", css=custom_css) as demo:
+        with gr.Column(elem_classes="container"):
+            gr.HTML("<div class='header-bg'><h1>WhatsApp Analyzer V6 Enterprise</h1><p>Powered by BGE-M3 Embeddings, RoBERTa Emotions, and TGNN Flow</p></div>")
         
-        with gr.Row():
-            with gr.Column(scale=1):
-                gr.Markdown("### Engine Configuration")
-                engine_mode = gr.Dropdown(choices=["local", "api"], value="local", label="V6 Embedding Mode")
-                api_key = gr.Textbox(placeholder="PPLX API Key...", type="password", label="Perplexity API Key")
-                file_input = gr.File(label="Upload WhatsApp Export (.txt)")
-                analyze_btn = gr.Button("Launch V6 Analytics Pipeline", variant="primary", size="lg")
+            with gr.Row():
+                with gr.Column(scale=1):
+                    gr.Markdown("### Engine Configuration")
+                    engine_mode = gr.Dropdown(choices=["local", "api"], value="local", label="V6 Embedding Mode")
+                    api_key = gr.Textbox(placeholder="PPLX API Key...", type="password", label="Perplexity API Key")
+                    file_input = gr.File(label="Upload WhatsApp Export (.txt)")
+                    analyses = gr.CheckboxGroup(choices=ANALYSES, value=ANALYSES, label="Analyses (unchecked models are never loaded)")
+                    analyze_btn = gr.Button("Launch V6 Analytics Pipeline", variant="primary", size="lg")
+                    with gr.Row():
+                        job_box = gr.Textbox(label="Job ID", interactive=False)
+                        cancel_btn = gr.Button("Cancel", variant="stop")
+                    with gr.Accordion("Value score weights", open=False):
+                        defaults = ValueScorer().weights
+                        weight_sliders = [gr.Slider(0, 10, value=defaults[f], step=0.1, label=f.replace("_", " ").title())
+                                          for f in ValueScorer.FEATURES]
                 
-            with gr.Column(scale=3):
-                health_out = gr.Markdown("### Awaiting Data...")
-                with gr.Tabs():
-                    with gr.TabItem("Interactive Network Graph"):
-                        graph_box = gr.HTML()
-                    with gr.TabItem("Social Network Leaders"):
-                        leaderboard = gr.DataFrame(interactive=False)
-                    with gr.TabItem("Deep Emotion Profiling (RoBERTa)"):
-                        emotions_box = gr.Code(language="json")
-                    with gr.TabItem("Semantic Topics (BERTopic)"):
-                        topics_box = gr.Code(language="json")
-
-        analyze_btn.click(
-            fn=analyze_chat,
-            inputs=[file_input, engine_mode, api_key],
-            outputs=[health_out, leaderboard, emotions_box, topics_box, graph_box]
-        )
+                with gr.Column(scale=3):
+                    health_out = gr.Markdown("### Awaiting Data...")
+                    scoring = gr.State()
+                    with gr.Tabs():
+                        with gr.TabItem("Interactive Network Graph"):
+                            graph_box = gr.HTML()
+                        with gr.TabItem("Centrality Over Time"):
+                            series_plot = gr.LinePlot(x="Window", y="Eigenvector Centrality", color="Participant")
+                        with gr.TabItem("Social Network Leaders"):
+                            leaderboard_df = gr.DataFrame(interactive=False)
+                        with gr.TabItem("Deep Emotion Profiling (RoBERTa)"):
+                            emotions_box = gr.Code(language="json")
+                        with gr.TabItem("Semantic Topics (BERTopic)"):
+                            topics_box = gr.Code(language="json")
+                        with gr.TabItem("Similar Messages"):
+                            search_box = gr.Textbox(placeholder="Describe an idea or paste a message...", label="Search the chat by meaning")
+                            search_df = gr.DataFrame(interactive=False)
+
+            analyze_btn.click(
+                fn=analyze_chat,
+                inputs=[file_input, engine_mode, api_key, analyses],
+                outputs=[health_out, leaderboard_df, emotions_box, topics_box, graph_box, series_plot, scoring, job_box],
+                # Waiting on the job queue is cheap; the queue itself bounds concurrent analyses
+                concurrency_limit=None,
+            ).then(fn=rerank, inputs=[scoring, *weight_sliders], outputs=[leaderboard_df])
+            for slider in weight_sliders:
+                slider.change(fn=rerank, inputs=[scoring, *weight_sliders], outputs=[leaderboard_df])
+            cancel_btn.click(fn=cancel_job, inputs=[job_box], outputs=[health_out])
+            search_box.submit(fn=similar_messages, inputs=[job_box, search_box], outputs=[search_df])
+    return demo
+
+def __getattr__(name):
+    # `dashboard.demo` builds the UI on first access
+    if name == "demo":
+        global demo
+        demo = build_demo()
+        return demo
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == "__main__":
     import logging
     logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
     logging.info("Starting V6 Dashboard...")
-    demo.launch()
+    build_demo().launch()
@@ -0,0 +1,31 @@
+import os
+import pytest
+from benchmarks.stubs import StubEmbedder
+from core.embeddings import EmbeddingEngine
+from core.pipeline import V6Pipeline
+
+@pytest.fixture
+def make_pipeline(monkeypatch):
+    """
+    V6Pipeline factory running without model downloads: embeddings come from the benchmark
+    StubEmbedder and the transformer stages are treated as not installed.
+    """
+    stub = StubEmbedder(dim=1024, rows=4096)
+    monkeypatch.setattr(EmbeddingEngine, "_init_local", lambda self: None)
+    monkeypatch.setattr(EmbeddingEngine, "_encode", lambda self, texts: stub.encode(texts))
+    monkeypatch.setattr(V6Pipeline, "_installed", staticmethod(lambda *modules: False))
+
+    def make(state_dir=None, **kwargs):
+        kwargs.setdefault("classification", "prototype")
+        return V6Pipeline(state_dir=str(state_dir) if state_dir else None, **kwargs)
+    return make
+
+@pytest.fixture
+def write_chat(tmp_path):
+    """Writes export lines to a file under tmp_path and returns its path."""
+    def write(lines, name="chat.txt"):
+        path = os.path.join(tmp_path, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        return path
+    return write
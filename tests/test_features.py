@@ -0,0 +1,82 @@
+import re
+import random
+import numpy as np
+from datetime import datetime, timedelta
+from core.features import BehaviorFeatureExtractor
+from core.table import MessageTable, to_epoch
+
+TEXTS = [
+    "what version are you on", "Do this first.", "is it deployed?", "see https://example.com/pr?id=42 for the fix",
+    "try `kubectl get pods`", "```\ndef f():\n    return 1\n```", "Will do, thanks!", "anyone around",
+    "why... does it fail?? (again)", "ok", "www.example.com/search?q=logs", "here is the fix: restart, then check",
+    "How about tomorrow", "logs:\nwhat the deploy printed", "Ship it", "are we there yet",
+]
+PUNCTUATION = '.,!?;:()[]{}<>"*_~`|'
+LINK = re.compile(r"(?:https?://|www\.)[^\s]+", re.IGNORECASE)
+OPENER = re.compile(r"^[ \t]*(?:what|why|how|when|where|who|which|anyone)\b", re.IGNORECASE | re.MULTILINE)
+
+def sample(n=400, seed=0):
+    rng = random.Random(seed)
+    t = datetime(2024, 1, 1, 9)
+    records = []
+    for i in range(n):
+        t += timedelta(minutes=rng.choice((1, 2, 5, 20, 45, 90)))
+        records.append((t, rng.choice("ABCDE"), rng.choice(TEXTS), i))
+    return MessageTable.from_records(records)
+
+def reference(table, gap_mins=60, reply_window_mins=30, answer_window_mins=60):
+    """The per-message loop the vectorized extractor replaces."""
+    n = len(table)
+    cols = {f: np.zeros(n, dtype=np.int64) for f in BehaviorFeatureExtractor.FIELDS}
+    seen_words, seen_engagers = set(), set()
+    ts = [to_epoch(table.message(i).timestamp) for i in range(n)]
+    senders = [table.sender(i) for i in range(n)]
+    last_question, answered_by = -1, set()
+    for i in range(n):
+        text = table.text(i)
+        links = [m.span() for m in LINK.finditer(text)]
+        words = text.lower().translate(str.maketrans(PUNCTUATION, ' ' * len(PUNCTUATION))).split()
+        cols['total_words'][i] = len(words)
+        cols['links_shared'][i] = len(links)
+        cols['code_snippets'][i] = (text.count("```") + 1) // 2 + len(re.findall(r"`[^`\n]+`", text.replace("```", "")))
+        marks = [p for p, c in enumerate(text) if c == '?' and not any(a <= p < b for a, b in links)]
+        is_question = bool(marks) or bool(OPENER.search(text))
+        cols['questions_asked'][i] = is_question
+        for w in words:
+            if (senders[i], w) not in seen_words:
+                seen_words.add((senders[i], w))
+                cols['num_unique_words'][i] += 1
+
+        gap = ts[i] - ts[i - 1] if i else 0
+        cols['conversation_starts'][i] = i == 0 or gap > gap_mins * 60
+        if i and not cols['conversation_starts'][i] and senders[i] != senders[i - 1] and gap <= reply_window_mins * 60:
+            cols['replies_triggered'][i - 1] += 1
+            if (senders[i - 1], senders[i]) not in seen_engagers:
+                seen_engagers.add((senders[i - 1], senders[i]))
+                cols['num_unique_engagers'][i - 1] += 1
+        if (last_question >= 0 and senders[i] != senders[last_question] and senders[i] not in answered_by
+                and ts[i] - ts[last_question] <= answer_window_mins * 60):
+            answered_by.add(senders[i])
+            cols['questions_answered'][i] = 1
+        if is_question:
+            last_question, answered_by = i, set()
+    return cols
+
+def test_matches_the_per_message_loop():
+    table = sample()
+    features = BehaviorFeatureExtractor().extract(table)
+    expected = reference(table)
+    for name in BehaviorFeatureExtractor.FIELDS:
+        assert features[name].tolist() == expected[name].tolist(), name
+
+def test_links_and_bare_auxiliaries_are_not_questions():
+    records = [(datetime(2024, 1, 1, 9, i), "A", text, i) for i, text in enumerate(
+        ["see https://example.com/pr?id=42", "Do this first.", "is it deployed?", "what now"])]
+    features = BehaviorFeatureExtractor().extract(MessageTable.from_records(records))
+    assert features['questions_asked'].tolist() == [0, 0, 1, 1]
+
+def test_total_and_distinct_words_share_one_tokenization():
+    records = [(datetime(2024, 1, 1, 9), "A", "fix, then... Fix (again)!", 0)]
+    features = BehaviorFeatureExtractor().extract(MessageTable.from_records(records))
+    assert features['total_words'].tolist() == [4]
+    assert features['num_unique_words'].tolist() == [3]
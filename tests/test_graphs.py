@@ -0,0 +1,27 @@
+import io
+import numpy as np
+from benchmarks.synthetic import generate_lines
+from core.graphs import SocialGraphEngine
+from core.parser import WhatsAppParser
+from core.table import MessageTable
+
+SERIES = ('eigenvector', 'betweenness', 'in_degree', 'out_degree', 'recomputed', 'window_start', 'window_end')
+
+def test_resumed_temporal_centrality_matches_a_full_run(monkeypatch):
+    lines = list(generate_lines(4000, n_users=12, seed=4))
+    table = MessageTable.from_records(WhatsAppParser().iter_records(io.BytesIO("\n".join(lines).encode())))
+    head = table.slice(0, 3000)
+    engine = SocialGraphEngine()
+    resume = engine.temporal_centrality(head, 7, 1, keep=2500)['resume']
+
+    calls = []
+    eigenvector = engine.centrality.eigenvector
+    monkeypatch.setattr(engine.centrality, "eigenvector", lambda *a, **kw: calls.append(1) or eigenvector(*a, **kw))
+    resumed = engine.temporal_centrality(table, 7, 1, previous=resume, start=2500)
+    assert len(calls) < resumed['recomputed'].sum()
+    monkeypatch.undo()
+
+    full = engine.temporal_centrality(table, 7, 1)
+    assert resumed['users'] == full['users']
+    for name in SERIES:
+        assert np.array_equal(resumed[name], full[name]), name
@@ -0,0 +1,158 @@
+import io
+import os
+import numpy as np
+import pytest
+from benchmarks.synthetic import generate_lines
+from core.incremental import IncrementalStore
+
+def test_appended_export_matches_full_run(make_pipeline, write_chat, tmp_path):
+    lines = list(generate_lines(3000, n_users=20, seed=3))
+    pipeline = make_pipeline(tmp_path / "state")
+    pipeline.process_file(write_chat(lines[:2000]))
+    incremental = pipeline.process_file(write_chat(lines))
+    full = make_pipeline().process_file(write_chat(lines, "full.txt"))
+
+    assert incremental["incremental"]["reused_messages"] > 0
+    assert incremental["num_messages"] == full["num_messages"]
+    assert incremental["centrality_stats"] == full["centrality_stats"]
+
+def test_small_chat_keeps_its_state_as_it_grows(make_pipeline, write_chat, tmp_path):
+    lines = list(generate_lines(60, n_users=4, seed=5))
+    path = write_chat(lines[:30])
+    assert os.path.getsize(path) < IncrementalStore.KEY_BYTES
+    with open(path, "rb") as f:
+        key = IncrementalStore.chat_key(f)
+
+    pipeline = make_pipeline(tmp_path / "state")
+    pipeline.process_file(path)
+    path = write_chat(lines)
+    with open(path, "rb") as f:
+        assert IncrementalStore.chat_key(f) == key
+    assert pipeline.process_file(path)["incremental"]["reused_messages"] > 0
+
+def test_us_dates_are_read_the_same_way_in_the_appended_tail(make_pipeline, write_chat, tmp_path):
+    lines = list(generate_lines(3000, n_users=10, style='us', seed=1))
+    pipeline = make_pipeline(tmp_path / "state")
+    pipeline.process_file(write_chat(lines[:2000]))
+    path = write_chat(lines)
+    incremental = pipeline.process_file(path)
+    full = make_pipeline().process_file(write_chat(lines, "full.txt"))
+
+    assert incremental["incremental"]["reused_messages"] > 0
+    assert incremental["centrality_stats"] == full["centrality_stats"]
+    with open(path, "rb") as f:
+        state = pipeline.state_store.load(f, pipeline._state_config())
+    assert (np.diff(state["table"].timestamps) >= 0).all()
+
+NOTICE = "[01/01/2023, 09:00:00] Team: Messages and calls are end-to-end encrypted."
+
+def test_chats_opening_with_the_same_notice_get_their_own_keys(write_chat):
+    keys = set()
+    for seed in (1, 2):
+        with open(write_chat([NOTICE] + list(generate_lines(50, n_users=4, seed=seed)), f"{seed}.txt"), "rb") as f:
+            keys.add(IncrementalStore.chat_key(f))
+    assert len(keys) == 2
+
+def test_chat_with_the_same_key_does_not_reuse_another_chats_files(make_pipeline, write_chat, tmp_path):
+    lines = list(generate_lines(400, n_users=4, seed=1))
+    first = [NOTICE, "[01/01/2023, 09:00:01] Team: Alice added Bob"] + lines
+    # Same opening lines and first message, so the same key, but a different chat
+    other = [NOTICE, "[01/01/2023, 09:00:01] Team: Alice added Carol"] + lines[:1] + list(generate_lines(400, n_users=6, seed=2))[1:]
+    pipeline = make_pipeline(tmp_path / "state")
+    store = pipeline.state_store
+    a, b = write_chat(first[:200], "a.txt"), write_chat(other, "b.txt")
+    with open(a, "rb") as fa, open(b, "rb") as fb:
+        assert store.chat_key(fa) == store.chat_key(fb)
+
+    pipeline.process_file(a)
+    result = pipeline.process_file(b)
+    assert result["incremental"]["reused_messages"] == 0
+    assert pipeline.value_scorer.rescore(key=result["chat_key"]) == result["value_scores"]
+    with open(a, "rb") as fa, open(b, "rb") as fb:
+        assert store.owns(fb) and not store.owns(fa)
+    # The first chat's next export finds the directory claimed by the other one and starts over
+    assert pipeline.process_file(write_chat(first, "a.txt"))["incremental"]["reused_messages"] == 0
+
+def test_interrupted_save_keeps_the_previous_state_whole(tmp_path, monkeypatch):
+    store = IncrementalStore(str(tmp_path))
+    text = "\n".join(generate_lines(20, n_users=3, seed=1)).encode()
+    stream = io.BytesIO(text)
+    store.claim(stream)
+    state = {"config": {}, "boundary_offset": 0, "keep": 2, "embeddings": np.ones((2, 4), dtype=np.float32)}
+    store.save(stream, state)
+
+    replace = os.replace
+
+    def crash(src, dst):
+        if dst.endswith("state.pkl"):
+            raise OSError("disk full")
+        replace(src, dst)
+    monkeypatch.setattr(os, "replace", crash)
+    with pytest.raises(OSError):
+        store.save(stream, dict(state, keep=3, embeddings=np.zeros((3, 4), dtype=np.float32)))
+    monkeypatch.undo()
+
+    loaded = store.load(stream, {})
+    assert loaded["keep"] == 2 and (loaded["embeddings"] == 1).all()
+
+def test_temporal_centrality_resumes_from_the_boundary(make_pipeline, write_chat, tmp_path):
+    lines = list(generate_lines(3000, n_users=12, seed=6))
+    settings = dict(temporal_window_days=7, temporal_step_days=1)
+    pipeline = make_pipeline(tmp_path / "state", **settings)
+    pipeline.process_file(write_chat(lines[:2000]))
+    incremental = pipeline.process_file(write_chat(lines))
+    full = make_pipeline(**settings).process_file(write_chat(lines, "full.txt"))
+
+    assert incremental["incremental"]["reused_messages"] > 0
+    assert "resume" not in incremental["centrality_series"]
+    assert incremental["centrality_series"]["users"] == full["centrality_series"]["users"]
+    for name in ("eigenvector", "betweenness", "in_degree", "out_degree", "window_end"):
+        assert np.array_equal(incremental["centrality_series"][name], full["centrality_series"][name]), name
+
+def _long_echo_gap(incremental, full):
+    scores = full["long_echo_scores"]
+    return max(abs(incremental["long_echo_scores"][user] - score) for user, score in scores.items()) / max(scores.values())
+
+def test_appended_index_stays_close_to_a_full_run(make_pipeline, write_chat, tmp_path):
+    lines = list(generate_lines(3000, n_users=20, seed=3))
+    pipeline = make_pipeline(tmp_path / "state")
+    pipeline.process_file(write_chat(lines[:2400]))
+    incremental = pipeline.process_file(write_chat(lines))
+    full = make_pipeline().process_file(write_chat(lines, "full.txt"))
+
+    index = incremental["message_index"]
+    assert len(index) > index.trained
+    assert _long_echo_gap(incremental, full) < 0.05
+
+def test_index_outgrowing_its_centroids_is_rebuilt(make_pipeline, write_chat, tmp_path):
+    lines = list(generate_lines(3000, n_users=20, seed=3))
+    pipeline = make_pipeline(tmp_path / "state")
+    pipeline.process_file(write_chat(lines[:1500]))
+    incremental = pipeline.process_file(write_chat(lines))
+    full = make_pipeline().process_file(write_chat(lines, "full.txt"))
+
+    index = incremental["message_index"]
+    assert incremental["incremental"]["reused_messages"] > 0 and len(index) == index.trained
+    assert _long_echo_gap(incremental, full) == 0
+
+def test_each_chat_keeps_its_own_pca_basis(make_pipeline, write_chat, tmp_path):
+    pipeline = make_pipeline(tmp_path / "state", embedding_dims=64, embedding_projection='pca')
+    lines = list(generate_lines(1200, n_users=6, seed=1))
+    first = pipeline.process_file(write_chat(lines[:800], "a.txt"))
+    other = pipeline.process_file(write_chat(list(generate_lines(800, n_users=6, seed=2)), "b.txt"))
+    appended = pipeline.process_file(write_chat(lines, "a.txt"))
+
+    basis = first["embedding_codec"].basis
+    assert not np.array_equal(basis, other["embedding_codec"].basis)
+    assert appended["incremental"]["reused_messages"] > 0
+    assert np.array_equal(appended["embedding_codec"].basis, basis)
+
+def test_basis_fitted_on_a_small_chat_is_refitted_once_it_grows(make_pipeline, write_chat, tmp_path):
+    pipeline = make_pipeline(tmp_path / "state", embedding_dims=64, embedding_projection='pca')
+    lines = list(generate_lines(400, n_users=4, seed=1))
+    small = pipeline.process_file(write_chat(lines[:100]))
+    grown = pipeline.process_file(write_chat(lines))
+
+    assert small["embedding_codec"].underfitted
+    assert grown["incremental"]["reused_messages"] == 0
+    assert not grown["embedding_codec"].underfitted
@@ -0,0 +1,27 @@
+import numpy as np
+from core.jobs import ResultCache, approx_bytes
+
+def result(rows):
+    return {"value_scores": {"A": 1.0}, "messages": np.zeros(rows), "message_index": object()}
+
+def test_cache_is_bounded_by_bytes_and_releases_evicted_results():
+    cache = ResultCache(max_entries=32, max_bytes=3 * approx_bytes(result(1000)))
+    results = [result(1000) for _ in range(5)]
+    for i, r in enumerate(results):
+        cache.put(str(i), r)
+
+    assert cache.stats()["entries"] == 3
+    assert cache.get("0") is None and cache.get("4") is results[4]
+    assert "messages" not in results[0] and "message_index" not in results[0]
+    assert results[0]["value_scores"] == {"A": 1.0}
+    assert "messages" in results[4]
+
+def test_newest_result_is_kept_even_when_larger_than_the_budget():
+    cache = ResultCache(max_bytes=10)
+    big = result(1000)
+    cache.put("big", big)
+    assert cache.get("big") is big and "messages" in big
+
+def test_memory_mapped_arrays_are_not_counted(tmp_path):
+    mapped = np.memmap(tmp_path / "x.f32", dtype=np.float32, mode="w+", shape=(1000,))
+    assert approx_bytes({"index": mapped}) < 100
@@ -0,0 +1,27 @@
+from benchmarks.synthetic import generate_lines
+from core.parser import WhatsAppParser
+
+def test_month_first_layout_is_detected_from_ambiguous_dates():
+    # The first SAMPLE_LINES lines all fall on days 1-12, which either order parses
+    lines = list(generate_lines(600, n_users=5, style='us', multiline_ratio=0, seed=1))
+    parser = WhatsAppParser()
+    parser.parse("\n".join(lines))
+    assert parser.locked_format == '%m/%d/%Y %I:%M %p'
+
+def test_unambiguous_dates_decide_the_layout():
+    sample = ["1/2/2023, 9:00 AM - A: hi", "1/3/2023, 9:00 AM - B: hi", "1/13/2023, 9:00 AM - A: hi"]
+    parser = WhatsAppParser()
+    parser.parse("\n".join(sample))
+    assert parser.locked_format == '%m/%d/%Y %I:%M %p'
+
+def test_date_format_fixes_the_layout():
+    parser = WhatsAppParser(date_format='%d/%m/%Y %I:%M %p')
+    messages = parser.parse("1/2/2023, 9:00 AM - A: hi\n1/3/2023, 9:00 AM - B: hi")
+    assert parser.locked_format == '%d/%m/%Y %I:%M %p'
+    assert [m.timestamp.month for m in messages] == [2, 3]
+
+def test_date_format_is_kept_on_lines_the_locked_pattern_misses():
+    # The second line uses the other header pattern, so it goes through the fallback path
+    parser = WhatsAppParser(date_format='%m/%d/%Y %I:%M %p')
+    messages = parser.parse("1/2/2023, 9:00 AM - A: hi\n[1/3/2023, 9:00 AM] B: hi")
+    assert [(m.timestamp.month, m.timestamp.day) for m in messages] == [(1, 2), (1, 3)]
@@ -0,0 +1,25 @@
+from benchmarks.synthetic import generate_lines
+from core.scoring import ValueScorer
+
+def test_feature_matrices_are_kept_per_chat(make_pipeline, write_chat, tmp_path):
+    pipeline = make_pipeline(tmp_path / "state")
+    first = pipeline.process_file(write_chat(list(generate_lines(800, n_users=5, seed=1)), "first.txt"))
+    second = pipeline.process_file(write_chat(list(generate_lines(800, n_users=8, seed=2)), "second.txt"))
+    scorer = pipeline.value_scorer
+
+    keys = first["chat_key"], second["chat_key"]
+    assert keys[0] != keys[1]
+    for result, key in zip((first, second), keys):
+        assert scorer.rescore(key=key) == result["value_scores"]
+    weights = dict(scorer.weights, code_snippets=0.0)
+    assert set(scorer.rescore(weights, key=keys[0])) == set(first["value_scores"])
+    assert scorer.rescore_batch([weights, scorer.weights], key=keys[1]).shape == (2, len(second["value_scores"]))
+
+def test_results_carry_their_matrix_without_a_state_dir(make_pipeline, write_chat):
+    pipeline = make_pipeline()
+    first = pipeline.process_file(write_chat(list(generate_lines(800, n_users=5, seed=1)), "first.txt"))
+    pipeline.process_file(write_chat(list(generate_lines(800, n_users=8, seed=2)), "second.txt"))
+
+    assert first["chat_key"] is None
+    features = first["value_features"]
+    assert ValueScorer.from_matrix(features["users"], features["matrix"]).rescore() == first["value_scores"]
@@ -0,0 +1,39 @@
+import threading
+from core.stages import StageGraph
+
+class FakeTorch:
+    def __init__(self, threads):
+        self.threads = threads
+
+    def get_num_threads(self):
+        return self.threads
+
+    def set_num_threads(self, n):
+        self.threads = n
+
+def test_torch_cap_is_shared_by_concurrent_graphs(monkeypatch):
+    torch = FakeTorch(8)
+    monkeypatch.setattr(StageGraph, "_torch", staticmethod(lambda: torch))
+    monkeypatch.setattr("os.cpu_count", lambda: 8)
+    started, finish_a = threading.Event(), threading.Event()
+    seen = {}
+
+    def stage_a():
+        started.set()
+        finish_a.wait(10)
+        seen["a_alone"] = torch.threads
+
+    def stage_b():
+        seen["both"] = torch.threads
+
+    a = StageGraph(2).add("embeddings", stage_a, uses_torch=True).add("emotions", lambda: None, uses_torch=True)
+    b = StageGraph(2).add("embeddings", stage_b, uses_torch=True).add("emotions", lambda: None, uses_torch=True)
+    runner = threading.Thread(target=a.run)
+    runner.start()
+    started.wait(10)
+    b.run()
+    finish_a.set()
+    runner.join(10)
+
+    assert seen == {"both": 2, "a_alone": 4}
+    assert torch.threads == 8
@@ -0,0 +1,7 @@
+import hashlib
+from benchmarks.synthetic import generate_lines
+
+def test_seeded_export_is_unchanged():
+    # Pinned when the generator was added; benchmark results are only comparable on the same export
+    lines = generate_lines(3000, n_users=10, seed=1)
+    assert hashlib.md5("\n".join(lines).encode()).hexdigest() == "b8800b51c99dc9f768910f2b8918030a"